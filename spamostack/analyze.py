@@ -0,0 +1,342 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import argparse
+import csv
+import json
+import os
+
+import numpy
+
+import results
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def load(path):
+    """Map the records of a results file into a numpy array.
+
+    @return: Structured array of `results.FIELDS` and the dictionaries
+    """
+
+    count, dictionaries = results.read_header(path)
+    if not count:
+        return numpy.zeros(0, dtype=results.FIELDS), dictionaries
+
+    records = numpy.memmap(path, dtype=numpy.dtype(results.FIELDS),
+                           mode="r", offset=results.HEADER_SIZE,
+                           shape=(count,))
+
+    return records, dictionaries
+
+
+def _groups(keys, durations):
+    """Sort durations by keys and find where every key starts.
+
+    Keys and durations are packed into one integer, a single sort of
+    those is several times faster than sorting by two columns.
+
+    @param keys: Non-negative group keys
+    @type keys: `numpy.ndarray`
+
+    @param durations: Durations in microseconds, 32 bit unsigned
+    @type durations: `numpy.ndarray`
+
+    @return: Unique keys, sorted durations in seconds, starts and sizes
+    of the groups
+    """
+
+    packed = numpy.sort((keys.astype(numpy.int64) << 32) |
+                        durations.astype(numpy.int64))
+    keys = packed >> 32
+    values = (packed & 0xffffffff) / 1e6
+    unique, starts, counts = numpy.unique(keys, return_index=True,
+                                          return_counts=True)
+
+    return unique, values, starts, counts
+
+
+def _percentiles(values, starts, counts):
+    """Get nearest-rank percentiles of every group of sorted values."""
+
+    return dict((percent, values[starts + numpy.maximum(numpy.ceil(
+        counts * percent / 100.0).astype(numpy.int64), 1) - 1])
+        for percent in PERCENTILES)
+
+
+def _name(action):
+    return "/".join(action)
+
+
+class Analysis(object):
+    def __init__(self, records, dictionaries, window=10.0):
+        """Create an instance of `Analysis` class
+
+        Every statistic is computed with numpy over the whole array,
+        records are never iterated in python. Latencies are of the
+        operations which were done, as `compare` takes them.
+
+        @param records: Records loaded with `load`
+        @type records: `numpy.ndarray`
+
+        @param dictionaries: Dictionaries of the results file
+        @type dictionaries: `dict`
+
+        @param window: Length of the time windows in seconds
+        @type window: `float`
+        """
+
+        self.records = records
+        self.actions = [tuple(action) for action in dictionaries["actions"]]
+        self.outcomes = dictionaries["outcomes"]
+        self.targets = dict((tuple(target[:-1]), target[-1])
+                            for target in dictionaries.get("targets", []))
+        self.window = float(window)
+
+        self.durations = records["duration"].astype(numpy.float64) / 1e6
+        self.action = records["action"].astype(numpy.int64)
+        if len(records):
+            self.started = records["start"].min()
+            self.finished = (records["start"] + self.durations).max()
+        else:
+            self.started = self.finished = 0.0
+        self.windows = ((records["start"] - self.started) /
+                        self.window).astype(numpy.int64)
+        self.ok = records["outcome"] == self.outcomes.index("ok")
+
+    @property
+    def elapsed(self):
+        return max(self.finished - self.started, 1e-6)
+
+    def spans(self):
+        """Seconds from the first start to the last finish by action.
+
+        Pipes run their actions one after another, rates of the actions
+        are of the time they were active.
+        """
+
+        first = numpy.full(len(self.actions), numpy.inf)
+        last = numpy.full(len(self.actions), -numpy.inf)
+        numpy.minimum.at(first, self.action, self.records["start"])
+        numpy.maximum.at(last, self.action,
+                         self.records["start"] + self.durations)
+
+        return numpy.maximum(last - first, 1e-6)
+
+    def latency(self):
+        """Latency percentiles, counts and rates by action.
+
+        Counts and errors are of the done and failed operations, rates
+        of all the finished ones.
+        """
+
+        if not len(self.records):
+            return []
+
+        unique, values, starts, counts = _groups(
+            self.action[self.ok], self.records["duration"][self.ok])
+        percentiles = _percentiles(values, starts, counts)
+        positions = dict((index, position)
+                         for position, index in enumerate(unique))
+        finished, errors, skipped = [
+            numpy.bincount(self.action[mask], minlength=len(self.actions))
+            for mask in [slice(None),
+                         self.records["outcome"] ==
+                         self.outcomes.index("error"),
+                         self.records["outcome"] ==
+                         self.outcomes.index("skipped")]]
+        spans = self.spans()
+
+        summary = []
+        for index in numpy.flatnonzero(finished):
+            row = {"action": _name(self.actions[index]),
+                   "count": int(finished[index] - skipped[index]),
+                   "errors": int(errors[index]),
+                   "rate": finished[index] / spans[index],
+                   "mean": 0.0, "max": 0.0}
+            for percent in PERCENTILES:
+                row["p{}".format(percent)] = 0.0
+            position = positions.get(index)
+            if position is not None:
+                group = values[starts[position]:starts[position] +
+                               counts[position]]
+                row.update(mean=float(group.mean()), max=float(group[-1]))
+                for percent in PERCENTILES:
+                    row["p{}".format(percent)] = float(
+                        percentiles[percent][position])
+            summary.append(row)
+
+        return summary
+
+    def throughput(self):
+        """Finished operations per second in every window by outcome."""
+
+        if not len(self.records):
+            return []
+
+        size = self.windows.max() + 1
+        series = []
+        by_outcome = dict(
+            (outcome, numpy.bincount(
+                self.windows[self.records["outcome"] == index],
+                minlength=size))
+            for index, outcome in enumerate(self.outcomes))
+        for window in xrange(size):
+            row = {"window": window,
+                   "start": self.started + window * self.window}
+            for outcome in self.outcomes:
+                row[outcome] = by_outcome[outcome][window] / self.window
+            series.append(row)
+
+        return series
+
+    def windowed_latency(self):
+        """Latency percentiles of every action in every window."""
+
+        if not self.ok.any():
+            return []
+
+        size = self.windows.max() + 1
+        unique, values, starts, counts = _groups(
+            (self.action * size + self.windows)[self.ok],
+            self.records["duration"][self.ok])
+        percentiles = _percentiles(values, starts, counts)
+
+        rows = []
+        for position, key in enumerate(unique):
+            action, window = divmod(int(key), size)
+            row = {"action": _name(self.actions[action]), "window": window,
+                   "start": self.started + window * self.window,
+                   "count": int(counts[position])}
+            for percent in PERCENTILES:
+                row["p{}".format(percent)] = float(
+                    percentiles[percent][position])
+            rows.append(row)
+
+        return rows
+
+    def errors(self):
+        """Failed operations by action and HTTP status."""
+
+        failed = self.records["outcome"] == self.outcomes.index("error")
+        if not failed.any():
+            return []
+
+        keys = (self.action[failed] * 2 ** 16 +
+                self.records["status"][failed].astype(numpy.int64))
+        unique, counts = numpy.unique(keys, return_counts=True)
+
+        return [{"action": _name(self.actions[key // 2 ** 16]),
+                 "status": int(key % 2 ** 16), "count": int(count)}
+                for key, count in sorted(zip(unique, counts),
+                                         key=lambda item: -item[1])]
+
+    def drift(self):
+        """Achieved against configured rates of the actions."""
+
+        counts = numpy.bincount(self.action, minlength=len(self.actions))
+        spans = self.spans()
+        rows = []
+        for index, action in enumerate(self.actions):
+            target = self.targets.get(action)
+            if target is None:
+                continue
+            achieved = counts[index] / spans[index] if counts[index] else 0.0
+            rows.append({"action": _name(action), "target": target,
+                         "achieved": achieved,
+                         "drift": ((achieved - target) / target * 100
+                                   if target else 0.0)})
+
+        return rows
+
+    def report(self):
+        """Get all the statistics."""
+
+        return {"records": len(self.records), "started": self.started,
+                "elapsed": self.elapsed, "window": self.window,
+                "latency": self.latency(), "throughput": self.throughput(),
+                "windows": self.windowed_latency(), "errors": self.errors(),
+                "drift": self.drift()}
+
+
+def summary(report):
+    """Render the report as text."""
+
+    lines = ["{0} operations in {1:.1f} s".format(report["records"],
+                                                  report["elapsed"]), ""]
+    columns = ["p{}".format(percent) for percent in PERCENTILES]
+    lines.append("{0:<40} {1:>8} {2:>7} {3:>8} ".format(
+        "action", "count", "errors", "ops/s") +
+        " ".join("{:>9}".format(column) for column in columns + ["max"]))
+    for row in report["latency"]:
+        lines.append("{0:<40} {1:>8} {2:>7} {3:>8.2f} ".format(
+            row["action"], row["count"], row["errors"], row["rate"]) +
+            " ".join("{:>9.3f}".format(row[column])
+                     for column in columns + ["max"]))
+
+    if report["errors"]:
+        lines.extend(["", "Errors:"])
+        for row in report["errors"]:
+            lines.append("{0:<40} {1:>5} {2:>8}".format(
+                row["action"], row["status"] or "-", row["count"]))
+
+    if report["drift"]:
+        lines.extend(["", "Rates:"])
+        for row in report["drift"]:
+            lines.append("{0:<40} target {1:>8.3f} achieved {2:>8.3f} "
+                         "{3:>+7.1f}%".format(row["action"], row["target"],
+                                              row["achieved"], row["drift"]))
+
+    return "\n".join(lines)
+
+
+def write_csv(report, directory):
+    """Write every table of the report to its own CSV file."""
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    for table in ["latency", "throughput", "windows", "errors", "drift"]:
+        rows = report[table]
+        with open(os.path.join(directory, table + ".csv"), "wb") as out:
+            if not rows:
+                continue
+            writer = csv.DictWriter(out, sorted(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="spamostack analyze",
+        description="Analyze the results file written with --results")
+    parser.add_argument("run", help="Path to the results file")
+    parser.add_argument("--window", type=float, default=10.0,
+                        help="Length of the time windows in seconds")
+    parser.add_argument("--json", dest="json",
+                        help="File to write the report to as JSON")
+    parser.add_argument("--csv", dest="csv",
+                        help="Directory to write the report tables to as CSV")
+    args = parser.parse_args(argv)
+
+    records, dictionaries = load(args.run)
+    report = Analysis(records, dictionaries, args.window).report()
+
+    print(summary(report))
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2, default=float)
+    if args.csv:
+        write_csv(report, args.csv)
@@ -0,0 +1,444 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import contextlib
+import os
+import sqlite3
+import threading
+
+import leveldb
+
+
+def decode(value):
+    """Restore a value stored with `str`."""
+
+    try:
+        return eval(value)
+    except (NameError, SyntaxError):
+        return value
+
+
+class Backend(object):
+    """Base class for the storage backends of `cache.Cache`.
+
+    A backend opens stores, one per cache section. Each store is a flat
+    key-value mapping with `get`, `put`, `delete`, `items`, `write` and
+    `changed` methods. Keys are `str`, values are any literal python values.
+
+    Sections are of three kinds: "map" for arbitrary values, "set" for
+    packed IDs of tracked resources with empty values and "index" for
+    the dicts of indexed values of the same resources.
+    """
+
+    name = None
+
+    def __init__(self, path="./db"):
+        """Create an instance of the backend
+
+        @param path: Path to the database directory
+        @type path: `str`
+        """
+
+        self.path = path
+
+    def open(self, service, resource=None, kind="map"):
+        """Open the store for a cache section.
+
+        @param service: Name of the service or of the top level section
+        @type service: `str`
+
+        @param resource: Name of the resource under specific service
+        @type resource: `str`
+
+        @param kind: One of "map", "set" and "index"
+        @type kind: `str`
+        """
+
+        raise NotImplementedError()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group writes made by the current thread into one transaction."""
+
+        yield
+
+
+class LevelDBStore(object):
+    def __init__(self, path):
+        self.db = leveldb.LevelDB(path)
+
+    def get(self, key):
+        return decode(self.db.Get(key))
+
+    def put(self, key, value):
+        self.db.Put(key, str(value))
+
+    def delete(self, key):
+        self.db.Delete(key)
+
+    def items(self):
+        for key, value in self.db.RangeIter():
+            yield key, decode(value)
+
+    def write(self, puts=(), deletes=()):
+        """Apply changes in one synchronous batch."""
+
+        batch = leveldb.WriteBatch()
+        for key in deletes:
+            batch.Delete(key)
+        for key, value in puts:
+            batch.Put(key, str(value))
+        self.db.Write(batch, sync=True)
+
+    def version(self):
+        """LevelDB is locked by one process, nobody else changes it."""
+
+        return 0
+
+
+class LevelDBBackend(Backend):
+    """Keeps every section in its own LevelDB directory."""
+
+    name = "leveldb"
+
+    def __init__(self, path="./db"):
+        super(LevelDBBackend, self).__init__(path)
+        self.lock = threading.Lock()
+
+    def open(self, service, resource=None, kind="map"):
+        if resource is None:
+            path = os.path.join(self.path, service)
+        elif kind == "index":
+            path = os.path.join(self.path, service, resource + "_index")
+        else:
+            path = os.path.join(self.path, service, resource)
+
+        with self.lock:
+            parent = os.path.dirname(path)
+            if not os.path.exists(parent):
+                os.makedirs(parent)
+
+        return LevelDBStore(path)
+
+
+class MemoryStore(object):
+    def __init__(self):
+        self.data = dict()
+
+    def get(self, key):
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def items(self):
+        return self.data.items()
+
+    def write(self, puts=(), deletes=()):
+        for key in deletes:
+            self.data.pop(key, None)
+        self.data.update(puts)
+
+    def version(self):
+        return 0
+
+
+class MemoryBackend(Backend):
+    """Keeps sections in process memory only, nothing touches the disk."""
+
+    name = "memory"
+
+    def open(self, service, resource=None, kind="map"):
+        return MemoryStore()
+
+
+class SQLiteStore(object):
+    def __init__(self, backend, service, resource):
+        self.backend = backend
+        self.service = service
+        self.resource = resource
+
+    # Name the writes of the store are counted under, sets and indexes
+    # of one resource share the rows of the inventory
+    counter = property(lambda self: "inventory:{0}/{1}".format(
+        self.service, self.resource))
+
+    def execute(self, query, params=(), many=False):
+        conn = self.backend.connection()
+        if many:
+            return conn.executemany(query, params)
+        return conn.execute(query, params).fetchall()
+
+    def version(self):
+        """Get the number of writes committed by other processes."""
+
+        return self.backend.foreign_writes(self.counter)
+
+
+class SQLiteMapStore(SQLiteStore):
+    section = property(lambda self: "/".join(
+        filter(None, [self.service, self.resource])))
+    counter = property(lambda self: "entries:" + self.section)
+
+    def get(self, key):
+        rows = self.execute("SELECT value FROM entries "
+                            "WHERE section = ? AND key = ?",
+                            (self.section, key))
+        if not rows:
+            raise KeyError(key)
+        return decode(rows[0][0])
+
+    def put(self, key, value):
+        self.write(puts=[(key, value)])
+
+    def delete(self, key):
+        self.write(deletes=[key])
+
+    def items(self):
+        rows = self.execute("SELECT key, value FROM entries "
+                            "WHERE section = ?", (self.section,))
+        return [(str(key), decode(value)) for key, value in rows]
+
+    def write(self, puts=(), deletes=()):
+        with self.backend.batch():
+            self.backend.wrote(self.counter)
+            self.execute("DELETE FROM entries WHERE section = ? AND key = ?",
+                         [(self.section, key) for key in deletes], many=True)
+            self.execute("INSERT OR REPLACE INTO entries (section, key, value)"
+                         " VALUES (?, ?, ?)",
+                         [(self.section, key, str(value))
+                          for key, value in puts], many=True)
+
+
+class SQLiteSetStore(SQLiteStore):
+    def get(self, key):
+        rows = self.execute("SELECT 1 FROM inventory WHERE service = ? AND "
+                            "resource = ? AND id = ?",
+                            (self.service, self.resource, buffer(key)))
+        if not rows:
+            raise KeyError(key)
+        return ""
+
+    def put(self, key, value):
+        self.write(puts=[(key, value)])
+
+    def delete(self, key):
+        self.write(deletes=[key])
+
+    def items(self):
+        rows = self.execute("SELECT id FROM inventory "
+                            "WHERE service = ? AND resource = ?",
+                            (self.service, self.resource))
+        return [(str(key), "") for key, in rows]
+
+    def write(self, puts=(), deletes=()):
+        with self.backend.batch():
+            self.backend.wrote(self.counter)
+            self.execute("DELETE FROM inventory WHERE service = ? AND "
+                         "resource = ? AND id = ?",
+                         [(self.service, self.resource, buffer(key))
+                          for key in deletes], many=True)
+            self.execute("INSERT OR IGNORE INTO inventory "
+                         "(service, resource, id) VALUES (?, ?, ?)",
+                         [(self.service, self.resource, buffer(key))
+                          for key, value in puts], many=True)
+
+
+class SQLiteIndexStore(SQLiteStore):
+    fields = ("name", "parent", "state")
+
+    def get(self, key):
+        rows = self.execute("SELECT name, parent, state FROM inventory "
+                            "WHERE service = ? AND resource = ? AND id = ?",
+                            (self.service, self.resource, buffer(key)))
+        if not rows:
+            raise KeyError(key)
+        return dict(zip(self.fields, rows[0]))
+
+    def put(self, key, value):
+        self.write(puts=[(key, value)])
+
+    def delete(self, key):
+        self.write(deletes=[key])
+
+    def items(self):
+        rows = self.execute("SELECT id, name, parent, state FROM inventory "
+                            "WHERE service = ? AND resource = ? AND "
+                            "(name IS NOT NULL OR parent IS NOT NULL OR "
+                            "state IS NOT NULL)",
+                            (self.service, self.resource))
+        return [(str(row[0]), dict(zip(self.fields, row[1:])))
+                for row in rows]
+
+    def write(self, puts=(), deletes=()):
+        """Change indexed values of the resources.
+
+        Only resources of the inventory are indexed, they are added by
+        the set store of the section.
+        """
+
+        rows = [(self.service, self.resource, buffer(key)) +
+                tuple(value.get(field) for field in self.fields)
+                for key, value in puts]
+
+        with self.backend.batch():
+            self.backend.wrote(self.counter)
+            self.execute("UPDATE inventory SET name = NULL, parent = NULL, "
+                         "state = NULL WHERE service = ? AND resource = ? "
+                         "AND id = ?",
+                         [(self.service, self.resource, buffer(key))
+                          for key in deletes], many=True)
+            self.execute("UPDATE inventory SET name = ?, parent = ?, "
+                         "state = ? WHERE service = ? AND resource = ? "
+                         "AND id = ?",
+                         [row[3:] + row[:3] for row in rows], many=True)
+
+
+class SQLiteBackend(Backend):
+    """Keeps all the sections in one SQLite database in WAL mode.
+
+    Unlike LevelDB the database is not locked by one process, so several
+    spamostack processes could share one `--db` directory. Every thread
+    uses its own connection in autocommit mode, writes are wrapped into
+    explicit transactions by `batch`.
+
+    Every transaction increments the counters of writes of the sections
+    it changed in the database, a section is reloaded only when its
+    counter grew more than by the transactions of this backend.
+    """
+
+    name = "sqlite"
+    schema = [
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "section TEXT NOT NULL, key TEXT NOT NULL, value TEXT, "
+        "PRIMARY KEY (section, key))",
+        "CREATE TABLE IF NOT EXISTS inventory ("
+        "service TEXT NOT NULL, resource TEXT NOT NULL, id BLOB NOT NULL, "
+        "name TEXT, parent TEXT, state TEXT, "
+        "PRIMARY KEY (service, resource, id))",
+        "CREATE INDEX IF NOT EXISTS inventory_name "
+        "ON inventory (service, resource, name)",
+        "CREATE INDEX IF NOT EXISTS inventory_parent "
+        "ON inventory (service, resource, parent)",
+        "CREATE TABLE IF NOT EXISTS versions ("
+        "section TEXT PRIMARY KEY, count INTEGER NOT NULL)"]
+
+    def __init__(self, path="./db"):
+        super(SQLiteBackend, self).__init__(path)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.file = os.path.join(self.path, "inventory.sqlite")
+        self.local = threading.local()
+        # Transactions committed by this backend by section
+        self.writes = collections.Counter()
+        self.writes_lock = threading.Lock()
+
+        with self.batch():
+            for statement in self.schema:
+                self.connection().execute(statement)
+
+    def connection(self):
+        """Get the connection of the current thread."""
+
+        if getattr(self.local, "conn", None) is None:
+            conn = sqlite3.connect(self.file, timeout=60,
+                                   isolation_level=None)
+            conn.text_factory = str
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self.local.conn = conn
+            self.local.depth = 0
+            self.local.sections = set()
+
+        return self.local.conn
+
+    @contextlib.contextmanager
+    def batch(self):
+        conn = self.connection()
+        if not self.local.depth:
+            # Take the write lock at once, waiting for it is retried by
+            # sqlite unlike an upgrade of a read transaction
+            conn.execute("BEGIN IMMEDIATE")
+        self.local.depth += 1
+        try:
+            yield
+        except Exception:
+            self.local.depth -= 1
+            if not self.local.depth:
+                self.local.sections = set()
+                conn.execute("ROLLBACK")
+            raise
+        self.local.depth -= 1
+        if not self.local.depth:
+            sections, self.local.sections = self.local.sections, set()
+            conn.executemany("INSERT OR IGNORE INTO versions (section, count)"
+                             " VALUES (?, 0)",
+                             [(section,) for section in sections])
+            conn.executemany("UPDATE versions SET count = count + 1 "
+                             "WHERE section = ?",
+                             [(section,) for section in sections])
+            with self.writes_lock:
+                conn.execute("COMMIT")
+                self.writes.update(sections)
+
+    def wrote(self, section):
+        """Count the write of the section in the current transaction."""
+
+        self.local.sections.add(section)
+
+    def foreign_writes(self, section):
+        """Get the number of transactions of the section committed by
+        other processes.
+        """
+
+        with self.writes_lock:
+            rows = self.connection().execute(
+                "SELECT count FROM versions WHERE section = ?",
+                (section,)).fetchall()
+
+            return (rows[0][0] if rows else 0) - self.writes[section]
+
+    def open(self, service, resource=None, kind="map"):
+        stores = {"map": SQLiteMapStore, "set": SQLiteSetStore,
+                  "index": SQLiteIndexStore}
+
+        return stores[kind](self, service, resource)
+
+
+BACKENDS = dict((backend.name, backend)
+                for backend in [LevelDBBackend, MemoryBackend, SQLiteBackend])
+
+
+def get_backend(name, path="./db"):
+    """Create the backend registered under specific name.
+
+    @param name: Name of the backend, one of `BACKENDS` keys
+    @type name: `str`
+
+    @param path: Path to the database directory
+    @type path: `str`
+    """
+
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError("Unknown cache backend {0}, use one of: {1}".format(
+            name, ", ".join(sorted(BACKENDS))))
+
+    return backend(path)
@@ -13,38 +13,130 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import binascii
 import collections
 import os
+import random
+import threading
+import time
 
-import leveldb
+import backends
+import ipam
 
 nested_dict = lambda: collections.defaultdict(nested_dict)
 
+# How often sections look for changes made by other processes, seconds
+SYNC_INTERVAL = 1.0
 
-class LevelCache(collections.MutableMapping, object):
-    def __init__(self, path="./db"):
-        self.path = path
-        self.db = leveldb.LevelDB(self.path)
+# Prefixes of packed IDs
+_DASHED_UUID = "\x00"
+_HEX_UUID = "\x01"
+_RAW = "\x02"
+
+
+def pack_id(key):
+    """Pack resource ID into compact binary form.
+
+    UUIDs with or without dashes are stored as 16 raw bytes behind a one
+    byte prefix, any other ID is stored as is behind its own prefix.
+
+    @param key: ID of the resource
+    @type key: `str`
+    """
+
+    if isinstance(key, unicode):
+        key = key.encode("utf-8")
+
+    if len(key) == 36 and key[8] == key[13] == key[18] == key[23] == "-":
+        prefix = _DASHED_UUID
+        hexed = key.replace("-", "")
+    elif len(key) == 32:
+        prefix = _HEX_UUID
+        hexed = key
+    else:
+        return _RAW + key
+
+    if hexed != hexed.lower():
+        return _RAW + key
+    try:
+        return prefix + binascii.unhexlify(hexed)
+    except TypeError:
+        return _RAW + key
+
+
+def unpack_id(packed):
+    """Restore resource ID packed with `pack_id`."""
+
+    prefix, body = packed[0], packed[1:]
+
+    if prefix == _RAW:
+        return body
+
+    hexed = binascii.hexlify(body)
+    if prefix == _HEX_UUID:
+        return hexed
+
+    return "-".join([hexed[:8], hexed[8:12], hexed[12:16], hexed[16:20],
+                     hexed[20:]])
+
+
+class Synced(object):
+    """Reloads a section when other processes changed its store.
+
+    Every section keeps the version of the store it has seen, so sections
+    sharing the store reload independently.
+    """
+
+    synced = 0
+    version = None
+
+    def sync(self):
+        now = time.time()
+        if now - self.synced < SYNC_INTERVAL:
+            return
+        self.synced = now
+
+        version = self.store.version()
+        if version != self.version:
+            self.version = version
+            self.reload()
+
+    def reload(self):
+        raise NotImplementedError()
+
+
+class PersistentDict(collections.MutableMapping, Synced):
+    def __init__(self, store):
+        """Create an instance of `PersistentDict` class
+
+        @param store: Store of the section opened by the cache backend
+        @type store: `backends.LevelDBStore`
+        """
+
+        self.store = store
         self.data = dict()
+        # Number of times the data was loaded again
+        self.loads = 0
+        self.version = self.store.version()
         self.load()
 
     # Concrete methods for MutableMapping
     def __getitem__(self, key):
+        if key not in self.data:
+            self.sync()
         return self.data[key]
 
     def __setitem__(self, key, value):
-        self.db.Put(key, str(value))
+        self.store.put(key, value)
         self.data[key] = value
 
     def setdefault(self, key, value=None):
-        try:
-            self.db.Get(key)
-        except KeyError:
-            self.db.Put(key, str(value))
+        if key not in self.data:
+            self.store.put(key, value)
         return self.data.setdefault(key, value)
 
     def __delitem__(self, key):
-        self.db.Delete(key)
+        self.store.delete(key)
         del self.data[key]
 
     def __iter__(self):
@@ -60,31 +152,249 @@ class LevelCache(collections.MutableMapping, object):
     def load(self):
         """Load db into cache."""
 
-        for key, value in self.db.RangeIter():
-            try:
-                self.data[key] = eval(value)
-            except NameError:
-                self.data[key] = value
+        for key, value in self.store.items():
+            self.data[key] = value
+
+    def reload(self):
+        self.version = self.store.version()
+        self.data = dict(self.store.items())
+        self.loads += 1
 
     def update(self):
         """Update existing db with data from cache."""
 
-        batch = leveldb.WriteBatch()
-        for key, value in self.data.iteritems():
-            self.db.Put(key, str(self.data[key]))
-        self.db.Write(batch, sync=True)
+        self.store.write(puts=self.data.items())
+
+
+class IdSet(collections.MutableSet, Synced):
+    def __init__(self, store):
+        """Create an instance of `IdSet` class
+
+        Compact set of IDs of the tracked resources. IDs are kept packed
+        both in memory and in the db, where the value of each key is empty.
+
+        @param store: Store of the section opened by the cache backend
+        @type store: `backends.LevelDBStore`
+        """
+
+        self.store = store
+        self.keys = set()
+        self.order = []
+        self.lock = threading.Lock()
+        self.version = self.store.version()
+        self.load()
+
+    # Concrete methods for MutableSet
+    def __contains__(self, key):
+        if not isinstance(key, basestring):
+            return False
+        self.sync()
+        return pack_id(key) in self.keys
+
+    def __iter__(self):
+        self.sync()
+        for packed in list(self.order):
+            if packed in self.keys:
+                yield unpack_id(packed)
+
+    def __len__(self):
+        self.sync()
+        return len(self.keys)
+
+    def add(self, key):
+        packed = pack_id(key)
+        with self.lock:
+            if packed not in self.keys:
+                self.store.put(packed, "")
+                self.keys.add(packed)
+                self.order.append(packed)
+
+    def discard(self, key):
+        packed = pack_id(key)
+        with self.lock:
+            if packed in self.keys:
+                self.store.delete(packed)
+                self.keys.remove(packed)
+                # Removed IDs are dropped from `order` lazily
+                if len(self.order) > 2 * len(self.keys) + 64:
+                    self.order = [el for el in self.order if el in self.keys]
+    # end
+
+    def choice(self):
+        """Get a random ID from the set."""
+
+        self.sync()
+        with self.lock:
+            if not self.keys:
+                raise IndexError("Cannot choose from an empty set")
+            while True:
+                packed = random.choice(self.order)
+                if packed in self.keys:
+                    return unpack_id(packed)
+
+    def load(self):
+        """Load db into cache.
+
+        Entries written in the former `key -> False` form are converted.
+        """
+
+        legacy = []
+        for key, value in self.store.items():
+            if key[:1] in (_DASHED_UUID, _HEX_UUID, _RAW):
+                packed = key
+            else:
+                packed = pack_id(key)
+                legacy.append(key)
+            if packed not in self.keys:
+                self.keys.add(packed)
+                self.order.append(packed)
+
+        if legacy:
+            self.store.write(puts=[(pack_id(key), "") for key in legacy],
+                             deletes=legacy)
+
+    def reload(self):
+        with self.lock:
+            self.keys = set()
+            self.order = []
+            self.load()
+
+
+class ResourceIndex(Synced):
+    fields = ("name", "parent", "state")
+
+    def __init__(self, store):
+        """Create an instance of `ResourceIndex` class
+
+        Keeps name, parent ID and lifecycle state of every tracked resource
+        of one section and reverse mappings from those values to IDs.
+        IDs are packed the same way as in `IdSet`.
+
+        @param store: Store of the section opened by the cache backend
+        @type store: `backends.LevelDBStore`
+        """
+
+        self.store = store
+        self.attrs = PersistentDict(store)
+        self.version = self.attrs.version
+        self.lock = threading.Lock()
+        self.link_all()
+
+    def link_all(self):
+        self.linked = self.attrs.loads
+        self.reverse = dict((field, collections.defaultdict(set))
+                            for field in self.fields)
+        for key, attrs in self.attrs.iteritems():
+            self._link(key, attrs)
+
+    def reload(self):
+        with self.lock:
+            self.attrs.reload()
+            self.link_all()
+
+    def relink(self):
+        """Rebuild the reverse mappings if the attributes reloaded.
+
+        Reading the attributes syncs them on their own, called under
+        the lock after that.
+        """
+
+        if self.linked != self.attrs.loads:
+            self.link_all()
+
+    def _link(self, key, attrs):
+        for field in self.fields:
+            if attrs.get(field) is not None:
+                self.reverse[field][attrs[field]].add(key)
+
+    def _unlink(self, key, attrs):
+        for field in self.fields:
+            value = attrs.get(field)
+            if value is None:
+                continue
+            keys = self.reverse[field][value]
+            keys.discard(key)
+            if not keys:
+                del self.reverse[field][value]
+
+    def add(self, key, name=None, parent=None, state=None):
+        """Add or replace indexed values of the resource."""
+
+        key = pack_id(key)
+        attrs = {"name": name, "parent": parent, "state": state}
+        with self.lock:
+            present = key in self.attrs
+            self.relink()
+            if present:
+                self._unlink(key, self.attrs[key])
+            self.attrs[key] = attrs
+            self._link(key, attrs)
+
+    def update(self, key, **kwargs):
+        """Change some of the indexed values of the resource."""
+
+        key = pack_id(key)
+        with self.lock:
+            attrs = dict(self.attrs.get(key, {}))
+            self.relink()
+            self._unlink(key, attrs)
+            attrs.update(kwargs)
+            self.attrs[key] = attrs
+            self._link(key, attrs)
+
+    def remove(self, key):
+        """Remove the resource from the index."""
+
+        key = pack_id(key)
+        with self.lock:
+            present = key in self.attrs
+            self.relink()
+            if present:
+                self._unlink(key, self.attrs[key])
+                del self.attrs[key]
+
+    def get(self, key):
+        """Get indexed values of the resource."""
+
+        return self.attrs.data.get(pack_id(key), {})
+
+    def find(self, **query):
+        """Find IDs of the resources matching all the passed values.
+
+        @param query: Field names from `fields` with values to look for
+        @type query: `dict`
+        """
+
+        self.sync()
+        with self.lock:
+            self.relink()
+            result = None
+            for field, value in query.iteritems():
+                keys = self.reverse[field].get(value, set())
+                result = set(keys) if result is None else result & keys
+            if result is None:
+                result = set(self.attrs.keys())
+
+        return [unpack_id(key) for key in result]
 
 
 class Cache(collections.MutableMapping, object):
-    def __init__(self, path='./db'):
+    def __init__(self, path='./db', backend="leveldb"):
         """Create instance of `Cache` class
 
         @param path: Path to the database
         @type path: `str`
+
+        @param backend: Name of the storage backend
+        @type backend: `str`
         """
 
         self.cache = nested_dict()
+        self.indexes = dict()
+        self.lock = threading.Lock()
         self.path = path
+        self.backend = backends.get_backend(backend, path)
+        self.ipam = ipam.Ipam(self.backend.open("neutron", "ipam"))
         self.default_init()
 
     # Concrete methods for MutableMapping
@@ -107,14 +417,64 @@ class Cache(collections.MutableMapping, object):
         return len(self.cache)
     # end
 
+    def index(self, service, resource):
+        """Get secondary indexes for the resources of specific section.
+
+        @param service: Name of the service
+        @type service: `str`
+
+        @param resource: Name of the resource under specific service
+        @type resource: `str`
+        """
+
+        with self.lock:
+            if (service, resource) not in self.indexes:
+                self.indexes[(service, resource)] = ResourceIndex(
+                    self.backend.open(service, resource, "index"))
+
+        return self.indexes[(service, resource)]
+
+    def batch(self):
+        """Group the writes of the current thread into one transaction.
+
+        Only the sqlite backend makes use of it, others write as usual.
+        """
+
+        return self.backend.batch()
+
+    def track(self, service, resource, key, name=None, parent=None,
+              state=None):
+        """Start tracking a resource and index it."""
+
+        self.cache[service][resource].add(key)
+        self.index(service, resource).add(key, name, parent, state)
+
+    def untrack(self, service, resource, key):
+        """Stop tracking a resource and drop it from the indexes."""
+
+        self.cache[service][resource].discard(key)
+        self.index(service, resource).remove(key)
+
+    def find(self, service, resource, **query):
+        """Find IDs of tracked resources by name, parent ID or state.
+
+        @param service: Name of the service
+        @type service: `str`
+
+        @param resource: Name of the resource under specific service
+        @type resource: `str`
+
+        @param query: Any of `name`, `parent` and `state` values
+        @type query: `dict`
+        """
+
+        return self.index(service, resource).find(**query)
+
     def default_init(self):
         """Default initialization for cache."""
 
-        if not os.path.exists(self.path):
-            os.mkdir(self.path)
         uname = os.environ['OS_USERNAME']
-        self.cache["users"] = LevelCache(
-            os.path.join(self.path, "users"))
+        self.cache["users"] = PersistentDict(self.backend.open("users"))
 
         admin_user = {"username":
                       os.environ['OS_USERNAME'],
@@ -141,55 +501,17 @@ class Cache(collections.MutableMapping, object):
                              "os_volume_api_version":
                              os.environ['OS_VOLUME_API_VERSION']}
 
-        cinder_path = os.path.join(self.path, "cinder")
-        if not os.path.exists(cinder_path):
-            os.mkdir(cinder_path)
-
-        self.cache["cinder"]["volumes"] = LevelCache(
-            os.path.join(cinder_path, "volumes"))
-
-        # ------------------------------------------------------------------- #
-
-        glance_path = os.path.join(self.path, "glance")
-        if not os.path.exists(glance_path):
-            os.mkdir(glance_path)
-
-        self.cache["glance"]["images"] = LevelCache(
-            os.path.join(glance_path, "images"))
-
-        # ------------------------------------------------------------------- #
-
-        keystone_path = os.path.join(self.path, "keystone")
-        if not os.path.exists(keystone_path):
-            os.mkdir(keystone_path)
-
-        for el in ["projects", "users"]:
-            self.cache["keystone"][el] = LevelCache(
-                os.path.join(keystone_path, el))
-
-        # ------------------------------------------------------------------- #
-
-        neutron_path = os.path.join(self.path, "neutron")
-        if not os.path.exists(neutron_path):
-            os.mkdir(neutron_path)
-        for resource in ["networks", "routers", "ports", "security_groups"]:
-            self.cache["neutron"][resource] = LevelCache(
-                os.path.join(neutron_path, resource))
-
-        # ------------------------------------------------------------------- #
-
-        nova_path = os.path.join(self.path, "nova")
-        if not os.path.exists(nova_path):
-            os.mkdir(nova_path)
-
-        for el in ["flavors", "servers"]:
-            self.cache["nova"][el] = LevelCache(os.path.join(nova_path, el))
-
-        # ------------------------------------------------------------------- #
-
-        swift_path = os.path.join(self.path, "swift")
-        if not os.path.exists(swift_path):
-            os.mkdir(swift_path)
-
-        for el in ["containers", "objects"]:
-            self.cache["swift"][el] = LevelCache(os.path.join(swift_path, el))
+        sections = {"cinder": ["volumes"],
+                    "glance": ["images"],
+                    "keystone": ["projects", "users"],
+                    "neutron": ["networks", "routers", "ports",
+                                "security_groups", "subnets", "floatingips",
+                                "interfaces"],
+                    "nova": ["flavors", "keypairs", "servers"],
+                    "swift": ["containers", "objects", "segment_containers",
+                              "segments"]}
+
+        for service, resources in sections.iteritems():
+            for resource in resources:
+                self.cache[service][resource] = IdSet(
+                    self.backend.open(service, resource, "set"))
@@ -13,7 +13,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
+from multiprocessing import pool
 import re
+import threading
+import time
 
 from cinderclient import client as cinder_client
 from glanceclient import client as glance_client
@@ -24,6 +28,88 @@ from neutronclient.neutron import client as neutron_client
 from novaclient import client as nova_client
 from swiftclient import client as swift_client
 
+import metrics
+
+# Number of HEAD requests made at once to filter a swift listing
+LISTING_PARALLELISM = 8
+
+
+def _transferred(response):
+    """Get sizes of the request and the response bodies.
+
+    Sizes are taken from Content-Length headers, streamed bodies without
+    them are not counted.
+
+    @param response: Response of the request
+    @type response: `requests.Response`
+    """
+
+    def length(headers, body=None):
+        try:
+            return int(headers.get("Content-Length"))
+        except (TypeError, ValueError):
+            return len(body) if isinstance(body, basestring) else 0
+
+    request = response.request
+    received = getattr(response, "_content", None)
+
+    return (length(request.headers, request.body),
+            length(response.headers, received or None))
+
+
+class Session(session.Session):
+    def request(self, url, method, **kwargs):
+        """Count the request by the type of the service it goes to."""
+
+        endpoint_filter = kwargs.get("endpoint_filter") or {}
+        service = endpoint_filter.get("service_type") or "identity"
+
+        response = None
+        try:
+            with metrics.registry.phase("api"):
+                response = super(Session, self).request(url, method, **kwargs)
+        except Exception as exc:
+            response = getattr(exc, "response", None)
+            raise
+        finally:
+            sent, received = (_transferred(response) if response is not None
+                              else (0, 0))
+            metrics.registry.api_call(service, sent, received)
+
+        return response
+
+
+class HTTPConnection(swift_client.HTTPConnection):
+    def _request(self, *args, **kwargs):
+        """Count the request to swift."""
+
+        response = None
+        try:
+            response = super(HTTPConnection, self)._request(*args, **kwargs)
+        finally:
+            sent, received = (_transferred(response) if response is not None
+                              else (0, 0))
+            metrics.registry.api_call("object-store", sent, received)
+
+        return response
+
+
+class Connection(swift_client.Connection):
+    def http_connection(self, url=None):
+        connection = HTTPConnection(url if url else self.url,
+                                    cacert=self.cacert,
+                                    insecure=self.insecure, cert=self.cert,
+                                    cert_key=self.cert_key,
+                                    ssl_compression=self.ssl_compression,
+                                    timeout=self.timeout)
+
+        return connection.parsed_url, connection
+
+    def _retry(self, reset_func, func, *args, **kwargs):
+        with metrics.registry.phase("api"):
+            return super(Connection, self)._retry(reset_func, func, *args,
+                                                  **kwargs)
+
 
 class ClientFactory(object):
     def __init__(self, user, os_identity_api_version="3",
@@ -37,7 +123,7 @@ class ClientFactory(object):
 
         self.user = user
         self.auth = v3.Password(**user)
-        self.session = session.Session(auth=self.auth)
+        self.session = Session(auth=self.auth)
         self.os_identity_api_version = os_identity_api_version
         self.os_network_api_version = os_network_api_version
         self.os_volume_api_version = os_volume_api_version
@@ -74,13 +160,17 @@ class ClientFactory(object):
         return Nova(nova_client.Client(self.os_compute_api_version,
                                        session=self.session))
 
-    def swift(self):
-        """Create swift client."""
+    def swift(self, verify_writes=False):
+        """Create swift client.
 
-        return Swift(swift_client.Connection(
+        @param verify_writes: Read resources back after writing them
+        @type verify_writes: `bool`
+        """
+
+        return Swift(Connection(
             authurl=self.user["auth_url"], user=self.user["username"],
             key=self.user["password"], tenant_name=self.user["project_name"],
-            auth_version=self.os_identity_api_version))
+            auth_version=self.os_identity_api_version), verify_writes)
 
 
 class Accessible(dict):
@@ -218,6 +308,9 @@ class Neutron(object):
                 method = getattr(self, "_{0}_{1}".format(component, action))
                 setattr(component_obj, action, method)
 
+        self.routers.remove_interface = self._router_remove_interface
+        self.routers.remove_gateway = self._router_remove_gateway
+
     @_obj_to_accessible("address_scope")
     def _address_scope_create(self, **kwargs):
         return self.native.create_address_scope(
@@ -1158,6 +1251,12 @@ class Neutron(object):
         return self.native.update_router(
             id, _to_body("router", **kwargs))
 
+    def _router_remove_interface(self, id, **kwargs):
+        return self.native.remove_interface_router(id, kwargs)
+
+    def _router_remove_gateway(self, id):
+        return self.native.remove_gateway_router(id)
+
     # ----------------------------------------------------------------------- #
 
     @_obj_to_accessible("security_group")
@@ -1393,9 +1492,64 @@ class Nova(object):
                 setattr(self, name, value)
 
 
+def listed_container(item):
+    """Make a container record out of an account listing item."""
+
+    return Accessible(id=item["name"], name=item["name"],
+                      **{"x-container-object-count": str(item["count"]),
+                         "x-container-bytes-used": str(item["bytes"])})
+
+
+def object_key(container, name):
+    """Get the ID of a swift object, names are unique per container only.
+
+    Container names could not contain "/", so the ID is split back at the
+    first one.
+    """
+
+    return container + "/" + name
+
+
+def object_name(key):
+    """Get the name of a swift object from its ID.
+
+    IDs tracked before they had the container in them are the names.
+    """
+
+    return key.split("/", 1)[-1]
+
+
+def segments_container(container):
+    """Get the name of the container with segments of large objects."""
+
+    return container + "_segments"
+
+
+def listed_object(container, item):
+    """Make an object record out of a container listing item."""
+
+    return Accessible(id=object_key(container, item["name"]),
+                      name=item["name"], container=container,
+                      **{"content-length": str(item["bytes"]),
+                         "etag": item["hash"],
+                         "content-type": item["content_type"]})
+
+
 class Swift(object):
-    def __init__(self, client):
+    def __init__(self, client, verify_writes=False):
+        """Create an instance of `Swift` class
+
+        @param client: Swift connection
+        @type client: `swiftclient.client.Connection`
+
+        @param verify_writes: Get written containers and objects back
+        with a HEAD request, otherwise the returned records are made of
+        the request and the response headers
+        @type verify_writes: `bool`
+        """
+
         self.native = client
+        self.verify_writes = verify_writes
 
         actions = ["create", "delete", "find", "get", "list", "update"]
         components = ["container", "object"]
@@ -1409,11 +1563,108 @@ class Swift(object):
                 method = getattr(self, "_{0}_{1}".format(component, action))
                 setattr(component_obj, action, method)
 
+        self.objects.create_segmented = self._object_create_segmented
+        self.objects.read = self._object_read
+
+        self.local = threading.local()
+        self.pools = dict()
+        self.pool_lock = threading.Lock()
+
+    def _connection(self):
+        """Get a connection of the current worker thread.
+
+        Workers share the token of the main connection, a connection
+        could not be used by several threads at once.
+        """
+
+        if getattr(self.local, "connection", None) is None:
+            if self.native.token is None:
+                self.native.get_auth()
+            self.local.connection = Connection(
+                authurl=self.native.authurl, user=self.native.user,
+                key=self.native.key, retries=self.native.retries,
+                preauthurl=self.native.url, preauthtoken=self.native.token,
+                os_options=self.native.os_options,
+                auth_version=self.native.auth_version)
+
+        return self.local.connection
+
+    def _workers(self, size):
+        """Get the pool of worker threads of that size."""
+
+        with self.pool_lock:
+            if size not in self.pools:
+                self.pools[size] = pool.ThreadPool(size)
+
+            return self.pools[size]
+
+    def _written(self, read, response_dict, headers=None, **values):
+        """Make the record of a written container or object.
+
+        @param read: Gets the record from swift if writes are verified
+        @type read: `callable`
+
+        @param response_dict: Response filled in by the write
+        @type response_dict: `dict`
+
+        @param headers: Request headers
+        @type headers: `dict`
+
+        @param values: Values of the record known from the request
+        @type values: `dict`
+        """
+
+        if self.verify_writes:
+            return read()
+
+        record = Accessible()
+        for key, value in response_dict.get("headers", {}).iteritems():
+            # Those describe the body of the response
+            if key.lower() not in ["content-length", "content-type"]:
+                record[key.lower()] = value
+        for key, value in (headers or {}).iteritems():
+            record[key.lower()] = value
+        for key, value in values.iteritems():
+            if value is not None:
+                record[key] = value
+
+        return record
+
+    def _filter(self, records, head, filter):
+        """Filter listed records requesting metadata missing in them.
+
+        @param records: Records made of the listing
+        @type records: `list(Accessible)`
+
+        @param head: Returns headers of the record using the connection
+        @type head: `callable`
+
+        @param filter: Values the records must have
+        @type filter: `dict`
+        """
+
+        missing = [record for record in records
+                   if not set(filter).issubset(record)]
+        if missing:
+            key = metrics.registry.current()
+
+            def complete(record):
+                with metrics.registry.attributed(key):
+                    record.update(head(self._connection(), record))
+
+            self._workers(LISTING_PARALLELISM).map(complete, missing)
+
+        return [record for record in records
+                if filter.viewitems() <= record.viewitems()]
+
     def _container_create(self, name=None, headers=None, response_dict=None,
                           query_string=None):
+        if response_dict is None:
+            response_dict = dict()
         self.native.put_container(name, headers, response_dict, query_string)
 
-        return self.containers.get(name)
+        return self._written(lambda: self.containers.get(name), response_dict,
+                             headers, id=name, name=name)
 
     def _container_delete(self, container, response_dict=None,
                           query_string=None):
@@ -1432,9 +1683,8 @@ class Swift(object):
         return self.containers.list(**kwargs)
 
     @_obj_to_accessible()
-    def _container_get(self, container, marker=None, limit=None, prefix=None,
-                       delimiter=None, end_marker=None, path=None,
-                       full_listing=False, headers=None, query_string=None):
+    def _container_get(self, container, headers=None):
+        """Get metadata of the container without listing it."""
 
         if isinstance(container, str) or isinstance(container, unicode):
             to_get = container
@@ -1443,9 +1693,7 @@ class Swift(object):
         else:
             return
 
-        got = self.native.get_container(
-            to_get, marker, limit, prefix, delimiter, end_marker, path,
-            full_listing, headers, query_string)[0]
+        got = self.native.head_container(to_get, headers)
         got["id"] = to_get
         got["name"] = to_get
 
@@ -1454,16 +1702,13 @@ class Swift(object):
     def _container_list(self, marker=None, limit=None, prefix=None,
                         end_marker=None, full_listing=False, **filter):
 
-        filtered = []
         listed = self.native.get_account(marker, limit, prefix, end_marker,
                                          full_listing)[1]
 
-        for el in listed:
-            container = self.containers.get(el["name"])
-            if filter.viewitems() <= container.viewitems():
-                filtered.append(container)
-
-        return filtered
+        return self._filter(
+            [listed_container(item) for item in listed],
+            lambda connection, record: connection.head_container(
+                record.name), filter)
 
     def _container_update(self, container, headers, response_dict=None):
         if isinstance(container, str) or isinstance(container, unicode):
@@ -1473,9 +1718,13 @@ class Swift(object):
         else:
             return
 
+        if response_dict is None:
+            response_dict = dict()
         self.native.post_container(to_update, headers, response_dict)
 
-        return self.containers.get(to_update)
+        return self._written(lambda: self.containers.get(to_update),
+                             response_dict, headers, id=to_update,
+                             name=to_update)
 
     # ----------------------------------------------------------------------- #
 
@@ -1490,11 +1739,119 @@ class Swift(object):
         else:
             return
 
+        if response_dict is None:
+            response_dict = dict()
         self.native.put_object(
             in_container, name, content, content_length, etag, chunk_size,
             content_type, headers, query_string, response_dict)
 
-        return self.objects.get(in_container, name)
+        if content_length is None and isinstance(content, basestring):
+            content_length = len(content)
+
+        return self._written(
+            lambda: self.objects.get(in_container, name), response_dict,
+            headers, id=object_key(in_container, name), name=name,
+            container=in_container,
+            **{"content-length": (str(content_length)
+                                  if content_length is not None else None),
+               "content-type": content_type})
+
+    def _object_create_segmented(self, container, name, content,
+                                 content_length, segment_size, parallelism=4,
+                                 manifest="slo", timings=None,
+                                 uploaded=None):
+        """Upload a large object by segments in parallel.
+
+        Segments go to the "<container>_segments" container under the
+        "<name>/" prefix and the manifest is written when all of them are
+        uploaded.
+
+        @param content: Returns file-like content of the segment by its
+        offset and size
+        @type content: `callable`
+
+        @param segment_size: Size of every segment but the last one
+        @type segment_size: `int`
+
+        @param parallelism: Number of segments uploaded at once
+        @type parallelism: `int`
+
+        @param manifest: "slo" for static or "dlo" for dynamic manifest
+        @type manifest: `str`
+
+        @param timings: List to add (segment index, size, seconds) of
+        every uploaded segment to
+        @type timings: `list`
+
+        @param uploaded: List to add names of the uploaded segments to, it
+        is filled even if the upload fails
+        @type uploaded: `list`
+        """
+
+        if isinstance(container, str) or isinstance(container, unicode):
+            in_container = container
+        elif isinstance(container, Accessible):
+            in_container = container.name
+        else:
+            return
+
+        if manifest not in ["slo", "dlo"]:
+            raise ValueError("Unknown manifest type {}".format(manifest))
+
+        segments_in = segments_container(in_container)
+        prefix = "{0}/{1:.6f}/{2}/{3}/".format(name, time.time(),
+                                               content_length, segment_size)
+        segments = [(index, offset, min(segment_size,
+                                        content_length - offset))
+                    for index, offset in enumerate(
+                        xrange(0, content_length, segment_size) or [0])]
+
+        key = metrics.registry.current()
+
+        def upload(segment):
+            index, offset, size = segment
+            segment_name = "{0}{1:08d}".format(prefix, index)
+            started = time.time()
+            with metrics.registry.attributed(key):
+                etag = self._connection().put_object(
+                    segments_in, segment_name, content(offset, size),
+                    content_length=size)
+            if uploaded is not None:
+                uploaded.append(segment_name)
+
+            return {"path": "/{0}/{1}".format(segments_in, segment_name),
+                    "etag": etag, "size_bytes": size,
+                    "elapsed": time.time() - started, "index": index}
+
+        self.native.put_container(segments_in)
+        # Segments are uploaded by other threads
+        with metrics.registry.phase("api"):
+            written = self._workers(parallelism).map(upload, segments)
+
+        if timings is not None:
+            timings.extend((segment["index"], segment["size_bytes"],
+                            segment["elapsed"]) for segment in written)
+
+        response_dict = dict()
+        if manifest == "slo":
+            headers = {"X-Static-Large-Object": "True"}
+            self.native.put_object(
+                in_container, name, json.dumps(
+                    [dict((key, segment[key])
+                          for key in ["path", "etag", "size_bytes"])
+                     for segment in written]),
+                query_string="multipart-manifest=put",
+                response_dict=response_dict)
+        else:
+            headers = {"X-Object-Manifest": segments_in + "/" + prefix}
+            self.native.put_object(in_container, name, "", headers=headers,
+                                   response_dict=response_dict)
+
+        return self._written(
+            lambda: self.objects.get(in_container, name), response_dict,
+            headers, id=object_key(in_container, name), name=name,
+            container=in_container,
+            **{"content-length": str(content_length)})
 
     def _object_delete(self, container, object, query_string=None,
                        response_dict=None):
@@ -1527,8 +1884,9 @@ class Swift(object):
         return self.objects.list(in_container, **kwargs)
 
     @_obj_to_accessible()
-    def _object_get(self, container, object, resp_chunk_size=None,
-                    query_string=None, response_dict=None, headers=None):
+    def _object_get(self, container, object, headers=None,
+                    query_string=None):
+        """Get metadata of the object without downloading it."""
 
         if isinstance(container, str) or isinstance(container, unicode):
             in_container = container
@@ -1544,11 +1902,44 @@ class Swift(object):
         else:
             return
 
-        got = self.native.get_object(in_container, to_get, resp_chunk_size,
-                                     query_string, response_dict,
-                                     headers)[0]
-        got["id"] = to_get
+        got = self.native.head_object(in_container, to_get, headers,
+                                      query_string)
+        got["id"] = object_key(in_container, to_get)
         got["name"] = to_get
+        got["container"] = in_container
+
+        return got
+
+    @_obj_to_accessible()
+    def _object_read(self, container, object, resp_chunk_size=65536,
+                     query_string=None, response_dict=None, headers=None):
+        """Download the object body discarding it chunk by chunk.
+
+        @return: Metadata of the object with the number of bytes read
+        in "bytes_read"
+        """
+
+        if isinstance(container, str) or isinstance(container, unicode):
+            in_container = container
+        elif isinstance(container, Accessible):
+            in_container = container.name
+        else:
+            return
+
+        if isinstance(object, str) or isinstance(object, unicode):
+            to_read = object
+        elif isinstance(object, Accessible):
+            to_read = object.name
+        else:
+            return
+
+        got, body = self.native.get_object(in_container, to_read,
+                                           resp_chunk_size, query_string,
+                                           response_dict, headers)
+        got["bytes_read"] = sum(len(chunk) for chunk in body)
+        got["id"] = object_key(in_container, to_read)
+        got["name"] = to_read
+        got["container"] = in_container
 
         return got
 
@@ -1564,17 +1955,16 @@ class Swift(object):
         else:
             return
 
-        filtered = []
         listed = self.native.get_container(
             in_container, marker, limit, prefix, delimiter, end_marker, path,
             full_listing, headers, query_string)[1]
 
-        for el in listed:
-            object = self.objects.get(in_container, el["name"])
-            if filter.viewitems() <= object.viewitems():
-                filtered.append(object)
-
-        return [self.objects.get(in_container, el["name"]) for el in filtered]
+        # Pseudo-directories listed with a delimiter are not objects
+        return self._filter(
+            [listed_object(in_container, item) for item in listed
+             if "name" in item],
+            lambda connection, record: connection.head_object(
+                in_container, record.name), filter)
 
     def _object_update(self, container, object, headers, response_dict=None):
         if isinstance(container, str) or isinstance(container, unicode):
@@ -1591,7 +1981,12 @@ class Swift(object):
         else:
             return
 
+        if response_dict is None:
+            response_dict = dict()
         self.native.post_object(in_container, to_update, headers,
                                 response_dict)
 
-        return self.objects.get(in_container, to_update)
+        return self._written(
+            lambda: self.objects.get(in_container, to_update), response_dict,
+            headers, id=object_key(in_container, to_update), name=to_update,
+            container=in_container)
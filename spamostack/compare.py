@@ -0,0 +1,237 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import argparse
+import json
+
+import numpy
+
+import analyze
+
+# Latency percentiles compared, the mean is compared as well
+PERCENTILES = (50, 90, 99)
+STATISTICS = ["mean"] + ["p{}".format(percent) for percent in PERCENTILES]
+
+# Bootstrap resamples are drawn from that many durations at most, which
+# keeps a resamples x samples matrix of an action in a few tens of MB
+MAX_SAMPLES = 5000
+
+
+class Run(object):
+    def __init__(self, path):
+        """Durations and rates of the actions of one run.
+
+        Latencies are of the operations which were done, failed and
+        skipped ones take different paths through the cloud.
+
+        @param path: Results file written with --results
+        @type path: `str`
+        """
+
+        records, dictionaries = analyze.load(path)
+        self.path = path
+        actions = [tuple(action) for action in dictionaries["actions"]]
+        ok = records["outcome"] == dictionaries["outcomes"].index("ok")
+        if len(records):
+            elapsed = (records["start"] + records["duration"] / 1e6).max() - \
+                records["start"].min()
+        else:
+            elapsed = 0
+        self.elapsed = max(elapsed, 1e-6)
+
+        order = numpy.argsort(records["action"][ok], kind="mergesort")
+        durations = records["duration"][ok][order]
+        indexes = records["action"][ok][order]
+        unique, starts = numpy.unique(indexes, return_index=True)
+        self.durations = dict(
+            (actions[index], durations[start:end] / 1e6) for index, start, end
+            in zip(unique, starts, list(starts[1:]) + [len(durations)]))
+        self.counts = dict(
+            (actions[index], int(count)) for index, count in
+            enumerate(numpy.bincount(records["action"],
+                                     minlength=len(actions))))
+
+    def rate(self, action):
+        return self.counts.get(action, 0) / self.elapsed
+
+
+def _statistics(samples):
+    """Get the mean and the percentiles of every row of samples.
+
+    @param samples: Durations, one resample per row
+    @type samples: `numpy.ndarray`
+
+    @return: Statistics x rows array in the order of `STATISTICS`
+    """
+
+    samples = numpy.atleast_2d(samples)
+
+    return numpy.vstack([samples.mean(axis=1),
+                         numpy.percentile(samples, PERCENTILES, axis=1)])
+
+
+def bootstrap(before, after, resamples=1000, confidence=95.0,
+              rand=numpy.random):
+    """Get confidence intervals of the changes of latency statistics.
+
+    Both runs are resampled with replacement at once, every statistic of
+    every resample is computed over a resamples x samples matrix.
+
+    @param before: Durations of the action in the first run
+    @type before: `numpy.ndarray`
+
+    @param after: Durations of the action in the second run
+    @type after: `numpy.ndarray`
+
+    @return: Point estimates of the relative changes, low and high ends
+    of their intervals, arrays in the order of `STATISTICS`
+    """
+
+    def resample(durations):
+        if len(durations) > MAX_SAMPLES:
+            durations = durations[rand.randint(0, len(durations),
+                                               MAX_SAMPLES)]
+
+        return _statistics(durations[rand.randint(
+            0, len(durations), (resamples, len(durations)))])
+
+    base = _statistics(before)[:, 0]
+    changes = (resample(after) - resample(before)) / \
+        numpy.maximum(base, 1e-9)[:, numpy.newaxis]
+    tail = (100 - confidence) / 2.0
+    low, high = numpy.percentile(changes, [tail, 100 - tail], axis=1)
+
+    return (_statistics(after)[:, 0] - base) / numpy.maximum(base, 1e-9), \
+        low, high
+
+
+def compare(before, after, threshold=10.0, resamples=1000, confidence=95.0,
+            rand=numpy.random):
+    """Compare throughput and latencies of the actions of two runs.
+
+    A change is significant when its confidence interval does not include
+    zero, significant changes over the threshold are regressions.
+
+    @param before: The baseline run
+    @type before: `Run`
+
+    @param after: The run to check
+    @type after: `Run`
+
+    @param threshold: Percent of change flagged
+    @type threshold: `float`
+
+    @return: Rows of the comparison
+    """
+
+    rows = []
+    limit = threshold / 100.0
+    tail = (100 - confidence) / 2.0
+    for action in sorted(set(before.counts) & set(after.counts)):
+        name = analyze._name(action)
+
+        # Numbers of operations are resampled as Poisson counts
+        rate = before.rate(action)
+        if rate:
+            changes = (rand.poisson(after.counts[action], resamples) /
+                       after.elapsed - rand.poisson(before.counts[action],
+                                                    resamples) /
+                       before.elapsed) / rate
+            low, high = numpy.percentile(changes, [tail, 100 - tail])
+            rows.append(_row(name, "rate", rate, after.rate(action),
+                             (after.rate(action) - rate) / rate, low, high,
+                             -limit))
+
+        durations = before.durations.get(action), after.durations.get(action)
+        if durations[0] is None or durations[1] is None:
+            continue
+        changes, low, high = bootstrap(durations[0], durations[1], resamples,
+                                       confidence, rand)
+        values = _statistics(durations[0])[:, 0], \
+            _statistics(durations[1])[:, 0]
+        for index, statistic in enumerate(STATISTICS):
+            rows.append(_row(name, statistic, values[0][index],
+                             values[1][index], changes[index], low[index],
+                             high[index], limit))
+
+    return rows
+
+
+def _row(action, statistic, before, after, change, low, high, limit):
+    """Make a row of the comparison.
+
+    @param limit: Relative change which is a regression, negative for
+    statistics which are better when higher
+    @type limit: `float`
+    """
+
+    significant = low > 0 or high < 0
+    regression = significant and (change > limit if limit > 0
+                                  else change < limit)
+
+    return {"action": action, "statistic": statistic,
+            "before": float(before), "after": float(after),
+            "change": float(change) * 100, "low": float(low) * 100,
+            "high": float(high) * 100, "significant": bool(significant),
+            "regression": bool(regression)}
+
+
+def summary(rows):
+    """Render the comparison as text."""
+
+    lines = ["{0:<40} {1:>5} {2:>10} {3:>10} {4:>8} {5:>19}".format(
+        "action", "stat", "before", "after", "change", "interval")]
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else (
+            "*" if row["significant"] else "")
+        lines.append("{0:<40} {1:>5} {2:>10.4f} {3:>10.4f} {4:>+7.1f}% "
+                     "[{5:>+7.1f}%,{6:>+7.1f}%] {7}".format(
+                         row["action"], row["statistic"], row["before"],
+                         row["after"], row["change"], row["low"],
+                         row["high"], flag).rstrip())
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="spamostack compare",
+        description="Compare throughput and latencies of two runs written "
+                    "with --results, the exit code is 1 on regressions")
+    parser.add_argument("before", help="Results file of the baseline run")
+    parser.add_argument("after", help="Results file of the run to check")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent of significant change flagged as a "
+                             "regression")
+    parser.add_argument("--resamples", type=int, default=1000,
+                        help="Number of bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=95.0,
+                        help="Confidence level of the intervals in percent")
+    parser.add_argument("--seed", type=int,
+                        help="Seed of the resampling")
+    parser.add_argument("--json", dest="json",
+                        help="File to write the comparison to as JSON")
+    args = parser.parse_args(argv)
+
+    rand = numpy.random.RandomState(args.seed)
+    rows = compare(Run(args.before), Run(args.after), args.threshold,
+                   args.resamples, args.confidence, rand)
+
+    print(summary(rows))
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(rows, out, indent=2)
+
+    return 1 if any(row["regression"] for row in rows) else 0
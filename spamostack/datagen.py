@@ -0,0 +1,145 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import random
+import string
+import threading
+
+from faker.providers.lorem.en_US import Provider as LoremProvider
+from faker.providers.person.en_US import Provider as PersonProvider
+
+# Number of values generated at once when a buffer runs out
+BATCH_SIZE = 512
+
+WORDS = tuple(LoremProvider.word_list)
+FIRST_NAMES = tuple(PersonProvider.first_names)
+LAST_NAMES = tuple(PersonProvider.last_names)
+DOMAINS = ("example.com", "example.net", "example.org")
+SPECIAL_CHARS = "!@#$%^&*()_+"
+PASSWORD_CHARS = string.ascii_letters + string.digits + SPECIAL_CHARS
+
+
+class DataGenerator(object):
+    def __init__(self, seed=None, batch_size=BATCH_SIZE):
+        """Create an instance of `DataGenerator` class
+
+        Drop-in replacement for the faker methods used by the spam
+        classes. Values come from per-thread buffers filled in batches
+        out of faker's en_US word and name lists, so no faker code runs
+        per call and no state is shared between threads.
+
+        @param seed: Seed to get the same values on every run, every thread
+        gets its own sequence derived from the seed and the thread name
+        @type seed: `int`
+
+        @param batch_size: Number of values generated at once
+        @type batch_size: `int`
+        """
+
+        self._seed = seed
+        self.batch_size = batch_size
+        self.local = threading.local()
+
+    def seed(self, seed):
+        """Restart generation with the seed in every thread."""
+
+        self._seed = seed
+        self.local = threading.local()
+
+    def _state(self):
+        local = self.local
+        if not hasattr(local, "random"):
+            if self._seed is None:
+                local.random = random.Random()
+            else:
+                local.random = random.Random("{0}-{1}".format(
+                    self._seed, threading.current_thread().name))
+            local.buffers = collections.defaultdict(collections.deque)
+
+        return local
+
+    def _take(self, kind):
+        local = self._state()
+        buffer = local.buffers[kind]
+        if not buffer:
+            buffer.extend(getattr(self, "_batch_" + kind)(local.random))
+
+        return buffer.popleft()
+
+    def _batch_word(self, rand):
+        return [rand.choice(WORDS) for _ in xrange(self.batch_size)]
+
+    def _batch_name(self, rand):
+        return ["{0} {1}".format(rand.choice(FIRST_NAMES),
+                                 rand.choice(LAST_NAMES))
+                for _ in xrange(self.batch_size)]
+
+    def _batch_password(self, rand, length=10):
+        passwords = []
+        for _ in xrange(self.batch_size):
+            chars = [rand.choice(SPECIAL_CHARS), rand.choice(string.digits),
+                     rand.choice(string.ascii_uppercase),
+                     rand.choice(string.ascii_lowercase)]
+            chars.extend(rand.choice(PASSWORD_CHARS)
+                         for _ in xrange(length - len(chars)))
+            rand.shuffle(chars)
+            passwords.append("".join(chars))
+
+        return passwords
+
+    def _batch_safe_email(self, rand):
+        return ["{0}{1}@{2}".format(rand.choice(FIRST_NAMES).lower(),
+                                    rand.choice(WORDS), rand.choice(DOMAINS))
+                for _ in xrange(self.batch_size)]
+
+    def _sentence(self, rand):
+        words = [rand.choice(WORDS) for _ in xrange(rand.randint(4, 8))]
+
+        return " ".join(words).capitalize() + "."
+
+    def _batch_paragraph(self, rand):
+        return [" ".join(self._sentence(rand)
+                         for _ in xrange(rand.randint(2, 4)))
+                for _ in xrange(self.batch_size / 8 or 1)]
+
+    def rng(self):
+        """Get the random generator of the current thread."""
+
+        return self._state().random
+
+    def word(self):
+        return self._take("word")
+
+    def name(self):
+        return self._take("name")
+
+    def password(self):
+        return self._take("password")
+
+    def safe_email(self):
+        return self._take("safe_email")
+
+    def paragraph(self):
+        return self._take("paragraph")
+
+
+generator = DataGenerator()
+
+
+def seed(value):
+    """Make the shared generator reproducible."""
+
+    generator.seed(value)
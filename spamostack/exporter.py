@@ -0,0 +1,194 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import BaseHTTPServer
+import collections
+import logging
+import SocketServer
+import threading
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+ACTION_LABELS = ("pipe", "service", "resource", "action")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return (str(value).replace("\\", "\\\\").replace("\"", "\\\"").
+            replace("\n", "\\n"))
+
+
+def _labels(names, values, **extra):
+    pairs = zip(names, values) + sorted(extra.items())
+
+    return "{" + ",".join("{0}=\"{1}\"".format(name, _escape(value))
+                          for name, value in pairs) + "}"
+
+
+def _summary(histograms, names):
+    """Get samples of the summary of histograms in seconds."""
+
+    samples = []
+    for key, histogram in sorted(histograms.iteritems()):
+        for percent in metrics.PERCENTILES:
+            samples.append(("", _labels(names, key, quantile=percent / 100.0),
+                            histogram.percentile(percent) / 1e6))
+        labels = _labels(names, key)
+        samples.append(("_sum", labels, histogram.total / 1e6))
+        samples.append(("_count", labels, histogram.count))
+
+    return samples
+
+
+def render(registry=metrics.registry):
+    """Render the metrics of the registry in Prometheus text format."""
+
+    histograms = registry.snapshot()
+    phases = registry.snapshot("phases")
+    started, calls = registry.counters()
+    traffic = registry.traffic()
+    spans = registry.spans()
+    with registry.lock:
+        targets = dict(registry.targets)
+        drift = dict(registry.drift)
+
+    finished = collections.Counter()
+    for key, histogram in histograms.iteritems():
+        finished[key[:-1]] += histogram.count
+
+    lines = []
+
+    def metric(name, kind, help, samples):
+        lines.append("# HELP {0} {1}".format(name, help))
+        lines.append("# TYPE {0} {1}".format(name, kind))
+        for suffix, labels, value in samples:
+            lines.append("{0}{1}{2} {3!r}".format(name, suffix, labels,
+                                                  float(value)))
+
+    metric("spamostack_operations_issued_total", "counter",
+           "Operations started by action",
+           [("", _labels(ACTION_LABELS, key), count)
+            for key, count in sorted(started.iteritems())])
+    metric("spamostack_operations_total", "counter",
+           "Operations finished by action and outcome",
+           [("", _labels(ACTION_LABELS + ("outcome",), key), histogram.count)
+            for key, histogram in sorted(histograms.iteritems())])
+    metric("spamostack_operations_in_flight", "gauge",
+           "Operations running right now by action",
+           [("", _labels(ACTION_LABELS, key), count - finished[key])
+            for key, count in sorted(started.iteritems())])
+
+    metric("spamostack_operation_duration_seconds", "summary",
+           "Durations of operations by action and outcome",
+           _summary(histograms, ACTION_LABELS + ("outcome",)))
+    metric("spamostack_operation_phase_seconds", "summary",
+           "Time operations spend looking resources up, in their own API "
+           "requests and in spamostack",
+           _summary(phases, ACTION_LABELS + ("phase",)))
+
+    metric("spamostack_target_rate", "gauge",
+           "Configured operations per second by action",
+           [("", _labels(ACTION_LABELS, key), rate)
+            for key, rate in sorted(targets.iteritems())])
+    metric("spamostack_achieved_rate", "gauge",
+           "Finished operations per second by action while it was active",
+           [("", _labels(ACTION_LABELS, key),
+             finished[key] / max(span, 1e-6))
+            for key, span in sorted(spans.iteritems())])
+    metric("spamostack_api_calls_total", "counter",
+           "API requests by service",
+           [("", _labels(("service",), (service,)), count)
+            for service, count in sorted(calls.iteritems())])
+
+    requested = collections.Counter()
+    for key, (requests, sent, received) in traffic.iteritems():
+        requested[key[:-1]] += requests
+    traffic = sorted(traffic.iteritems())
+    labels = ACTION_LABELS + ("api",)
+    metric("spamostack_operation_requests_total", "counter",
+           "API requests by action they were made for and service",
+           [("", _labels(labels, key), requests)
+            for key, (requests, sent, received) in traffic])
+    metric("spamostack_operation_bytes_sent_total", "counter",
+           "Bytes of request bodies by action and service",
+           [("", _labels(labels, key), sent)
+            for key, (requests, sent, received) in traffic])
+    metric("spamostack_operation_bytes_received_total", "counter",
+           "Bytes of response bodies by action and service",
+           [("", _labels(labels, key), received)
+            for key, (requests, sent, received) in traffic])
+    metric("spamostack_requests_per_operation", "gauge",
+           "API requests made per finished operation by action",
+           [("", _labels(ACTION_LABELS, key),
+             requests / float(finished[key]))
+            for key, requests in sorted(requested.iteritems())
+            if finished[key]])
+
+    metric("spamostack_cache_drift_total", "counter",
+           "Differences of the cache from the cloud found by the reconciler",
+           [("", _labels(("service", "resource", "kind"), key), number)
+            for key, number in sorted(drift.iteritems())])
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ["/", "/metrics"]:
+            self.send_error(404)
+            return
+
+        body = render(self.server.registry)
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+class MetricsServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, registry=metrics.registry):
+        BaseHTTPServer.HTTPServer.__init__(self, address, MetricsHandler)
+        self.registry = registry
+
+
+def serve(port=5020, host="", registry=metrics.registry):
+    """Serve the metrics in a background thread.
+
+    Pages are rendered from merged per-thread metrics in the server
+    threads, worker threads are never blocked by scrapes.
+
+    @param port: Port to listen on
+    @type port: `int`
+
+    @param host: Address to listen on, all addresses by default
+    @type host: `str`
+    """
+
+    server = MetricsServer((host, port), registry)
+    thread = threading.Thread(target=server.serve_forever, name="metrics")
+    thread.daemon = True
+    thread.start()
+    log.info("Serving metrics on port {}".format(server.server_address[1]))
+
+    return server
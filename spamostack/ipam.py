@@ -0,0 +1,292 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import random
+import threading
+
+import netaddr
+
+
+class BuddyAllocator(object):
+    def __init__(self, cidr):
+        """Create an instance of `BuddyAllocator` class
+
+        Hands out CIDR blocks of an address pool. Free blocks are kept
+        as integers by prefix length, so allocation and release cost
+        O(prefix bits) whatever the size of the pool is.
+
+        @param cidr: Address pool, e.g. "192.0.0.0/8"
+        @type cidr: `str`
+        """
+
+        network = netaddr.IPNetwork(cidr)
+        self.version = network.version
+        self.width = 32 if network.version == 4 else 128
+        self.prefixlen = network.prefixlen
+        self.first = network.first
+        self.last = network.last
+        self.free = collections.defaultdict(set)
+        self.free[self.prefixlen].add(network.first)
+        self.used = dict()
+
+    def _size(self, prefixlen):
+        return 1 << (self.width - prefixlen)
+
+    def _cidr(self, start, prefixlen):
+        return netaddr.IPNetwork((start, prefixlen), version=self.version)
+
+    def _take(self, start, prefixlen, block, level):
+        """Take the block out of the free one containing it."""
+
+        self.free[level].remove(block)
+        while level < prefixlen:
+            level += 1
+            half = self._size(level)
+            if start & half:
+                self.free[level].add(block)
+                block += half
+            else:
+                self.free[level].add(block + half)
+        self.used[start] = prefixlen
+
+    def allocate(self, prefixlen):
+        """Get a free block or `None` if the pool has no room for it.
+
+        @param prefixlen: Prefix length of the block
+        @type prefixlen: `int`
+        """
+
+        if not self.prefixlen <= prefixlen <= self.width:
+            return None
+
+        for level in xrange(prefixlen, self.prefixlen - 1, -1):
+            if self.free[level]:
+                break
+        else:
+            return None
+
+        block = next(iter(self.free[level]))
+        self._take(block, prefixlen, block, level)
+
+        return self._cidr(block, prefixlen)
+
+    def reserve(self, cidr):
+        """Mark a block allocated elsewhere as used.
+
+        @param cidr: CIDR of the block
+        @type cidr: `netaddr.IPNetwork` or `str`
+
+        @return: `True` if the block was free
+        """
+
+        network = netaddr.IPNetwork(cidr)
+        if network.version != self.version:
+            return False
+        if network.first <= self.first and network.last >= self.last:
+            self.free.clear()
+            return True
+        if network.first < self.first or network.last > self.last:
+            return False
+
+        for level in xrange(network.prefixlen, self.prefixlen - 1, -1):
+            block = network.first & ~(self._size(level) - 1)
+            if block in self.free[level]:
+                self._take(network.first, network.prefixlen, block, level)
+                return True
+
+        return False
+
+    def release(self, cidr):
+        """Return a block to the pool merging it with free buddies.
+
+        @param cidr: CIDR of the block
+        @type cidr: `netaddr.IPNetwork` or `str`
+
+        @return: `True` if the block was allocated from that pool
+        """
+
+        network = netaddr.IPNetwork(cidr)
+        start = network.first
+        level = network.prefixlen
+        if (network.version != self.version or
+                self.used.get(start) != level):
+            return False
+
+        del self.used[start]
+        while level > self.prefixlen:
+            buddy = start ^ self._size(level)
+            if buddy not in self.free[level]:
+                break
+            self.free[level].remove(buddy)
+            start = min(start, buddy)
+            level -= 1
+        self.free[level].add(start)
+
+        return True
+
+
+class Ipam(object):
+    def __init__(self, store=None, pools=("192.0.0.0/8", "fd00::/8"),
+                 prefixlens=(28, 29), prefixlens_v6=(64,), ipv6_ratio=0.0):
+        """Create an instance of `Ipam` class
+
+        Keeps the allocation map of every network, subnets of one
+        network never overlap while different networks reuse the pools.
+        Subnets a network already has are recorded in the map once.
+
+        @param store: Store to persist the map in, opened by the cache
+        backend, the map lives in memory only if `None`
+        @type store: `backends.LevelDBStore`
+
+        @param pools: CIDRs of the IPv4 and IPv6 address pools, tried
+        in order
+        @type pools: `list(str)`
+
+        @param prefixlens: Prefix lengths of IPv4 subnets to choose from
+        @type prefixlens: `list(int)`
+
+        @param prefixlens_v6: Prefix lengths of IPv6 subnets to choose from
+        @type prefixlens_v6: `list(int)`
+
+        @param ipv6_ratio: Share of IPv6 subnets, from 0 to 1
+        @type ipv6_ratio: `float`
+        """
+
+        self.store = store
+        self.networks = dict()
+        self.maps = collections.defaultdict(set)
+        self.prefixlens = dict()
+        self.lock = threading.Lock()
+        self.configure(pools, prefixlens, prefixlens_v6, ipv6_ratio)
+
+        for key, value in (store.items() if store is not None else []):
+            network_id, cidr = key.split(" ", 1)
+            self.maps[network_id].add(cidr)
+
+    def configure(self, pools=None, prefixlens=None, prefixlens_v6=None,
+                  ipv6_ratio=None):
+        """Change the settings for the networks not seen yet."""
+
+        if pools is not None:
+            self.pools = list(pools)
+        if prefixlens is not None:
+            self.prefixlens[4] = list(prefixlens)
+        if prefixlens_v6 is not None:
+            self.prefixlens[6] = list(prefixlens_v6)
+        if ipv6_ratio is not None:
+            self.ipv6_ratio = ipv6_ratio
+
+    def _record(self, network_id, cidrs):
+        cidrs = [str(cidr) for cidr in cidrs]
+        self.maps[network_id].update(cidrs)
+        if self.store is not None:
+            self.store.write(puts=[("{0} {1}".format(network_id, cidr), "")
+                                   for cidr in cidrs])
+
+    def _unrecord(self, network_id, cidrs):
+        cidrs = [str(cidr) for cidr in cidrs]
+        self.maps[network_id].difference_update(cidrs)
+        if self.store is not None:
+            self.store.write(deletes=["{0} {1}".format(network_id, cidr)
+                                      for cidr in cidrs])
+
+    def allocators(self, network_id, existing=None):
+        """Get the pools of the network seeding them on the first use.
+
+        @param existing: Returns CIDRs of the subnets the network has, not
+        called if the network is in the persisted map already
+        @type existing: `callable`
+        """
+
+        with self.lock:
+            allocators = self.networks.get(network_id)
+            cidrs = self.maps.get(network_id)
+        if allocators is not None:
+            return allocators
+
+        if cidrs is None:
+            # "-" marks a network recorded without subnets
+            cidrs = ["-"] + [str(cidr) for cidr in
+                             (existing() if existing is not None else [])]
+            with self.lock:
+                self._record(network_id, cidrs)
+
+        allocators = [BuddyAllocator(pool) for pool in self.pools]
+        for cidr in cidrs:
+            if cidr == "-":
+                continue
+            for allocator in allocators:
+                allocator.reserve(cidr)
+
+        with self.lock:
+            return self.networks.setdefault(network_id, allocators)
+
+    def allocate(self, network_id, existing=None, version=None,
+                 prefixlen=None):
+        """Allocate a subnet CIDR for the network.
+
+        @param network_id: ID of the network
+        @type network_id: `str`
+
+        @param existing: Returns CIDRs of the subnets the network has,
+        called once per network
+        @type existing: `callable`
+
+        @param version: IP version, picked by `ipv6_ratio` if `None`
+        @type version: `int`
+
+        @param prefixlen: Prefix length, random one of the prefix lengths
+        of the version if `None`
+        @type prefixlen: `int`
+
+        @return: `netaddr.IPNetwork` or `None` if the pools are exhausted
+        """
+
+        if version is None:
+            version = 6 if random.random() < self.ipv6_ratio else 4
+        if prefixlen is None:
+            prefixlen = random.choice(self.prefixlens[version])
+        allocators = self.allocators(network_id, existing)
+
+        with self.lock:
+            for allocator in allocators:
+                if allocator.version != version:
+                    continue
+                cidr = allocator.allocate(prefixlen)
+                if cidr is not None:
+                    self._record(network_id, [cidr])
+                    return cidr
+
+        return None
+
+    def release(self, network_id, cidr):
+        """Return the subnet CIDR of the network to its pool."""
+
+        with self.lock:
+            for allocator in self.networks.get(network_id, []):
+                if allocator.release(cidr):
+                    self._unrecord(network_id, [netaddr.IPNetwork(cidr)])
+                    return True
+
+        return False
+
+    def forget(self, network_id):
+        """Drop the allocation map of a deleted network."""
+
+        with self.lock:
+            self.networks.pop(network_id, None)
+            self._unrecord(network_id, list(self.maps.get(network_id, [])))
+            self.maps.pop(network_id, None)
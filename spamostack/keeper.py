@@ -15,8 +15,10 @@
 
 import logging
 import random
-import traceback
 
+import logger
+import metrics
+from reconciler import project_of
 from spam_factory import SpamFactory
 
 log = logging.getLogger(__name__)
@@ -35,6 +37,8 @@ class Keeper(object):
 
         self.cache = cache
         self.client_factory = client_factory
+        self.reconciler = None
+        self.keypool = None
         self.spam_factory = SpamFactory(self.cache, self.client_factory.user,
                                         self)
         self.default_init()
@@ -46,7 +50,8 @@ class Keeper(object):
         client = getattr(self.client_factory, "keystone")()
         user = client.users.find(name="admin")
         project = client.projects.find(name="admin")
-        self.cache["keystone"]["users"][user.id] = False
+        self.project_id = project.id
+        self.cache["keystone"]["users"].add(user.id)
 
         # quotas update
         self.client_factory.cinder().quotas.update(
@@ -63,6 +68,55 @@ class Keeper(object):
             ram=-1, security_group_rules=-1, security_groups=-1,
             server_group_members=-1, server_groups=-1)
 
+    def listing(self, client_name, resource_name, resource, list_args):
+        """List resources preferring the view of the reconciler.
+
+        Views have the resources of all the projects, for services which
+        list the current project only the ones of the project of the keeper
+        are taken, as its own listing would have. Resources the workload
+        changed since they were listed are got again first.
+        """
+
+        if self.reconciler is not None and not list_args:
+            self.refresh(client_name, resource_name, resource)
+            view = self.reconciler.view(client_name, resource_name)
+            if view is not None:
+                return [item for item in view
+                        if project_of(client_name, item) in
+                        [None, self.project_id]]
+
+        return list(resource.list(*list_args))
+
+    def refresh(self, client_name, resource_name, resource):
+        """Get the stale resources of the view again."""
+
+        for key in self.reconciler.stale(client_name, resource_name):
+            try:
+                item = resource.get(key)
+            except Exception as exc:
+                logger.exception(log, exc)
+                item = None
+            self.reconciler.refreshed(client_name, resource_name, key, item)
+
+    def touch(self, client_name, resource_name, key):
+        """Tell the reconciler about a resource changed by the workload."""
+
+        if self.reconciler is not None:
+            self.reconciler.invalidate(client_name, resource_name, key)
+
+    def remember(self, client_name, resource_name, resource):
+        """Tell the reconciler about a resource created by the workload."""
+
+        if self.reconciler is not None:
+            self.reconciler.remember(client_name, resource_name, resource)
+
+    def forget(self, client_name, resource_name, key):
+        """Tell the reconciler about a resource deleted by the workload."""
+
+        if self.reconciler is not None:
+            self.reconciler.forget(client_name, resource_name, key)
+
+    @metrics.phased("lookup")
     def get(self, client_name, resource_name, param=None, func=None,
             *args, **kwargs):
         """Get a resource.
@@ -108,12 +162,13 @@ class Keeper(object):
         resource = getattr(client, resource_name)
         result = None
 
-        log.info("Trying get info about {resource} from {client}".
-                 format(resource=resource_name, client=client_name))
+        log.info("Trying get info about %s from %s",
+                 resource_name, client_name)
         if func is not None and param is not None:
             result = []
             try:
-                for el in list(resource.list(*list_args)):
+                for el in self.listing(client_name, resource_name, resource,
+                                       list_args):
                     if not args and not kwargs:
                         probe = getattr(el, param)
                     else:
@@ -122,9 +177,7 @@ class Keeper(object):
                     if func(probe):
                         result.append(el)
             except Exception as exc:
-                log.critical("Exception: {}".format(exc))
-                traceback.print_exc()
-                pass
+                logger.exception(log, exc)
         elif func is None and param is not None:
             try:
                 if not args and not kwargs:
@@ -132,13 +185,12 @@ class Keeper(object):
                 else:
                     result = getattr(resource, param)(*args, **kwargs)
             except Exception as exc:
-                log.critical("Exception: {}".format(exc))
-                traceback.print_exc()
-                pass
+                logger.exception(log, exc)
         elif func is not None and param is None:
             result = []
             try:
-                for el in list(resource.list(*list_args)):
+                for el in self.listing(client_name, resource_name, resource,
+                                       list_args):
                     params = []
                     for arg in args:
                         params.append(getattr(el, arg))
@@ -146,11 +198,10 @@ class Keeper(object):
                     if func(*params):
                         result.append(el)
             except Exception as exc:
-                log.critical("Exception: {}".format(exc))
-                traceback.print_exc()
-                pass
+                logger.exception(log, exc)
         elif func is None and param is None:
-            possibilities = list(resource.list(*list_args))
+            possibilities = self.listing(client_name, resource_name,
+                                         resource, list_args)
             if len(possibilities) > 0:
                 result = random.choice(possibilities)
 
@@ -173,13 +224,13 @@ class Keeper(object):
             components = component_names
 
         for client_name in components:
-            log.debug("Start cleaning for {} client".format(client_name))
+            log.debug("Start cleaning for %s client", client_name)
 
             client = getattr(self.spam_factory, "spam_" + client_name)()
             resources = self.cache[client_name].keys()
 
             for resource_name in resources:
-                log.debug("Cleaning {} resource".format(resource_name))
+                log.debug("Cleaning %s resource", resource_name)
                 resource_obj = getattr(client.spam, resource_name)
                 while resource_obj.delete():
                         pass
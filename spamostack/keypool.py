@@ -0,0 +1,232 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import logging
+import multiprocessing
+import os
+import random
+import threading
+
+from Crypto.PublicKey import RSA
+
+import logger
+
+log = logging.getLogger(__name__)
+
+KEY_TYPES = ["rsa", "ed25519"]
+
+
+def generate(key_type="rsa", bits=2048):
+    """Generate a public key in OpenSSH format.
+
+    @param key_type: One of `KEY_TYPES`
+    @type key_type: `str`
+
+    @param bits: Size of RSA keys
+    @type bits: `int`
+    """
+
+    if key_type == "rsa":
+        return RSA.generate(bits).publickey().exportKey("OpenSSH")
+    elif key_type == "ed25519":
+        # cryptography is needed for ed25519 keys only
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+        from cryptography.hazmat.primitives import serialization
+
+        return ed25519.Ed25519PrivateKey.generate().public_key().public_bytes(
+            serialization.Encoding.OpenSSH,
+            serialization.PublicFormat.OpenSSH)
+
+    raise ValueError("Unknown key type {0}, use one of: {1}".format(
+        key_type, ", ".join(KEY_TYPES)))
+
+
+def _generate(args):
+    return generate(*args)
+
+
+class KeyPool(object):
+    def __init__(self, key_type="rsa", bits=2048, size=100, path=None,
+                 processes=None):
+        """Create an instance of `KeyPool` class
+
+        Keeps public keys generated ahead of time by a process pool, so
+        creating a keypair does not hold the GIL for key generation. When
+        fresh keys run out the ones handed out before are reused, nova
+        does not require public keys to be unique.
+
+        @param key_type: One of `KEY_TYPES`
+        @type key_type: `str`
+
+        @param bits: Size of RSA keys
+        @type bits: `int`
+
+        @param size: Number of fresh keys to keep ready
+        @type size: `int`
+
+        @param path: File to keep generated keys in for the next runs,
+        keys are appended as they are generated and the file is rewritten
+        with the ones which were not handed out on `stop`
+        @type path: `str`
+
+        @param processes: Number of generating processes, half of CPUs
+        if `None`
+        @type processes: `int`
+        """
+
+        if key_type not in KEY_TYPES:
+            raise ValueError("Unknown key type {0}, use one of: {1}".format(
+                key_type, ", ".join(KEY_TYPES)))
+
+        self.key_type = key_type
+        self.bits = bits
+        self.size = size
+        self.path = path
+        self.processes = processes or max(1, multiprocessing.cpu_count() / 2)
+        self.ready = collections.deque()
+        self.used = []
+        self.lock = threading.Lock()
+        self.wanted = threading.Event()
+        self.pool = None
+
+        self.load()
+
+    @property
+    def prefix(self):
+        """Prefix of the lines of the keys file."""
+
+        return "{0} {1} ".format(self.key_type, self.bits)
+
+    def load(self):
+        """Load keys generated by the previous runs."""
+
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        with open(self.path) as keys:
+            for line in keys:
+                if line.startswith(self.prefix):
+                    self.ready.append(line[len(self.prefix):].strip())
+
+        log.info("Loaded {0} {1} keys from {2}".format(
+            len(self.ready), self.key_type, self.path))
+
+    def save(self, keys):
+        if self.path is None:
+            return
+
+        with open(self.path, "a") as keys_file:
+            for key in keys:
+                keys_file.write(self.prefix + key + "\n")
+
+    def store(self):
+        """Rewrite the keys file with the keys which were not handed out.
+
+        Keys of other types and sizes are kept as they are.
+        """
+
+        if self.path is None:
+            return
+
+        others = []
+        if os.path.exists(self.path):
+            with open(self.path) as keys_file:
+                others = [line for line in keys_file
+                          if not line.startswith(self.prefix)]
+        with self.lock:
+            ready = list(self.ready)
+
+        with open(self.path + ".tmp", "w") as keys_file:
+            keys_file.writelines(others)
+            for key in ready:
+                keys_file.write(self.prefix + key + "\n")
+        os.rename(self.path + ".tmp", self.path)
+
+        log.info("Kept {0} unused {1} keys in {2}".format(
+            len(ready), self.key_type, self.path))
+
+    def start(self):
+        """Start generating processes and the thread feeding them.
+
+        Processes are forked, so the pool should be started before any
+        other thread, a lock held by one at the fork stays locked in them.
+        """
+
+        self.pool = multiprocessing.Pool(self.processes)
+        thread = threading.Thread(target=self.fill, name="keypool")
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """Terminate generating processes and rewrite the keys file."""
+
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.terminate()
+
+        self.store()
+
+    def fill(self):
+        while True:
+            with self.lock:
+                missing = self.size - len(self.ready)
+
+            if missing <= 0:
+                self.wanted.clear()
+                self.wanted.wait(1)
+                continue
+
+            try:
+                keys = self.pool.map(_generate,
+                                     [(self.key_type, self.bits)] * missing)
+            except AttributeError:
+                # The pool was stopped
+                return
+            except Exception as exc:
+                logger.exception(log, exc)
+                return
+
+            with self.lock:
+                if self.pool is None:
+                    return
+                self.save(keys)
+                self.ready.extend(keys)
+
+    def get(self):
+        """Get a public key in OpenSSH format.
+
+        Falls back to reusing handed out keys and then to generating a key
+        right away if the pool is empty.
+        """
+
+        with self.lock:
+            if self.ready:
+                key = self.ready.popleft()
+                if len(self.used) < self.size:
+                    self.used.append(key)
+            elif self.used:
+                key = random.choice(self.used)
+            else:
+                key = None
+
+            if len(self.ready) < self.size / 2:
+                self.wanted.set()
+
+        if key is None:
+            key = generate(self.key_type, self.bits)
+
+        return key
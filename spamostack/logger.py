@@ -14,6 +14,16 @@
 # under the License.
 
 import logging
+import os
+import Queue
+import sys
+import threading
+
+import metrics
+
+# Fields of the sampled exception kept for the report of its repeats
+SAMPLE_FIELDS = ("name", "levelno", "levelname", "pathname", "filename",
+                 "lineno")
 
 
 class SpamFileHandler(logging.FileHandler):
@@ -34,3 +44,216 @@ class SpamStreamHandler(logging.StreamHandler):
         fmt_date = '%Y-%m-%dT%T%Z'
         formatter = logging.Formatter(fmt, fmt_date)
         self.setFormatter(formatter)
+
+
+class AsyncHandler(logging.Handler):
+
+    def __init__(self, handlers, rate=10.0, interval=60.0, size=10000):
+        """Create an instance of `AsyncHandler` class
+
+        Records are put into a queue and written by the handlers in a
+        background thread, so messages are formatted there and threads
+        logging them never wait for the stream. Messages below WARNING
+        are limited to the rate per line of the code logging them.
+        Repeated exceptions of a line are written with their traceback
+        once per interval, the number of the rest is written at the end
+        of the interval.
+
+        @param handlers: Handlers writing the records
+        @type handlers: `list(logging.Handler)`
+
+        @param rate: Messages per second per line of the code, 0 turns
+        the limit off
+        @type rate: `float`
+
+        @param interval: Seconds between samples of repeated exceptions
+        and reports of suppressed messages
+        @type interval: `float`
+
+        @param size: Number of records queued, the ones over it are dropped
+        @type size: `int`
+        """
+
+        logging.Handler.__init__(self)
+        self.handlers = handlers
+        self.rate = float(rate)
+        self.interval = interval
+        self.queue = Queue.Queue(size)
+        self.pid = os.getpid()
+        # Tokens and time of the last message by line for the rate limit
+        self.buckets = dict()
+        # Suppressed messages by line
+        self.suppressed = dict()
+        # Repeats, start of the interval and the sample by line and type
+        # of the exception
+        self.exceptions = dict()
+        self.dropped = 0
+        self.limits = threading.Lock()
+        self.last_summary = metrics.monotonic()
+        self.thread = threading.Thread(target=self.write, name="logger")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _allowed(self, record, now):
+        if record.exc_info:
+            key = (record.pathname, record.lineno, record.exc_info[0])
+            with self.limits:
+                repeated = self.exceptions.get(key)
+                if repeated is None or now - repeated[1] >= self.interval:
+                    self.exceptions[key] = [0, now, dict(
+                        (name, getattr(record, name))
+                        for name in SAMPLE_FIELDS)]
+                    return True
+                repeated[0] += 1
+                return False
+
+        if not self.rate or record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.pathname, record.lineno)
+        with self.limits:
+            burst = max(self.rate, 1.0)
+            tokens, last = self.buckets.get(key, (burst, now))
+            tokens = min(tokens + (now - last) * self.rate, burst)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                return True
+            self.buckets[key] = (tokens, now)
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+
+        return False
+
+    def handle(self, record):
+        # Records are queued without taking the lock of the handler
+        allowed = self.filter(record)
+        if allowed:
+            self.emit(record)
+
+        return allowed
+
+    def emit(self, record):
+        if os.getpid() != self.pid:
+            # Forked processes have no writer thread
+            self.handle_all(record)
+            return
+
+        if not self._allowed(record, metrics.monotonic()):
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except Queue.Full:
+            self.dropped += 1
+
+    def handle_all(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def summarize(self, now, force=False):
+        """Write numbers of suppressed messages and exceptions.
+
+        @param force: Write them before their intervals are over
+        @type force: `bool`
+        """
+
+        records = []
+        with self.limits:
+            for key, (count, started, sample) in self.exceptions.items():
+                if now - started < self.interval and not force:
+                    continue
+                del self.exceptions[key]
+                if count:
+                    sample.update(
+                        msg="%s was raised %d more times in %.0f s",
+                        args=(key[2].__name__, count, now - started))
+                    records.append(logging.makeLogRecord(sample))
+
+            if force or now - self.last_summary >= self.interval:
+                suppressed, self.suppressed = self.suppressed, dict()
+                dropped, self.dropped = self.dropped, 0
+                self.last_summary = now
+            else:
+                suppressed, dropped = {}, 0
+
+        for (pathname, lineno), count in sorted(suppressed.iteritems()):
+            records.append(logging.makeLogRecord({
+                "levelno": logging.INFO, "levelname": "INFO",
+                "pathname": pathname, "filename": os.path.basename(pathname),
+                "lineno": lineno, "msg": "%d messages were suppressed",
+                "args": (count,)}))
+        if dropped:
+            records.append(logging.makeLogRecord({
+                "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "%d messages were dropped, the queue was full",
+                "args": (dropped,)}))
+
+        for record in records:
+            self.handle_all(record)
+
+    def write(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=1)
+            except Queue.Empty:
+                record = None
+
+            try:
+                if record is not None:
+                    self.handle_all(record)
+                self.summarize(metrics.monotonic())
+            except Exception:
+                self.handleError(record or logging.makeLogRecord({}))
+            finally:
+                if record is not None:
+                    self.queue.task_done()
+
+    def flush(self):
+        """Wait for the queued records to be written and write summaries.
+
+        Called by `logging.shutdown` at exit, so the numbers of the last
+        interval are not lost.
+        """
+
+        if os.getpid() == self.pid and self.thread.is_alive():
+            self.queue.join()
+        self.summarize(metrics.monotonic(), force=True)
+        for handler in self.handlers:
+            handler.flush()
+
+
+def exception(log, exc, depth=1):
+    """Log the caught exception with its traceback.
+
+    The record is made for the line `depth` frames up the stack, so
+    helpers logging exceptions for their callers keep repeats of every
+    caller sampled apart.
+
+    @param log: Logger to log to
+    @type log: `logging.Logger`
+
+    @param exc: The caught exception
+    @type exc: `Exception`
+
+    @param depth: Number of frames between the caller and the line
+    @type depth: `int`
+    """
+
+    if not log.isEnabledFor(logging.CRITICAL):
+        return
+
+    frame = sys._getframe(depth)
+    log.handle(log.makeRecord(log.name, logging.CRITICAL,
+                              frame.f_code.co_filename, frame.f_lineno,
+                              "Exception: %s", (exc,), sys.exc_info(),
+                              frame.f_code.co_name))
+
+
+def install(loggers, rate=10.0, interval=60.0):
+    """Move handlers of the loggers behind `AsyncHandler`."""
+
+    for logger in loggers:
+        handlers = list(logger.handlers)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(AsyncHandler(handlers, rate, interval))
@@ -14,6 +14,7 @@
 # under the License.
 
 import argparse
+import atexit
 import collections
 import json
 import logging
@@ -23,8 +24,16 @@ import sys
 from cache import Cache
 from client_factory import ClientFactory
 import coloredlogs
+import datagen
+import exporter
 from keeper import Keeper
+from keypool import KeyPool
 import logger
+import metrics
+import profiler
+from reconciler import Reconciler
+import report
+from results import ResultSink
 from simulator import Simulator
 
 
@@ -34,11 +43,75 @@ parser.add_argument('--conf', dest='conf',
                     help='Path to the config file with pipes')
 parser.add_argument('--db', dest='db', default='./db',
                     help='Path to the database directory')
+parser.add_argument('--cache-backend', dest='cache_backend',
+                    default='leveldb',
+                    choices=['leveldb', 'memory', 'sqlite'],
+                    help='Storage for the cache, memory one keeps nothing '
+                         'on the disk, sqlite one could be shared by '
+                         'several processes')
+parser.add_argument('--reconcile-interval', dest='reconcile_interval',
+                    type=int, default=30,
+                    help='Seconds between background refreshes of the cache '
+                         'against the cloud, 0 disables them')
+parser.add_argument('--subnet-pools', dest='subnet_pools', nargs='+',
+                    default=['192.0.0.0/8', 'fd00::/8'],
+                    help='IPv4 and IPv6 address pools to allocate subnets '
+                         'from')
+parser.add_argument('--subnet-prefixes', dest='subnet_prefixes', nargs='+',
+                    type=int, default=[28, 29],
+                    help='Prefix lengths of the allocated IPv4 subnets')
+parser.add_argument('--subnet-prefixes-v6', dest='subnet_prefixes_v6',
+                    nargs='+', type=int, default=[64],
+                    help='Prefix lengths of the allocated IPv6 subnets')
+parser.add_argument('--ipv6-ratio', dest='ipv6_ratio', type=float,
+                    default=0.0,
+                    help='Share of IPv6 subnets, from 0 to 1')
+parser.add_argument('--keypair-type', dest='keypair_type', default='rsa',
+                    choices=['rsa', 'ed25519'],
+                    help='Type of the keys of created keypairs')
+parser.add_argument('--keypair-bits', dest='keypair_bits', type=int,
+                    default=2048, help='Size of RSA keys')
+parser.add_argument('--keypair-pool', dest='keypair_pool', type=int,
+                    default=100,
+                    help='Number of keys generated ahead of time in '
+                         'background processes, 0 disables the pool')
+parser.add_argument('--keypair-file', dest='keypair_file',
+                    help='File to keep generated keys in for the next runs')
+parser.add_argument('--seed', dest='seed', type=int,
+                    help='Seed to generate the same names, passwords and '
+                         'texts on every run')
+parser.add_argument('--metrics-port', dest='metrics_port', type=int,
+                    default=5020,
+                    help='Port to serve metrics in Prometheus format on, '
+                         '0 disables the endpoint')
+parser.add_argument('--results', dest='results',
+                    help='File to write the binary record of every '
+                         'operation to')
+parser.add_argument('--profile', dest='profile', choices=profiler.MODES,
+                    help='Profile spamostack itself, either every pipe '
+                         'thread with cProfile or all the threads with a '
+                         'sampling profiler')
+parser.add_argument('--profile-output', dest='profile_output',
+                    help='File to write the profile to, spamostack.prof or '
+                         'spamostack.folded by default')
+parser.add_argument('--profile-interval', dest='profile_interval',
+                    type=float, default=0.01,
+                    help='Seconds between samples of the sampling profiler')
+parser.add_argument('--log-rate', dest='log_rate', type=float, default=10.0,
+                    help='Messages below WARNING per second written from '
+                         'every line of the code, 0 writes all of them')
+parser.add_argument('--log-interval', dest='log_interval', type=float,
+                    default=60.0,
+                    help='Seconds between tracebacks of repeated exceptions '
+                         'and reports of suppressed messages')
 parser.add_argument('--verbose', action='store_true',
                     help='Increase verbose output')
 parser.add_argument('--clean', dest='clean', nargs='+',
                     help='Path to the database directory')
-args = parser.parse_args()
+# Commands working with the results of finished runs
+COMMANDS = ["analyze", "compare"]
+command = sys.argv[1] if sys.argv[1:2] and sys.argv[1] in COMMANDS else None
+args = parser.parse_args([] if command else None)
 
 log = logging.getLogger(__name__)
 if args.verbose:
@@ -52,15 +125,44 @@ coloredlogs.install(level=level)
 
 
 def main():
+    if command == "analyze":
+        # numpy is needed for the analysis only
+        import analyze
+
+        return analyze.main(sys.argv[2:])
+    if command == "compare":
+        import compare
+
+        return compare.main(sys.argv[2:])
+
+    # Key generating processes are forked before any thread is started
+    keypool = None
+    if args.keypair_pool > 0 and not args.clean:
+        log.debug("Starting keypair pool")
+        keypool = KeyPool(args.keypair_type, args.keypair_bits,
+                          args.keypair_pool, args.keypair_file)
+        keypool.start()
+        atexit.register(keypool.stop)
+
+    # Records are written in a background thread
+    logger.install([log, logging.getLogger()], args.log_rate,
+                   args.log_interval)
+
     try:
         if args.conf:
             log.info("Reading conf from {}".format(args.conf))
             with open(args.conf, 'r') as pipes_file:
                 conf = json.load(pipes_file,
                                  object_pairs_hook=collections.OrderedDict)
+            # Objectives checked when the pipes are over
+            slos = [report.Slo(slo) for slo in conf.pop("slo", [])]
 
         simulators = []
-        cache = Cache(args.db)
+        if args.seed is not None:
+            datagen.seed(args.seed)
+        cache = Cache(args.db, args.cache_backend)
+        cache.ipam.configure(args.subnet_pools, args.subnet_prefixes,
+                             args.subnet_prefixes_v6, args.ipv6_ratio)
 
         admin_user = cache["users"]["admin"]
         admin_user["auth_url"] = cache["api"]["auth_url"]
@@ -75,24 +177,53 @@ def main():
 
         # This section for default initialization of cirros image
         log.debug("Caching default cirros image")
-        (cache["glance"]["images"]
-         [admin_keeper.get(
-             "glance", "images", "name",
-             lambda x: x == "cirros-0.3.4-x86_64-uec")[0].id]) = False
+        cache["glance"]["images"].add(admin_keeper.get(
+            "glance", "images", "name",
+            lambda x: x == "cirros-0.3.4-x86_64-uec")[0].id)
         for flavor in admin_factory.nova().flavors.list():
             log.debug("Caching flavor with name {name}".
                       format(name=flavor.name))
-            (cache["nova"]["flavors"][flavor.id]) = False
+            cache["nova"]["flavors"].add(flavor.id)
+
+        admin_keeper.keypool = keypool
+
+        if args.reconcile_interval > 0:
+            log.debug("Starting background reconciliation")
+            admin_keeper.reconciler = Reconciler(cache, admin_factory,
+                                                 args.reconcile_interval)
+            admin_keeper.reconciler.start()
+
+        if args.results:
+            metrics.registry.sink = ResultSink(
+                args.results, targets=metrics.registry.targets)
+            # Called when the pipe threads are over
+            atexit.register(metrics.registry.sink.close,
+                            metrics.registry.targets)
+
+        if args.metrics_port > 0:
+            exporter.serve(args.metrics_port)
+
+        if args.profile:
+            profiler.active = profiler.Profiler(args.profile,
+                                                args.profile_output,
+                                                args.profile_interval)
+            profiler.active.start()
+            atexit.register(profiler.active.stop)
 
         for pipe_name, pipe in conf.iteritems():
             simulators.append(Simulator(pipe_name, pipe, cache, admin_keeper))
 
-        for simulator in simulators:
-            simulator.simulate()
+        threads = [simulator.simulate() for simulator in simulators]
+        for thread in threads:
+            # Joined with a timeout to get KeyboardInterrupt
+            while thread.is_alive():
+                thread.join(1)
+
+        return report.finish(slos)
     except KeyboardInterrupt:
         print('\nThe process was interrupted by the user')
         raise SystemExit
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,537 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import contextlib
+import ctypes
+import ctypes.util
+import functools
+import threading
+import time
+
+# Every power of two range is split into that many linear buckets,
+# which keeps the relative error of recorded values under 1/64
+SUB_BUCKETS = 64
+SUB_BUCKET_BITS = 7
+# Values up to 2 ** (MAX_SHIFT + SUB_BUCKET_BITS) microseconds, ~100 days
+MAX_SHIFT = 36
+BUCKETS = SUB_BUCKETS * (MAX_SHIFT + 2)
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+OUTCOMES = ("ok", "error", "skipped")
+
+# Looking resources up, API requests made by the action itself and
+# the rest, that is the work done by spamostack, e.g. generating keys
+PHASES = ("lookup", "api", "local")
+
+# Key API requests made outside of operations are counted under, e.g.
+# the ones of the reconciler
+BACKGROUND = ("background", "", "", "")
+
+
+def _monotonic():
+    """Get a monotonic clock function of the platform."""
+
+    if hasattr(time, "monotonic"):
+        return time.monotonic
+
+    class timespec(ctypes.Structure):
+        _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+    try:
+        librt = ctypes.CDLL(ctypes.util.find_library("rt") or
+                            ctypes.util.find_library("c"), use_errno=True)
+        clock_gettime = librt.clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    spec = threading.local()
+
+    def monotonic():
+        if not hasattr(spec, "value"):
+            spec.value = timespec()
+        # 1 is CLOCK_MONOTONIC on Linux
+        clock_gettime(1, ctypes.byref(spec.value))
+
+        return spec.value.tv_sec + spec.value.tv_nsec * 1e-9
+
+    return monotonic
+
+
+monotonic = _monotonic()
+
+
+def _status(exc):
+    """Get HTTP status of the failed request from client exceptions."""
+
+    for name in ["http_status", "status_code", "code"]:
+        status = getattr(exc, name, None)
+        if isinstance(status, int) and 0 < status < 2 ** 15:
+            return status
+
+    return 0
+
+
+def bucket(value):
+    """Get the index of the bucket of the value."""
+
+    if value < SUB_BUCKETS:
+        return max(value, 0)
+
+    shift = min(value.bit_length() - SUB_BUCKET_BITS, MAX_SHIFT)
+
+    return SUB_BUCKETS * (shift + 1) + min(value >> shift,
+                                           2 * SUB_BUCKETS - 1) - SUB_BUCKETS
+
+
+def bucket_range(index):
+    """Get the lowest and the highest values of the bucket."""
+
+    if index < SUB_BUCKETS:
+        return index, index
+
+    shift = index / SUB_BUCKETS - 1
+    low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+
+    return low, low + (1 << shift) - 1
+
+
+class Histogram(object):
+    def __init__(self):
+        """Create an instance of `Histogram` class
+
+        Log-linear histogram of durations in microseconds of fixed size,
+        every instance is written by one thread only and histograms of
+        all the threads are merged to get the percentiles.
+        """
+
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        """Record the duration.
+
+        @param value: Duration in microseconds
+        @type value: `int`
+        """
+
+        self.counts[bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add the values of the other histogram to that one."""
+
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+        return self
+
+    def percentile(self, percent):
+        """Get the value the percent of recorded values do not exceed.
+
+        @param percent: Percent from 0 to 100
+        @type percent: `float`
+        """
+
+        if not self.count:
+            return 0
+
+        rank = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_range(index)[1], self.max)
+
+        return self.max
+
+    def mean(self):
+        return self.total / float(self.count) if self.count else 0.0
+
+    def summary(self):
+        """Get count, mean, percentiles and max in seconds."""
+
+        result = {"count": self.count, "mean": self.mean() / 1e6,
+                  "max": self.max / 1e6}
+        for percent in PERCENTILES:
+            result["p{}".format(percent)] = self.percentile(percent) / 1e6
+
+        return result
+
+
+class Shard(object):
+    def __init__(self):
+        """Metrics written by one thread."""
+
+        # Durations by (pipe, service, resource, action, outcome)
+        self.histograms = dict()
+        # Durations of the phases by (pipe, service, resource, action, phase)
+        self.phases = dict()
+        # Started operations by (pipe, service, resource, action)
+        self.started = collections.defaultdict(int)
+        # First start and last finish of the operations by (pipe, service,
+        # resource, action)
+        self.spans = dict()
+        # API calls by service
+        self.calls = collections.defaultdict(int)
+        # Requests, bytes sent and received by (pipe, service, resource,
+        # action, service of the request)
+        self.traffic = dict()
+
+
+class Metrics(object):
+    def __init__(self):
+        """Create an instance of `Metrics` class
+
+        Keeps histograms of operation durations by (pipe, service,
+        resource, action, outcome), numbers of started operations and
+        API calls. Every thread writes its own shard, so recording takes
+        no locks, readers merge the shards.
+        """
+
+        self.local = threading.local()
+        self.shards = []
+        self.targets = dict()
+        self.drift = collections.Counter()
+        self.lock = threading.Lock()
+        # Writes the record of every operation if set
+        self.sink = None
+
+    def shard(self):
+        """Get metrics of the current thread."""
+
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = Shard()
+            with self.lock:
+                self.shards.append(shard)
+
+        return shard
+
+    def target(self, key, rate):
+        """Set the rate the action is configured to run at.
+
+        @param key: Pipe, service, resource and action
+        @type key: `tuple`
+
+        @param rate: Operations per second
+        @type rate: `float`
+        """
+
+        with self.lock:
+            self.targets[key] = rate
+
+    def drifted(self, service, resource, kind, number=1):
+        """Count differences of the cache from the cloud.
+
+        @param kind: "state" for changed states, "removed" for resources
+        deleted out of band
+        @type kind: `str`
+        """
+
+        with self.lock:
+            self.drift[(service, resource, kind)] += number
+
+    def api_call(self, service, sent=0, received=0):
+        """Count an API request to the service.
+
+        The request is attributed to the operation running in the thread.
+
+        @param service: Type of the service, e.g. "compute"
+        @type service: `str`
+
+        @param sent: Bytes sent in the body of the request
+        @type sent: `int`
+
+        @param received: Bytes received in the body of the response
+        @type received: `int`
+        """
+
+        shard = self.shard()
+        shard.calls[service] += 1
+
+        key = (getattr(self.local, "key", None) or BACKGROUND) + (service,)
+        traffic = shard.traffic.get(key)
+        if traffic is None:
+            traffic = shard.traffic[key] = [0, 0, 0]
+        traffic[0] += 1
+        traffic[1] += sent
+        traffic[2] += received
+
+    def current(self):
+        """Get the key of the operation running in the thread."""
+
+        return getattr(self.local, "key", None)
+
+    @contextlib.contextmanager
+    def attributed(self, key):
+        """Attribute API requests made in the block to the operation.
+
+        Worker threads making requests for an operation run them under
+        its key taken with `current` in the thread of the operation.
+
+        @param key: Pipe, service, resource and action or `None`
+        @type key: `tuple`
+        """
+
+        previous = getattr(self.local, "key", None)
+        self.local.key = key
+        try:
+            yield
+        finally:
+            self.local.key = previous
+
+    def record(self, key, seconds):
+        """Record the duration of the operation.
+
+        @param key: Pipe, service, resource, action and outcome
+        @type key: `tuple`
+
+        @param seconds: Duration of the operation
+        @type seconds: `float`
+        """
+
+        histograms = self.shard().histograms
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        histogram.record(int(round(seconds * 1e6)))
+
+    def span(self, key, started, finished):
+        """Widen the time the action was active to the operation."""
+
+        spans = self.shard().spans
+        span = spans.get(key)
+        if span is None:
+            spans[key] = [started, finished]
+        else:
+            span[0] = min(span[0], started)
+            span[1] = max(span[1], finished)
+
+    def spans(self):
+        """Get seconds between the first start and the last finish of
+        the operations by action.
+
+        Pipes run their actions one after another, rates of the actions
+        are of the time they were active.
+        """
+
+        with self.lock:
+            shards = list(self.shards)
+
+        merged = dict()
+        for shard in shards:
+            for key, (started, finished) in shard.spans.items():
+                span = merged.setdefault(key, [started, finished])
+                span[0] = min(span[0], started)
+                span[1] = max(span[1], finished)
+
+        return dict((key, finished - started)
+                    for key, (started, finished) in merged.iteritems())
+
+    def snapshot(self, kind="histograms"):
+        """Get histograms of all the threads merged by key.
+
+        @param kind: "histograms" for durations of operations or "phases"
+        for durations of their phases
+        @type kind: `str`
+        """
+
+        with self.lock:
+            shards = list(self.shards)
+
+        merged = dict()
+        for shard in shards:
+            for key, histogram in getattr(shard, kind).items():
+                merged.setdefault(key, Histogram()).merge(histogram)
+
+        return merged
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to the phase of the operation.
+
+        Nested phases are counted as the outer one, e.g. API requests
+        made to look resources up are the lookup time.
+
+        @param name: One of `PHASES`
+        @type name: `str`
+        """
+
+        phases = getattr(self.local, "phases", None)
+        if phases is None or self.local.phase is not None:
+            yield
+            return
+
+        self.local.phase = name
+        started = monotonic()
+        try:
+            yield
+        finally:
+            phases[name] = phases.get(name, 0.0) + monotonic() - started
+            self.local.phase = None
+
+    def record_phases(self, key, phases, elapsed):
+        """Record durations of the phases of the finished operation."""
+
+        histograms = self.shard().phases
+        local = elapsed - phases.get("lookup", 0.0) - phases.get("api", 0.0)
+        for name in PHASES:
+            seconds = phases.get(name, 0.0) if name != "local" else local
+            histogram = histograms.get(key + (name,))
+            if histogram is None:
+                histogram = histograms[key + (name,)] = Histogram()
+            histogram.record(max(int(round(seconds * 1e6)), 0))
+
+    def counters(self):
+        """Get started operations by action and API calls by service."""
+
+        with self.lock:
+            shards = list(self.shards)
+
+        started = collections.Counter()
+        calls = collections.Counter()
+        for shard in shards:
+            started.update(dict(shard.started.items()))
+            calls.update(dict(shard.calls.items()))
+
+        return started, calls
+
+    def traffic(self):
+        """Get requests, bytes sent and received by action and service."""
+
+        with self.lock:
+            shards = list(self.shards)
+
+        merged = dict()
+        for shard in shards:
+            for key, traffic in shard.traffic.items():
+                total = merged.setdefault(key, [0, 0, 0])
+                for index, value in enumerate(traffic):
+                    total[index] += value
+
+        return merged
+
+    def failed(self):
+        """Check and reset the failure mark of the current operation.
+
+        @return: `None` or HTTP status of the failure, 0 if unknown
+        """
+
+        failed = getattr(self.local, "failed", None)
+        self.local.failed = None
+
+        return failed
+
+    def fail(self, exc=None):
+        """Mark the current operation of the thread as failed.
+
+        @param exc: Exception the operation failed with
+        @type exc: `Exception`
+        """
+
+        self.local.failed = _status(exc)
+
+    def timed(self, key, func):
+        """Wrap the function to record its durations and outcomes.
+
+        The outcome is "error" if the function raised or called `fail`,
+        "skipped" if it returned `None` and "ok" otherwise.
+
+        @param key: Pipe, service, resource and action
+        @type key: `tuple`
+
+        @param func: Operation to time
+        @type func: `callable`
+        """
+
+        keys = dict((outcome, key + (outcome,)) for outcome in OUTCOMES)
+
+        def wrapper(*args, **kwargs):
+            self.shard().started[key] += 1
+            self.failed()
+            sink = self.sink
+            if sink is not None:
+                started_at = time.time()
+            phases = self.local.phases = dict()
+            self.local.phase = None
+            self.local.key = key
+            started = monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                elapsed = monotonic() - started
+                self.local.phases = self.local.key = None
+                self.record(keys["error"], elapsed)
+                self.record_phases(key, phases, elapsed)
+                self.span(key, started, started + elapsed)
+                if sink is not None:
+                    sink.record(started_at, elapsed, key, "error",
+                                _status(exc))
+                raise
+            elapsed = monotonic() - started
+            self.local.phases = self.local.key = None
+            self.record_phases(key, phases, elapsed)
+            self.span(key, started, started + elapsed)
+
+            status = self.failed()
+            if status is not None:
+                outcome = "error"
+            elif result is None:
+                outcome = "skipped"
+            else:
+                outcome = "ok"
+            self.record(keys[outcome], elapsed)
+            if sink is not None:
+                sink.record(started_at, elapsed, key, outcome, status or 0,
+                            result)
+
+            return result
+
+        return wrapper
+
+
+registry = Metrics()
+
+
+def phased(name):
+    """Decorate a function to count its time as the phase of operations."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with registry.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def fail(exc=None):
+    """Mark the current operation as failed in the shared registry."""
+
+    registry.fail(exc)
@@ -0,0 +1,194 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import bisect
+import math
+import os
+import random
+import re
+import threading
+
+# Size of the buffer all the payloads are sliced from
+BUFFER_SIZE = 4 * 2 ** 20
+
+UNITS = {"": 1, "K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def parse_size(size):
+    """Convert size like "512", "4K", "1.5M" or "5GB" to bytes.
+
+    @param size: Size in bytes or with K, M, G and T binary units
+    @type size: `str` or `int`
+    """
+
+    if isinstance(size, (int, long, float)):
+        return int(size)
+
+    match = re.match(r"^\s*([\d.]+)\s*([KMGT]?)(i?B)?\s*$", size,
+                     re.IGNORECASE)
+    if match is None:
+        raise ValueError("Wrong size {}".format(size))
+
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def shared_buffer():
+    """Get the random bytes all the payloads are made of."""
+
+    global _buffer
+
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = memoryview(bytearray(os.urandom(BUFFER_SIZE)))
+
+    return _buffer
+
+
+class Fixed(object):
+    def __init__(self, size):
+        self.size = parse_size(size)
+
+    def sample(self, rand=random):
+        return self.size
+
+
+class Uniform(object):
+    def __init__(self, min=0, max="1M"):
+        self.min = parse_size(min)
+        self.max = parse_size(max)
+
+    def sample(self, rand=random):
+        return rand.randint(self.min, self.max)
+
+
+class LogNormal(object):
+    def __init__(self, median="1M", sigma=1.0, min=0, max="5G"):
+        self.mu = math.log(parse_size(median))
+        self.sigma = float(sigma)
+        self.min = parse_size(min)
+        self.max = parse_size(max)
+
+    def sample(self, rand=random):
+        size = int(rand.lognormvariate(self.mu, self.sigma))
+
+        return sorted([self.min, size, self.max])[1]
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        """Sizes distributed as in a histogram from production.
+
+        @param buckets: Either [size, weight] pairs or [min, max, weight]
+        triples, sizes are uniform inside the latter buckets
+        @type buckets: `list(list)`
+        """
+
+        self.ranges = []
+        self.weights = []
+        total = 0
+        for bucket in buckets:
+            low, high = bucket[0], bucket[-2]
+            total += float(bucket[-1])
+            self.ranges.append((parse_size(low), parse_size(high)))
+            self.weights.append(total)
+
+    def sample(self, rand=random):
+        index = bisect.bisect_right(self.weights,
+                                    rand.random() * self.weights[-1])
+        low, high = self.ranges[min(index, len(self.ranges) - 1)]
+
+        return rand.randint(low, high)
+
+
+DISTRIBUTIONS = {"fixed": Fixed, "uniform": Uniform, "lognormal": LogNormal,
+                 "histogram": Histogram}
+
+
+def distribution(spec):
+    """Create a size distribution from its description in the config.
+
+    @param spec: Size like "4K" for fixed one or dict with "type", one of
+    `DISTRIBUTIONS`, and the arguments of that distribution, e.g.
+    {"type": "lognormal", "median": "1M", "sigma": 1.5, "max": "5G"}
+    @type spec: `str` or `dict`
+    """
+
+    if not isinstance(spec, dict):
+        return Fixed(spec)
+
+    kwargs = dict(spec)
+    kind = kwargs.pop("type", "fixed")
+    if kind not in DISTRIBUTIONS:
+        raise ValueError("Unknown size distribution {0}, use one of: "
+                         "{1}".format(kind, ", ".join(sorted(DISTRIBUTIONS))))
+
+    return DISTRIBUTIONS[kind](**kwargs)
+
+
+class PayloadStream(object):
+    def __init__(self, size, offset=0):
+        """Create an instance of `PayloadStream` class
+
+        File-like payload of any size, `read` returns `memoryview` slices of
+        the shared buffer so content is never copied into python strings.
+
+        @param size: Size of the payload in bytes
+        @type size: `int`
+
+        @param offset: Position in the shared buffer to start from
+        @type offset: `int`
+        """
+
+        self.size = size
+        self.buffer = shared_buffer()
+        self.start = offset % len(self.buffer)
+        self.position = 0
+
+    def __len__(self):
+        return self.size
+
+    def read(self, size=-1):
+        remaining = self.size - self.position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+
+        begin = (self.start + self.position) % len(self.buffer)
+        end = min(begin + size, len(self.buffer))
+        self.position += end - begin
+
+        return self.buffer[begin:end]
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(65536)
+            if not len(chunk):
+                return
+            yield chunk
+
+    def close(self):
+        pass
+
+    def tell(self):
+        return self.position
+
+    def seek(self, position, whence=0):
+        if whence == 1:
+            position += self.position
+        elif whence == 2:
+            position += self.size
+        self.position = max(0, min(position, self.size))
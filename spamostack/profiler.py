@@ -0,0 +1,161 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+MODES = ["cprofile", "sample"]
+OUTPUTS = {"cprofile": "spamostack.prof", "sample": "spamostack.folded"}
+
+# Profiler of the process, threads are run under it if set
+active = None
+
+
+class Profiler(object):
+    def __init__(self, mode, path=None, interval=0.01):
+        """Create an instance of `Profiler` class
+
+        With "cprofile" every profiled thread runs under its own
+        `cProfile.Profile`, stats of the finished threads are merged into
+        one file for `pstats`. With "sample" stacks of all the threads are
+        taken every interval and written in collapsed format for
+        flamegraphs, profiled threads run as they are.
+
+        @param mode: One of `MODES`
+        @type mode: `str`
+
+        @param path: File to write the profile to
+        @type path: `str`
+
+        @param interval: Seconds between samples
+        @type interval: `float`
+        """
+
+        self.mode = mode
+        self.path = path or OUTPUTS[mode]
+        self.interval = interval
+        self.profiles = []
+        self.running = 0
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.sampler = None
+        self.stopped = False
+
+    def start(self):
+        if self.mode == "sample":
+            self.sampler = threading.Thread(target=self._sample,
+                                            name="profiler")
+            self.sampler.daemon = True
+            self.sampler.start()
+
+    def run(self, func, *args, **kwargs):
+        """Run the function under the profiler of the thread."""
+
+        if self.mode != "cprofile":
+            return func(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        with self.lock:
+            self.running += 1
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.profiles.append(profile)
+
+    def _sample(self):
+        me = threading.current_thread().ident
+        while not self.stopped:
+            time.sleep(self.interval)
+            names = dict((thread.ident, thread.name)
+                         for thread in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.stacks[(names.get(ident, "unknown"),) +
+                            tuple(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        """Stop the profiler and write the profile."""
+
+        self.stopped = True
+        if self.mode == "sample":
+            if self.sampler is not None:
+                self.sampler.join()
+            self._write_stacks()
+        else:
+            self._write_stats()
+
+    def _write_stats(self):
+        with self.lock:
+            profiles = list(self.profiles)
+            running = self.running
+        if running:
+            log.warning("{} threads are still running, they are not in the "
+                        "profile".format(running))
+        if not profiles:
+            log.warning("Nothing was profiled")
+            return
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(self.path)
+        log.info("Profile of {0} threads is written to {1}".format(
+            len(profiles), self.path))
+
+    def _write_stacks(self):
+        labels = dict()
+
+        def label(code):
+            if code not in labels:
+                labels[code] = "{0} ({1}:{2})".format(
+                    code.co_name, code.co_filename, code.co_firstlineno)
+            return labels[code]
+
+        with open(self.path, "w") as out:
+            for stack, count in sorted(self.stacks.iteritems()):
+                # Collapsed stacks go from the root to the leaf
+                out.write("{0};{1} {2}\n".format(
+                    stack[0], ";".join(label(code) for code in
+                                       reversed(stack[1:])), count))
+        log.info("{0} samples are written to {1}".format(self.samples,
+                                                         self.path))
+
+
+def profiled(func):
+    """Decorate a thread function to run it under the active profiler."""
+
+    def wrapper(*args, **kwargs):
+        if active is None:
+            return func(*args, **kwargs)
+
+        return active.run(func, *args, **kwargs)
+
+    return wrapper
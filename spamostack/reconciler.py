@@ -0,0 +1,495 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import logging
+import threading
+import time
+
+from client_factory import Accessible
+from client_factory import listed_container
+from client_factory import object_key
+import logger
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Number of resources requested per page
+PAGE_SIZE = 500
+
+# Overlap of `changes-since` windows to cover the clock skew, seconds
+SKEW = 60
+
+NEUTRON_RESOURCES = ["networks", "subnets", "ports", "routers",
+                     "security_groups", "floatingips"]
+
+# Owners of the ports which connect routers to networks
+ROUTER_INTERFACES = ("network:router_interface",
+                     "network:router_interface_distributed",
+                     "network:ha_router_replicated_interface")
+
+# Fields of listed resources with IDs of the resources in other views
+# whose listings show them, e.g. networks list their subnets
+PARENTS = {("neutron", "subnets"): ("network_id", ("neutron", "networks"))}
+
+# Fields with the owning project in listings of the services which list
+# resources of the current project only unless asked for all of them,
+# neutron lists everything to admins and swift lists one account
+PROJECT_FIELDS = {"cinder": "os-vol-tenant-attr:tenant_id",
+                  "nova": "tenant_id"}
+
+
+def _timestamp(value):
+    """Bring `updated_at` of different services to one comparable form."""
+
+    if not value:
+        return ""
+
+    return value.replace(" ", "T")[:19]
+
+
+def _field(item, name):
+    """Get a field of a resource returned either as dict or as object."""
+
+    if isinstance(item, dict):
+        return item.get(name)
+
+    return getattr(item, name, None)
+
+
+def project_of(service, item):
+    """Get the ID of the project owning the listed resource.
+
+    @return: ID of the project or `None` if listings of the service are
+    not scoped by project
+    """
+
+    if service not in PROJECT_FIELDS:
+        return None
+
+    return _field(item, PROJECT_FIELDS[service])
+
+
+class View(object):
+    def __init__(self):
+        """Create an instance of `View` class
+
+        Local copy of the listing of one resource kept up to date
+        by `Reconciler`. Items changed by the workload are stale until
+        they are got again or listed.
+        """
+
+        self.items = dict()
+        self.fresh = dict()
+        self.stale = set()
+        self.ready = False
+        self.lock = threading.Lock()
+
+    def list(self):
+        with self.lock:
+            return self.items.values()
+
+    def put(self, key, item):
+        with self.lock:
+            self.items[key] = item
+            self.fresh[key] = item
+            self.stale.discard(key)
+
+    def pop(self, key):
+        with self.lock:
+            self.fresh.pop(key, None)
+            self.stale.discard(key)
+
+            return self.items.pop(key, None)
+
+    def invalidate(self, key):
+        with self.lock:
+            if key in self.items:
+                self.stale.add(key)
+
+    def changed(self):
+        """Get keys of the stale items."""
+
+        with self.lock:
+            return list(self.stale)
+
+    def begin(self):
+        """Start a full listing."""
+
+        with self.lock:
+            self.fresh = dict()
+
+    def replace(self, items):
+        """Finish a full listing keeping items put while it was running."""
+
+        with self.lock:
+            self.items = dict(items)
+            self.items.update(self.fresh)
+            self.fresh = dict()
+            self.stale.intersection_update(self.items)
+            self.ready = True
+
+
+class Reconciler(object):
+    def __init__(self, cache, client_factory, interval=30, sweep_every=10):
+        """Create an instance of `Reconciler` class
+
+        Refreshes the cache in the background, one thread per service.
+        Between full listings only the resources changed since the last
+        pass are requested: `changes-since` for nova servers, pages sorted
+        by `updated_at` for neutron and cinder. Swift has no change feed and
+        is listed page by page with markers.
+
+        Listings are made with the admin client for all the projects, the
+        drift found is counted in `metrics.registry` as well.
+
+        @param cache: Reference to the cache
+        @type cache: `spamostack.cache.Cache`
+
+        @param client_factory: Client factory of the admin user
+        @type client_factory: `client_factory.ClientFactory`
+
+        @param interval: Pause between passes, seconds
+        @type interval: `int`
+
+        @param sweep_every: Make a full listing every that number of passes
+        @type sweep_every: `int`
+        """
+
+        self.cache = cache
+        self.client_factory = client_factory
+        self.interval = interval
+        self.sweep_every = sweep_every
+        self.drift = collections.Counter()
+        self.marks = dict()
+        self.lock = threading.Lock()
+
+        sections = ([("cinder", "volumes"), ("nova", "servers"),
+                     ("swift", "containers")] +
+                    [("neutron", resource) for resource in NEUTRON_RESOURCES])
+        self.views = dict((section, View()) for section in sections)
+
+    def start(self):
+        """Start the reconciliation threads."""
+
+        for service in ["cinder", "neutron", "nova", "swift"]:
+            thread = threading.Thread(target=self.run, args=(service,),
+                                      name="reconciler-" + service)
+            thread.daemon = True
+            thread.start()
+
+    def run(self, service):
+        client = getattr(self.client_factory, service)()
+        reconcile = getattr(self, "reconcile_" + service)
+        swept = False
+        cycle = 0
+
+        while True:
+            full = not swept or cycle % self.sweep_every == 0
+            try:
+                reconcile(client, full)
+                swept = swept or full
+                if full:
+                    self.report(service)
+            except Exception as exc:
+                logger.exception(log, exc)
+
+            cycle += 1
+            time.sleep(self.interval)
+
+    def view(self, service, resource):
+        """Get the local listing or `None` if there is no ready one."""
+
+        view = self.views.get((service, resource))
+        if view is None or not view.ready:
+            return None
+
+        return view.list()
+
+    def remember(self, service, resource, item):
+        """Put a resource created by the workload into the view.
+
+        The resources listing it in their views become stale.
+        """
+
+        view = self.views.get((service, resource))
+        if view is not None:
+            view.put(item.id, item)
+        self.invalidate_parent(service, resource, item)
+
+    def forget(self, service, resource, key):
+        """Drop a resource deleted by the workload from the view.
+
+        The resources listing it in their views become stale.
+        """
+
+        view = self.views.get((service, resource))
+        if view is not None:
+            self.invalidate_parent(service, resource, view.pop(key))
+
+    def invalidate(self, service, resource, key):
+        """Mark a resource changed by the workload stale in the view."""
+
+        view = self.views.get((service, resource))
+        if view is not None:
+            view.invalidate(key)
+
+    def invalidate_parent(self, service, resource, item):
+        parent = PARENTS.get((service, resource))
+        if parent is not None and item is not None:
+            field, (parent_service, parent_resource) = parent
+            self.invalidate(parent_service, parent_resource,
+                            _field(item, field))
+
+    def stale(self, service, resource):
+        """Get IDs of the stale resources of the view."""
+
+        view = self.views.get((service, resource))
+
+        return view.changed() if view is not None else []
+
+    def refreshed(self, service, resource, key, item):
+        """Put a resource got again into the view, `None` if it is gone."""
+
+        view = self.views.get((service, resource))
+        if view is None:
+            return
+        if item is None:
+            view.pop(key)
+        else:
+            view.put(key, item)
+
+    def count(self, service, resource, kind, number=1):
+        with self.lock:
+            self.drift[(service, resource, kind)] += number
+        metrics.registry.drifted(service, resource, kind, number)
+
+    def report(self, service):
+        """Log the drift found for the service so far."""
+
+        with self.lock:
+            drift = sorted((resource, kind, number) for
+                           (name, resource, kind), number
+                           in self.drift.iteritems() if name == service)
+
+        for resource, kind, number in drift:
+            log.info("Drift of %s %s: %s %s", service, resource, number, kind)
+
+    def apply(self, service, resource, listed, before=None, deleted=()):
+        """Bring the cache and the view in line with the listed resources.
+
+        @param listed: Resources changed since the last pass by their IDs,
+        or all of them for a full listing
+        @type listed: `dict`
+
+        @param before: IDs tracked before the full listing started, the ones
+        which are not listed anymore were deleted out of band
+        @type before: `set`
+
+        @param deleted: IDs of the resources known to be deleted
+        @type deleted: `list`
+        """
+
+        tracked = self.cache[service][resource]
+        index = self.cache.index(service, resource)
+        gone = set(deleted)
+        if before is not None:
+            gone |= before - set(listed)
+
+        changed = 0
+        removed = 0
+        with self.cache.batch():
+            for key, item in listed.iteritems():
+                state = _field(item, "status")
+                if (state is not None and key in tracked and
+                        index.get(key).get("state") != state):
+                    index.update(key, state=state)
+                    changed += 1
+
+            for key in gone:
+                if key in tracked:
+                    self.cache.untrack(service, resource, key)
+                    removed += 1
+
+        view = self.views.get((service, resource))
+        if view is not None:
+            if before is not None:
+                view.replace(listed)
+            else:
+                for key, item in listed.iteritems():
+                    view.put(key, item)
+                for key in gone:
+                    view.pop(key)
+
+        if changed:
+            self.count(service, resource, "state", changed)
+        if removed:
+            self.count(service, resource, "removed", removed)
+            log.info("%s %s %s were deleted out of band",
+                     removed, service, resource)
+
+    def sorted_pages(self, section, pages, full):
+        """Collect resources from pages sorted by `updated_at` desc.
+
+        Unless the listing is full it stops on the first resource that was
+        not updated since the previous pass.
+        """
+
+        mark = self.marks.get(section, "")
+        latest = mark
+        listed = dict()
+
+        for page in pages:
+            for item in page:
+                updated = _timestamp(_field(item, "updated_at"))
+                latest = max(latest, updated)
+                if not full and updated and updated < mark:
+                    self.marks[section] = latest
+                    return listed
+                listed[_field(item, "id")] = item
+
+        self.marks[section] = latest
+
+        return listed
+
+    def reconcile_cinder(self, client, full):
+        before = set(self.cache["cinder"]["volumes"]) if full else None
+        if full:
+            self.views[("cinder", "volumes")].begin()
+
+        def pages():
+            marker = None
+            while True:
+                page = client.volumes.list(
+                    search_opts={"all_tenants": 1}, marker=marker,
+                    limit=PAGE_SIZE, sort="updated_at:desc")
+                yield page
+                if len(page) < PAGE_SIZE:
+                    return
+                marker = page[-1].id
+
+        listed = self.sorted_pages(("cinder", "volumes"), pages(), full)
+        self.apply("cinder", "volumes", listed, before)
+
+    def reconcile_neutron(self, client, full):
+        for resource in NEUTRON_RESOURCES:
+            before = set(self.cache["neutron"][resource]) if full else None
+            if full:
+                self.views[("neutron", resource)].begin()
+                listed = getattr(client.native, "list_" + resource)()
+                pages = [[Accessible(item) for item in listed[resource]]]
+            else:
+                listed = getattr(client.native, "list_" + resource)(
+                    retrieve_all=False, sort_key=["updated_at"],
+                    sort_dir=["desc"], limit=PAGE_SIZE)
+                pages = ([Accessible(item) for item in page[resource]]
+                         for page in listed)
+
+            listed = self.sorted_pages(("neutron", resource), pages, full)
+            self.apply("neutron", resource, listed, before)
+            if resource == "ports":
+                self.track_interfaces(listed, full)
+
+    def track_interfaces(self, listed, full):
+        """Track the ports connecting routers to the tracked networks.
+
+        Interfaces are indexed under their network with the router as the
+        name, so the network could be detached without listing its ports.
+        """
+
+        networks = self.cache["neutron"]["networks"]
+        interfaces = self.cache["neutron"]["interfaces"]
+        gone = set(interfaces) - set(listed) if full else set()
+
+        with self.cache.batch():
+            for key, item in listed.iteritems():
+                if (_field(item, "device_owner") in ROUTER_INTERFACES and
+                        _field(item, "network_id") in networks and
+                        key not in interfaces):
+                    self.cache.track("neutron", "interfaces", key,
+                                     name=_field(item, "device_id"),
+                                     parent=_field(item, "network_id"))
+
+            for key in gone:
+                self.cache.untrack("neutron", "interfaces", key)
+
+    def reconcile_nova(self, client, full):
+        started = time.time()
+        search_opts = {"all_tenants": True}
+        before = None
+
+        if full:
+            before = set(self.cache["nova"]["servers"])
+            self.views[("nova", "servers")].begin()
+        else:
+            search_opts["changes-since"] = time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ",
+                time.gmtime(self.marks[("nova", "servers")] - SKEW))
+
+        servers = client.servers.list(search_opts=search_opts, limit=-1)
+        listed = dict((server.id, server) for server in servers
+                      if server.status != "DELETED")
+        deleted = [server.id for server in servers
+                   if server.status == "DELETED"]
+
+        self.apply("nova", "servers", listed, before, deleted)
+        self.marks[("nova", "servers")] = started
+
+    def reconcile_swift(self, client, full):
+        """List the containers of the account and, on full passes, objects.
+
+        The listing of containers is always complete, the ones of the
+        objects are requested per container and only on full passes.
+        """
+
+        before = set(self.cache["swift"]["containers"])
+        self.views[("swift", "containers")].begin()
+
+        listed = dict()
+        for item in self.marker_pages(client.native.get_account):
+            listed[item["name"]] = listed_container(item)
+
+        for container in (before & set(listed) if full else []):
+            objects = self.cache.find("swift", "objects", parent=container)
+            if not objects:
+                continue
+            pages = self.marker_pages(
+                lambda **kwargs: client.native.get_container(container,
+                                                             **kwargs))
+            keys = set(object_key(container, item["name"]) for item in pages)
+            missing = [key for key in objects if key not in keys]
+            for key in missing:
+                self.cache.untrack("swift", "objects", key)
+            if missing:
+                self.count("swift", "objects", "removed", len(missing))
+
+        for container in before - set(listed):
+            for key in self.cache.find("swift", "objects", parent=container):
+                self.cache.untrack("swift", "objects", key)
+
+        self.apply("swift", "containers", listed, before)
+
+    @staticmethod
+    def marker_pages(listing):
+        """Iterate over a swift listing requesting it page by page."""
+
+        marker = ""
+        while True:
+            page = listing(marker=marker, limit=PAGE_SIZE)[1]
+            for item in page:
+                yield item
+            if len(page) < PAGE_SIZE:
+                return
+            marker = page[-1]["name"]
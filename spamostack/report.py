@@ -0,0 +1,269 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+import operator
+import re
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt,
+             ">=": operator.ge}
+UNITS = {"": 1.0, "s": 1.0, "ms": 1e-3, "%": 1e-2}
+STATISTICS = ("count", "errors", "error_rate", "rate", "mean", "max")
+
+# "[pipe.]service.resource.action statistic operator value[unit]",
+# e.g. "nova.servers.create p99 < 5s" or "error_rate < 1%"
+SLO = re.compile(r"^\s*(?:([\w.-]+)\s+)?(p[\d.]+|{0})\s*({1})\s*"
+                 r"([\d.]+)\s*({2})?\s*$".format(
+                     "|".join(STATISTICS),
+                     "|".join(sorted(OPERATORS, key=len, reverse=True)),
+                     "|".join(unit for unit in UNITS if unit)))
+
+
+def _name(action):
+    return ".".join(part for part in action if part)
+
+
+class Statistics(object):
+    def __init__(self):
+        """Statistics of finished operations of one or several actions.
+
+        Latencies are of the operations which were done, as `analyze` and
+        `compare` take them. Counts and error rates are of the ones which
+        were done or failed, skipped ones had nothing to act on. Phases
+        are of all the finished operations.
+        """
+
+        self.histogram = metrics.Histogram()
+        self.phases = dict((name, metrics.Histogram())
+                           for name in metrics.PHASES)
+        self.errors = 0
+        self.skipped = 0
+        self.rate = 0.0
+
+    def add(self, histograms, action, elapsed, phases=None):
+        """Add the operations of the action.
+
+        @param histograms: Histograms of the registry by action and outcome
+        @type histograms: `dict`
+
+        @param action: Pipe, service, resource and action
+        @type action: `tuple`
+
+        @param elapsed: Seconds between the first start and the last finish
+        of the operations of the action
+        @type elapsed: `float`
+
+        @param phases: Histograms of the registry by action and phase
+        @type phases: `dict`
+        """
+
+        finished = 0
+        for outcome in metrics.OUTCOMES:
+            histogram = histograms.get(action + (outcome,))
+            if histogram is None:
+                continue
+            finished += histogram.count
+            if outcome == "skipped":
+                self.skipped += histogram.count
+                continue
+            if outcome == "error":
+                self.errors += histogram.count
+                continue
+            self.histogram.merge(histogram)
+        self.rate += finished / max(elapsed, 1e-6)
+
+        for name in metrics.PHASES:
+            histogram = (phases or {}).get(action + (name,))
+            if histogram is not None:
+                self.phases[name].merge(histogram)
+
+    def phase(self, name):
+        """Get the mean time of the phase in seconds.
+
+        @param name: One of `metrics.PHASES`
+        @type name: `str`
+        """
+
+        return self.phases[name].mean() / 1e6
+
+    def value(self, statistic):
+        """Get the statistic, latencies are in seconds.
+
+        @param statistic: One of `STATISTICS` or percentile like "p99"
+        @type statistic: `str`
+        """
+
+        if statistic.startswith("p"):
+            return self.histogram.percentile(float(statistic[1:])) / 1e6
+        count = self.histogram.count + self.errors
+        if statistic == "count":
+            return count
+        if statistic == "errors":
+            return self.errors
+        if statistic == "error_rate":
+            return self.errors / float(count) if count else 0.0
+        if statistic == "rate":
+            return self.rate
+        if statistic == "mean":
+            return self.histogram.mean() / 1e6
+
+        return self.histogram.max / 1e6
+
+
+def collect(registry=metrics.registry):
+    """Get statistics of every action of the registry."""
+
+    histograms = registry.snapshot()
+    phases = registry.snapshot("phases")
+    spans = registry.spans()
+
+    actions = set(key[:-1] for key in histograms)
+    statistics = dict()
+    for action in actions:
+        statistics[action] = Statistics()
+        statistics[action].add(histograms, action, spans.get(action, 0.0),
+                               phases)
+
+    return statistics
+
+
+def _valid(statistic, value):
+    """Check the numbers the SLO regex lets through."""
+
+    try:
+        float(value)
+        if statistic.startswith("p"):
+            return 0 < float(statistic[1:]) <= 100
+    except ValueError:
+        return False
+
+    return True
+
+
+class Slo(object):
+    def __init__(self, text):
+        """Create an instance of `Slo` class
+
+        @param text: Objective like "nova.servers.create p99 < 5s", all
+        the actions ending with the selector are checked together, the
+        ones of all the pipes without it
+        @type text: `str`
+        """
+
+        match = SLO.match(text)
+        if match is None or not _valid(match.group(2), match.group(4)):
+            raise ValueError("Wrong SLO {}, use \"[pipe.]service.resource."
+                             "action statistic operator value\"".format(text))
+
+        self.text = text.strip()
+        self.selector, self.statistic, self.operator, value, unit = \
+            match.groups()
+        self.threshold = float(value) * UNITS[unit or ""]
+
+    def matches(self, action):
+        if self.selector is None:
+            return True
+        name = _name(action)
+
+        return name == self.selector or name.endswith("." + self.selector)
+
+    def check(self, statistics):
+        """Check the objective against statistics of the run.
+
+        @param statistics: Statistics by action from `collect`
+        @type statistics: `dict`
+
+        @return: Measured value, `None` if no action matched, and whether
+        the objective is met
+        """
+
+        merged = Statistics()
+        actions = [action for action in statistics if self.matches(action)]
+        if not actions:
+            return None, False
+
+        for action in actions:
+            merged.histogram.merge(statistics[action].histogram)
+            merged.errors += statistics[action].errors
+            merged.skipped += statistics[action].skipped
+            merged.rate += statistics[action].rate
+        value = merged.value(self.statistic)
+
+        return value, OPERATORS[self.operator](value, self.threshold)
+
+
+def render(statistics, results=None):
+    """Render the statistics and SLO results as text.
+
+    Mean times of the phases of operations follow the latencies.
+
+    @param results: (`Slo`, value, passed) triples
+    @type results: `list`
+    """
+
+    columns = ["p{}".format(percent) for percent in metrics.PERCENTILES]
+    lines = ["{0:<44} {1:>7} {2:>7} {3:>7} {4:>8} ".format(
+        "action", "count", "errors", "error%", "ops/s") +
+        " ".join("{:>9}".format(column)
+                 for column in columns + ["max"] + list(metrics.PHASES))]
+    for action, stats in sorted(statistics.iteritems()):
+        lines.append("{0:<44} {1:>7} {2:>7} {3:>7.2f} {4:>8.3f} ".format(
+            _name(action), stats.value("count"), stats.errors,
+            stats.value("error_rate") * 100, stats.rate) +
+            " ".join(["{:>9.3f}".format(stats.value(column))
+                      for column in columns + ["max"]] +
+                     ["{:>9.3f}".format(stats.phase(name))
+                      for name in metrics.PHASES]))
+
+    if results:
+        lines.extend(["", "SLOs:"])
+        for slo, value, passed in results:
+            lines.append("{0:<4} {1:<52} {2}".format(
+                "ok" if passed else "FAIL", slo.text,
+                "no operations" if value is None else "{:.6g}".format(value)))
+
+    return "\n".join(lines)
+
+
+def finish(slos, registry=metrics.registry):
+    """Print the report of the run and check the objectives.
+
+    @param slos: Objectives of the run
+    @type slos: `list(Slo)`
+
+    @return: 0 if all the objectives are met, 1 otherwise
+    """
+
+    statistics = collect(registry)
+    results = []
+    for slo in slos:
+        value, passed = slo.check(statistics)
+        if value is None and slo.selector is not None:
+            log.error("SLO {0} is not met, {1} matched no action".format(
+                slo.text, slo.selector))
+        elif value is None:
+            log.error("SLO {} is not met, no operations were recorded".format(
+                slo.text))
+        elif not passed:
+            log.error("SLO {0} is not met: {1}".format(slo.text, value))
+        results.append((slo, value, passed))
+
+    print(render(statistics, results))
+
+    return 0 if all(passed for _, _, passed in results) else 1
@@ -0,0 +1,297 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import binascii
+import hashlib
+import json
+import os
+import struct
+import threading
+
+from cache import pack_id
+from cache import unpack_id
+from metrics import OUTCOMES
+
+MAGIC = "SPAMRES1"
+
+# Magic, header size, record size, number of records, offset and length
+# of the JSON dictionaries written after the records
+HEADER = struct.Struct("<8sIIQQQ")
+HEADER_SIZE = 64
+
+# Start time, duration in microseconds, action index, outcome index,
+# packed ID prefix, HTTP status, packed ID, padding
+RECORD = struct.Struct("<dIHBBh16s2x")
+FIELDS = [("start", "<f8"), ("duration", "<u4"), ("action", "<u2"),
+          ("outcome", "u1"), ("id_prefix", "u1"), ("status", "<i2"),
+          ("id", "S16"), ("padding", "V2")]
+
+# Durations are clamped to ~71 minutes
+MAX_DURATION = 2 ** 32 - 1
+
+# Prefix of IDs which do not fit the record, e.g. names of swift objects,
+# they are kept as their MD5 and written to the side table of the file
+_HASHED = "\x03"
+
+_OUTCOME_INDEXES = dict((outcome, index)
+                        for index, outcome in enumerate(OUTCOMES))
+
+
+def _resource_id(result):
+    """Get ID of the resource an action returned, if any."""
+
+    if isinstance(result, basestring):
+        return result
+    result_id = getattr(result, "id", None)
+
+    return result_id if isinstance(result_id, basestring) else None
+
+
+class ResultSink(object):
+    def __init__(self, path, buffer_records=4096, targets=None):
+        """Create an instance of `ResultSink` class
+
+        Writes a fixed size binary record of every operation. Every
+        thread packs records into its own buffer, which goes to the
+        file under a lock when full. Names of actions are kept as
+        indexes into a dictionary written after the records. The
+        dictionaries and the header are rewritten on every flush, so
+        the file of a killed run has all the flushed records.
+
+        IDs longer than 16 bytes packed are recorded as their MD5, the
+        IDs themselves are appended to the side table, a file with the
+        ".ids" suffix, when their records are flushed.
+
+        @param path: File to write the records to
+        @type path: `str`
+
+        @param buffer_records: Number of records buffered per thread
+        @type buffer_records: `int`
+
+        @param targets: Configured rates of the actions to keep with the
+        records, operations per second by (pipe, service, resource, action)
+        @type targets: `dict`
+        """
+
+        self.path = path
+        self.ids = None
+        self.targets = targets
+        self.buffer_size = buffer_records * RECORD.size
+        self.file = open(path, "wb")
+        self.file.write("\0" * HEADER_SIZE)
+        self.records = 0
+        self.actions = dict()
+        self.names = []
+        self.local = threading.local()
+        self.buffers = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self._write_dictionaries()
+
+    def action(self, key):
+        """Get the index of the action in the dictionary."""
+
+        index = self.actions.get(key)
+        if index is None:
+            with self.lock:
+                index = self.actions.get(key)
+                if index is None:
+                    index = self.actions[key] = len(self.names)
+                    self.names.append(list(key))
+
+        return index
+
+    def _buffer(self):
+        # Records, their size and long IDs of them by MD5
+        buffer = self.local.buffer = [bytearray(self.buffer_size), 0, dict()]
+        with self.lock:
+            self.buffers.append(buffer)
+
+        return buffer
+
+    def _flush(self, buffer):
+        with self.lock:
+            if not self.closed:
+                if buffer[2]:
+                    self._write_ids(buffer[2])
+                self.records += buffer[1] / RECORD.size
+                self._write_dictionaries(buffer[0][:buffer[1]])
+            buffer[1] = 0
+            buffer[2].clear()
+
+    def _write_ids(self, ids):
+        """Append long IDs to the side table. Called under the lock."""
+
+        if self.ids is None:
+            self.ids = open(self.path + ".ids", "wb")
+        self.ids.write("".join(
+            json.dumps([binascii.hexlify(digest), key]) + "\n"
+            for digest, key in ids.iteritems()))
+        self.ids.flush()
+
+    def _write_dictionaries(self, records=""):
+        """Write records, the dictionaries after them and the header.
+
+        The next records are written over the dictionaries, the file is
+        left at the end of the records. Called under the lock.
+        """
+
+        dictionaries = {
+            "actions": self.names, "outcomes": OUTCOMES,
+            "targets": [list(key) + [rate] for key, rate in
+                        sorted(dict(self.targets or {}).iteritems())]}
+        if self.ids is not None:
+            dictionaries["ids"] = os.path.basename(self.ids.name)
+        dictionaries = json.dumps(dictionaries)
+        offset = HEADER_SIZE + self.records * RECORD.size
+        self.file.write(records + dictionaries)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, HEADER_SIZE, RECORD.size,
+                                    self.records, offset,
+                                    len(dictionaries)))
+        self.file.flush()
+        self.file.seek(offset)
+
+    def record(self, start, duration, key, outcome, status=0, result=None):
+        """Add the record of the operation.
+
+        @param start: Wall clock time the operation started at
+        @type start: `float`
+
+        @param duration: Duration in seconds
+        @type duration: `float`
+
+        @param key: Pipe, service, resource and action
+        @type key: `tuple`
+
+        @param outcome: One of `OUTCOMES`
+        @type outcome: `str`
+
+        @param status: HTTP status of the failed request, 0 if unknown
+        @type status: `int`
+
+        @param result: What the action returned, ID of the resource is
+        taken from it
+        @type result: `object`
+        """
+
+        try:
+            buffer = self.local.buffer
+        except AttributeError:
+            buffer = self._buffer()
+        index = self.actions.get(key)
+        if index is None:
+            index = self.action(key)
+        packed = pack_id(_resource_id(result) or "")
+        if len(packed) > 17:
+            digest = hashlib.md5(packed).digest()
+            buffer[2][digest] = packed[1:]
+            packed = _HASHED + digest
+        RECORD.pack_into(buffer[0], buffer[1], start,
+                         min(int(duration * 1e6), MAX_DURATION), index,
+                         _OUTCOME_INDEXES[outcome], ord(packed[0]), status,
+                         packed[1:17])
+        buffer[1] += RECORD.size
+        if buffer[1] == self.buffer_size:
+            self._flush(buffer)
+
+    def close(self, targets=None):
+        """Flush buffers of all the threads and write the dictionaries.
+
+        @param targets: Configured rates of the actions to keep with the
+        records, operations per second by (pipe, service, resource, action)
+        @type targets: `dict`
+        """
+
+        for buffer in list(self.buffers):
+            if buffer[1]:
+                self._flush(buffer)
+
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if targets is not None:
+                self.targets = targets
+            self._write_dictionaries()
+            self.file.close()
+            if self.ids is not None:
+                self.ids.close()
+
+
+def read_header(path):
+    """Read the header and the dictionaries of a results file.
+
+    @return: Number of records and the dictionaries
+    """
+
+    with open(path, "rb") as results:
+        magic, header_size, record_size, records, offset, length = \
+            HEADER.unpack(results.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError("{} is not a results file or was not "
+                             "closed".format(path))
+        results.seek(offset)
+        dictionaries = json.loads(results.read(length))
+
+    return records, dictionaries
+
+
+def read_ids(path):
+    """Read the side table of IDs which did not fit the records.
+
+    @return: IDs by their MD5
+    """
+
+    ids = dict()
+    with open(path, "rb") as table:
+        for line in table:
+            try:
+                digest, key = json.loads(line)
+            except ValueError:
+                # The last line of a killed run could be cut
+                break
+            ids[binascii.unhexlify(digest)] = key.encode("utf-8")
+
+    return ids
+
+
+def read(path):
+    """Iterate over the records of a results file as dicts."""
+
+    records, dictionaries = read_header(path)
+    actions = dictionaries["actions"]
+    outcomes = dictionaries["outcomes"]
+    ids = dict()
+    if "ids" in dictionaries:
+        ids = read_ids(os.path.join(os.path.dirname(path),
+                                    dictionaries["ids"]))
+
+    with open(path, "rb") as results:
+        results.seek(HEADER_SIZE)
+        for _ in xrange(records):
+            (start, duration, action, outcome, prefix, status,
+             packed) = RECORD.unpack(results.read(RECORD.size))
+            if prefix == ord(_HASHED):
+                key = ids.get(packed, binascii.hexlify(packed))
+            else:
+                packed = chr(prefix) + packed
+                if prefix == ord(pack_id("")[0]):
+                    packed = packed.rstrip("\0")
+                key = unpack_id(packed)
+            yield {"start": start, "duration": duration / 1e6,
+                   "action": tuple(actions[action]),
+                   "outcome": outcomes[outcome], "status": status,
+                   "id": key}
@@ -18,6 +18,8 @@ import random
 import threading
 import time
 
+import metrics
+import profiler
 import spam_factory
 
 log = logging.getLogger(__name__)
@@ -25,7 +27,11 @@ log = logging.getLogger(__name__)
 
 def threader(func):
     def wrapper(self, *args, **kwargs):
-        threading.Thread(target=func, args=(self,)).start()
+        thread = threading.Thread(target=profiler.profiled(func),
+                                  args=(self,), name=self.name)
+        thread.start()
+
+        return thread
 
     return wrapper
 
@@ -57,26 +63,33 @@ class Simulator(object):
         user = random.choice(users)
         self.user = self.cache["users"][user.name]
         self.user["auth_url"] = self.cache["api"]["auth_url"]
-        self.client_factory = spam_factory.SpamFactory(self.cache, self.user,
-                                                       self.keeper)
+        self.client_factory = spam_factory.SpamFactory(
+            self.cache, self.user, self.keeper,
+            self.pipeline.get("settings"))
 
     @threader
     def simulate(self):
         """Simulate an actions."""
 
-        def loop(pipe_client, pipe, parent_obj):
+        def loop(pipe_client, pipe, parent_obj, path):
             for key, value in pipe.iteritems():
                 attr = getattr(parent_obj, key)
 
                 if isinstance(value, dict):
-                    loop(pipe_client, value, attr)
+                    loop(pipe_client, value, attr, path + [key])
                 else:
-                    self.rotate(attr, *value)
+                    action = (self.name, pipe_client, ".".join(path), key)
+                    period, number = value[:2]
+                    metrics.registry.target(
+                        action, number / float(period) if period else 0.0)
+                    self.rotate(metrics.registry.timed(action, attr), *value)
 
         for pipe_client, pipe in self.pipeline.iteritems():
+            if pipe_client == "settings":
+                continue
             log.debug("Creating client {}".format(pipe_client))
             client = getattr(self.client_factory, "spam_" + pipe_client)()
-            loop("spam_" + pipe_client, pipe, client.spam)
+            loop(pipe_client, pipe, client.spam, [])
 
     def rotate(self, func, period, number, count):
         """Execute method specific number of times
@@ -14,55 +14,112 @@
 # under the License.
 
 import logging
+import os
 import random
-import traceback
+import time
 
 import client_factory
-from Crypto.PublicKey import RSA
-import faker
-import netaddr
+import datagen
+import keypool
+import logger
+import metrics
+import payload
 
 log = logging.getLogger(__name__)
 
+# Statuses of images whose data is not saved yet
+UPLOADING_IMAGE = ["queued", "saving", "importing"]
+
+
+def _failed(exc):
+    """Log the exception the operation failed with and mark it failed."""
+
+    logger.exception(log, exc, depth=2)
+    metrics.fail(exc)
+
+
+def _section(func_name):
+    """Get the name of the cache section that method works with."""
+
+    if "container" in func_name:
+        return "containers"
+    elif "flavor" in func_name:
+        return "flavors"
+    elif "floatingip" in func_name:
+        return "floatingips"
+    elif "image" in func_name:
+        return "images"
+    elif "keypair" in func_name:
+        return "keypairs"
+    elif "network" in func_name:
+        return "networks"
+    elif "object" in func_name:
+        return "objects"
+    elif "port" in func_name:
+        return "ports"
+    elif "project" in func_name:
+        return "projects"
+    elif "router" in func_name:
+        return "routers"
+    elif "security_group" in func_name:
+        return "security_groups"
+    elif "server" in func_name:
+        return "servers"
+    elif "subnet" in func_name:
+        return "subnets"
+    elif "user" in func_name:
+        return "users"
+    elif "volume" in func_name:
+        return "volumes"
+
+    return ""
+
+
+def _describe(resource, section=None):
+    """Get values of the resource that are kept in the cache indexes.
+
+    Routers are indexed under the network of their gateway and floating
+    IPs under their external network.
+
+    @param resource: Resource returned by the client
+    @type resource: `object`
+
+    @param section: Name of the cache section of the resource
+    @type section: `str`
+    """
+
+    if isinstance(resource, dict):
+        info = resource
+    else:
+        info = vars(resource)
+
+    parent = None
+    if section == "routers":
+        parent = (info.get("external_gateway_info") or {}).get("network_id")
+    elif section == "floatingips":
+        parent = info.get("floating_network_id")
+    else:
+        for field in ["network_id", "container"]:
+            if info.get(field) is not None:
+                parent = info[field]
+                break
+
+    return {"name": info.get("name"), "parent": parent,
+            "state": info.get("status")}
+
 
 def cache(func):
     def wrapper(self, *args, **kwargs):
         processed = func(self, *args, **kwargs)
         if processed is None:
             return
-        section = ""
-
-        if "container" in func.__name__:
-            section = "containers"
-        elif "flavor" in func.__name__:
-            section = "flavors"
-        elif "image" in func.__name__:
-            section = "images"
-        elif "keypair" in func.__name__:
-            section = "keypairs"
-        elif "network" in func.__name__:
-            section = "networks"
-        elif "object" in func.__name__:
-            section = "objects"
-        elif "port" in func.__name__:
-            section = "ports"
-        elif "project" in func.__name__:
-            section = "projects"
-        elif "router" in func.__name__:
-            section = "routers"
-        elif "security_groups" in func.__name__:
-            section = "security_groups"
-        elif "server" in func.__name__:
-            section = "servers"
-        elif "subnet" in func.__name__:
-            section = "subnets"
-        elif "user" in func.__name__:
-            section = "users"
-        elif "volume" in func.__name__:
-            section = "volumes"
 
+        section = _section(func.__name__)
         class_name = self.__class__.__name__.lower().replace("spam", "")
-        self.cache[class_name][section].setdefault(processed.id, False)
+        self.cache.track(class_name, section, processed.id,
+                         **_describe(processed, section))
+        if self.keeper is not None:
+            self.keeper.remember(class_name, section, processed)
 
         return processed
 
@@ -74,89 +131,38 @@ def uncache(func):
         processed = func(self, *args, **kwargs)
         if processed is None:
             return
-        section = ""
-
-        if "container" in func.__name__:
-            section = "containers"
-        elif "flavor" in func.__name__:
-            section = "flavors"
-        elif "image" in func.__name__:
-            section = "images"
-        elif "keypair" in func.__name__:
-            section = "keypairs"
-        elif "network" in func.__name__:
-            section = "networks"
-        elif "object" in func.__name__:
-            section = "objects"
-        elif "port" in func.__name__:
-            section = "ports"
-        elif "project" in func.__name__:
-            section = "projects"
-        elif "router" in func.__name__:
-            section = "routers"
-        elif "security_groups" in func.__name__:
-            section = "security_groups"
-        elif "server" in func.__name__:
-            section = "servers"
-        elif "subnet" in func.__name__:
-            section = "subnets"
-        elif "user" in func.__name__:
-            section = "users"
-        elif "volume" in func.__name__:
-            section = "volumes"
 
+        section = _section(func.__name__)
         class_name = self.__class__.__name__.lower().replace("spam", "")
-        del self.cache[class_name][section][processed]
+        self.cache.untrack(class_name, section, processed)
+        if self.keeper is not None:
+            self.keeper.forget(class_name, section, processed)
 
         return processed
 
     return wrapper
 
 
-def come_up_subnet(neutron_subnets, size):
-    """Come ups subnets with specific size
-
-    @param neutron_subnets: List of neutron subnets
-    @type neutron_subnets: `list(client_factory.Accessible)`
+def report_throughput(kind, name, size, elapsed, done="Uploaded"):
+    """Log transfer speed of the resource.
 
-    @param size: Size of future subnet
-    @type size: `int`
-    """
-
-    log.info("Start generating of subnets")
-    subnets = []
-
-    for neutron_subnet in neutron_subnets:
-        first = netaddr.IPAddress(netaddr.IPNetwork(neutron_subnet.cidr).first)
-        last = netaddr.IPAddress(netaddr.IPNetwork(neutron_subnet.cidr).last)
-        subnets.extend([first, last])
+    @param kind: Kind of the resource, e.g. "object"
+    @type kind: `str`
 
-    subnets.sort()
-    subnets.insert(0, netaddr.IPAddress("192.0.0.0"))
-    subnets.append(netaddr.IPAddress("192.255.255.255"))
+    @param elapsed: Transfer time in seconds
+    @type elapsed: `float`
 
-    max_size = 0
-    for start, end in zip(subnets[::2], subnets[1::2]):
-        space_range = list(netaddr.IPRange(start, end))
-        if str(start) != "192.0.0.0":
-            space_range = space_range[1:]
-        elif str(end) != "192.255.255.255":
-            space_range = space_range[:-1]
-
-        space_size = len(space_range)
-        if space_size > max_size:
-            max_size = space_size
-            start_ip = str(start)
-            end_ip = str(end)
-        if space_size >= size:
-            return netaddr.iprange_to_cidrs(space_range[0],
-                                            space_range[size - 1])[0]
+    @param done: What was done with the data
+    @type done: `str`
+    """
 
-    return netaddr.iprange_to_cidrs(start_ip, end_ip)[0]
+    elapsed = max(elapsed, 1e-6)
+    log.info("%s %s %s of %s bytes in %.3f s, %.2f MB/s",
+             done, kind, name, size, elapsed, size / 2.0 ** 20 / elapsed)
 
 
 class SpamFactory(client_factory.ClientFactory, object):
-    def __init__(self, cache, user, keeper=None):
+    def __init__(self, cache, user, keeper=None, settings=None):
         """Create instance of `SpamFactory` class
 
         @param cahce: Reference to the cache
@@ -167,13 +173,17 @@ class SpamFactory(client_factory.ClientFactory, object):
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
+
+        @param settings: Settings of the pipe by service names
+        @type settings: `dict`
         """
 
         super(SpamFactory, self).__init__(user)
 
         self.cache = cache
         self.keeper = keeper
-        self.faker = faker.Factory.create('en_US')
+        self.faker = datagen.generator
+        self.settings = settings or {}
 
     def spam_cinder(self):
         """Create spam cinder client."""
@@ -183,7 +193,8 @@ class SpamFactory(client_factory.ClientFactory, object):
     def spam_glance(self):
         """Create spam glance client."""
 
-        return SpamGlance(self.cache, self.glance(), self.faker, self.keeper)
+        return SpamGlance(self.cache, self.glance(), self.faker, self.keeper,
+                          self.settings.get("glance"))
 
     def spam_keystone(self):
         """Create spam keystone client."""
@@ -204,7 +215,11 @@ class SpamFactory(client_factory.ClientFactory, object):
     def spam_swift(self):
         """Create spam swift client."""
 
-        return SpamSwift(self.cache, self.swift(), self.faker, self.keeper)
+        settings = self.settings.get("swift", {})
+
+        return SpamSwift(self.cache,
+                         self.swift(settings.get("verify_writes", False)),
+                         self.faker, self.keeper, settings)
 
 
 class SpamCinder(object):
@@ -217,8 +232,8 @@ class SpamCinder(object):
         @param client: An instance of the identity client
         @type: client: `clientmanager.identity`
 
-        @param faker: An instance of the faker object
-        @type faker: `faker.Factory`
+        @param faker: Generator of names, passwords and texts
+        @type faker: `datagen.DataGenerator`
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
@@ -242,13 +257,10 @@ class SpamCinder(object):
         self.spam.volumes.update = self.volume_update
 
     def volume_attach(self):
-        volumes = self.keeper.get("cinder", "volumes", None,
-                                  (lambda x, y: x == [] and
-                                   y in self.cache["cinder"]["volumes"]),
-                                  "attachments", "id")
+        volumes = self.cache.find("cinder", "volumes", state="available")
 
         if len(volumes) > 0:
-            volume = random.choice(volumes)
+            volume_id = random.choice(volumes)
         else:
             log.warning("There is no volumes for attaching, skipping...")
             return
@@ -260,16 +272,23 @@ class SpamCinder(object):
                         "attaching, skipping...")
             return
 
+        volume_name = self.cache.index("cinder", "volumes").get(
+            volume_id).get("name")
+
         try:
-            log.info("Attaching volume {volume_id} to instance {instance_id}".
-                     format(volume_id=volume.id, instance_id=instance.id))
+            log.info("Attaching volume %s to instance %s",
+                     volume_id, instance.id)
             attached = self.native.volumes.attach(
-                volume, instance.id, volume.name)
+                volume_id, instance.id, volume_name)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.cache.index("cinder", "volumes").update(volume_id,
+                                                     state="in-use")
+        self.keeper.touch("cinder", "volumes", volume_id)
+        self.keeper.touch("nova", "servers", instance.id)
+
         return attached
 
     @cache
@@ -283,16 +302,16 @@ class SpamCinder(object):
         volume_sizes = [1, 2, 5, 10, 20, 40, 50, 100, 200, 500]
 
         try:
-            log.info("Creating new volume with name {}".format(name))
+            log.info("Creating new volume with name %s", name)
             created = self.native.volumes.create(
                 name=name, size=random.choice(volume_sizes),
                 description="Volume with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         self.native.volumes.reset_state(created, "available", "detached")
+        created.status = "available"
 
         return created
 
@@ -309,13 +328,18 @@ class SpamCinder(object):
             return
 
         try:
-            log.info("Detaching volume {}".format(volume.id))
+            log.info("Detaching volume %s", volume.id)
             detached = self.native.volumes.detach(volume)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.cache.index("cinder", "volumes").update(volume.id,
+                                                     state="available")
+        self.keeper.touch("cinder", "volumes", volume.id)
+        for attachment in volume.attachments:
+            self.keeper.touch("nova", "servers", attachment["server_id"])
+
         return detached
 
     @uncache
@@ -332,13 +356,14 @@ class SpamCinder(object):
 
         if len(volume.attachments) > 0:
             self.native.volumes.detach(volume)
+            for attachment in volume.attachments:
+                self.keeper.touch("nova", "servers", attachment["server_id"])
 
         try:
-            log.info("Remove volume {}".format(volume.id))
+            log.info("Remove volume %s", volume.id)
             self.native.volumes.delete(volume)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return volume.id
@@ -357,14 +382,15 @@ class SpamCinder(object):
         add_size = random.randint(1, 100)
 
         try:
-            log.info("Extends volume with id {}".format(volume.id))
+            log.info("Extends volume with id %s", volume.id)
             extended = self.native.volumes.extend(
                 volume=volume, new_size=volume.size + add_size)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("cinder", "volumes", volume.id)
+
         return extended
 
     def volume_update(self):
@@ -385,20 +411,21 @@ class SpamCinder(object):
             return
 
         try:
-            log.info("Updating volume with id {}".format(volume.id))
+            log.info("Updating volume with id %s", volume.id)
             updated = self.native.volumes.update(
                 volume=volume, name=name,
                 description="Volume with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("cinder", "volumes", volume.id)
+
         return updated
 
 
 class SpamGlance(object):
-    def __init__(self, cache, client, faker=None, keeper=None):
+    def __init__(self, cache, client, faker=None, keeper=None, settings=None):
         """Create `SpamGlance` class instance.
 
         @param cache: Cache
@@ -407,11 +434,20 @@ class SpamGlance(object):
         @param client: An instance of the identity client
         @type: client: `clientmanager.identity`
 
-        @param faker: An instance of the faker object
-        @type faker: `faker.Factory`
+        @param faker: Generator of names, passwords and texts
+        @type faker: `datagen.DataGenerator`
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
+
+        @param settings: Glance settings of the pipe, with "image_size",
+        a size or a description of `payload.distribution`, or
+        "image_file" images get data of that size or of that file,
+        "disk_format" is "raw" by default, with "report_throughput"
+        upload speed and time-to-active of images are logged, uploads wait
+        "active_timeout" seconds for images to become active, 30 by
+        default, 0 does not wait
+        @type settings: `dict`
         """
 
         self.native = client
@@ -420,6 +456,12 @@ class SpamGlance(object):
         self.faker = faker
         self.keeper = keeper
 
+        self.settings = settings or {}
+        self.image_size = None
+        if "image_size" in self.settings:
+            self.image_size = payload.distribution(
+                self.settings["image_size"])
+
         self.spam = lambda: None
 
         self.spam.images = lambda: None
@@ -436,20 +478,96 @@ class SpamGlance(object):
                                    lambda x: x == name):
                 break
 
+        if (self.image_size is not None or
+                self.settings.get("image_file") is not None):
+            return self.image_upload(name)
+
         try:
-            log.info("Creating image with name {}".format(name))
+            log.info("Creating image with name %s", name)
             created = self.native.images.create(
                 name=name, data=name, disk_format='raw',
                 container_format='bare', visibility='public')
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         self.native.images.upload(created.id, '')
 
         return created
 
+    def image_data(self):
+        """Get the file-like data of a new image and its size."""
+
+        path = self.settings.get("image_file")
+        if path is not None:
+            return open(path, "rb"), os.path.getsize(path)
+
+        size = self.image_size.sample(self.faker.rng())
+
+        return payload.PayloadStream(size), size
+
+    def wait_active(self, image_id):
+        """Wait until the image becomes active.
+
+        @return: The image or `None` if it failed, timed out or the
+        upload does not wait
+        """
+
+        timeout = self.settings.get("active_timeout", 30)
+        if not timeout:
+            return
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            image = self.native.images.get(image_id)
+            if image.status == "active":
+                return image
+            elif image.status in ["killed", "deleted"]:
+                log.critical("Image %s went %s", image_id, image.status)
+                return
+            time.sleep(self.settings.get("active_interval", 1))
+
+        log.critical("Image %s has not become active in time", image_id)
+
+    def image_upload(self, name):
+        """Create an image streaming its data in chunks to the store."""
+
+        data, size = self.image_data()
+
+        try:
+            log.info("Creating image with name %s", name)
+            started = time.time()
+            created = self.native.images.create(
+                name=name, disk_format=self.settings.get("disk_format", "raw"),
+                container_format=self.settings.get("container_format",
+                                                   "bare"),
+                visibility='public')
+        except Exception as exc:
+            _failed(exc)
+            data.close()
+            return
+
+        try:
+            log.info("Uploading %s bytes to image %s", size, created.id)
+            uploading = time.time()
+            self.native.images.upload(created.id, data, image_size=size)
+            uploaded = time.time()
+            active = self.wait_active(created.id)
+        except Exception as exc:
+            _failed(exc)
+            # Image record exists already and is cached to be cleaned up
+            return created
+        finally:
+            data.close()
+
+        if self.settings.get("report_throughput"):
+            report_throughput("image", name, size, uploaded - uploading)
+            if active is not None:
+                log.info("Image %s became active in %.3f s",
+                         name, time.time() - started)
+
+        return active or created
+
     @uncache
     def image_delete(self):
         images = self.keeper.get("glance", "images", None,
@@ -464,11 +582,10 @@ class SpamGlance(object):
             return
 
         try:
-            log.info("Removing image {}".format(image.id))
+            log.info("Removing image %s", image.id)
             self.native.images.delete(image.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return image.id
@@ -485,6 +602,12 @@ class SpamGlance(object):
                                   y in self.cache["glance"]["images"]),
                                  "name", "id")
 
+        # Images still uploading are got again by the next listing
+        for image in images:
+            if image.status in UPLOADING_IMAGE:
+                self.keeper.touch("glance", "images", image.id)
+        images = [image for image in images if image.status == "active"]
+
         if len(images) > 0:
             image = random.choice(images)
         else:
@@ -492,11 +615,10 @@ class SpamGlance(object):
             return
 
         try:
-            log.info("Updating image {}".format(image.id))
+            log.info("Updating image %s", image.id)
             updated = self.native.images.update(image.id, name=name)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return updated
@@ -512,8 +634,8 @@ class SpamKeystone(object):
         @param client: An instance of the identity client
         @type: client: `clientmanager.identity`
 
-        @param faker: An instance of the faker object
-        @type faker: `faker.Factory`
+        @param faker: Generator of names, passwords and texts
+        @type faker: `datagen.DataGenerator`
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
@@ -547,29 +669,26 @@ class SpamKeystone(object):
                 break
 
         try:
-            log.info("Creating project with name {}".format(name))
+            log.info("Creating project with name %s", name)
             created = self.native.projects.create(
                 name=name, domain="default",
                 description="Project {}".format(name), enabled=True)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         # quotas update
         try:
-            log.info("Update cinder quotas for project "
-                     "{}".format(created.name))
+            log.info("Update cinder quotas for project %s", created.name)
             self.keeper.client_factory.cinder().quotas.update(
                 created.id, backup_gigabytes=-1, backups=-1, gigabytes=-1,
                 per_volume_gigabytes=-1, snapshots=-1, volumes=-1)
-            log.info(
-                "Update neutron quotas for project {}".format(created.name))
+            log.info("Update neutron quotas for project %s", created.name)
             self.keeper.client_factory.neutron().quotas.update(
                 created.id, subnet=-1, network=-1, floatingip=-1,
                 subnetpool=-1, port=-1, security_group_rule=-1,
                 security_group=-1, router=-1, rbac_policy=-1)
-            log.info("Update nova quotas for project {}".format(created.name))
+            log.info("Update nova quotas for project %s", created.name)
             self.keeper.client_factory.nova().quotas.update(
                 created.id, cores=-1, fixed_ips=-1, floating_ips=-1,
                 injected_file_content_bytes=-1, injected_file_path_bytes=-1,
@@ -577,8 +696,7 @@ class SpamKeystone(object):
                 metadata_items=-1, ram=-1, security_group_rules=-1,
                 security_groups=-1, server_group_members=-1, server_groups=-1)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -597,11 +715,10 @@ class SpamKeystone(object):
             return
 
         try:
-            log.info("Removing project {}".format(project.name))
+            log.info("Removing project %s", project.name)
             self.native.projects.delete(project)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return project.id
@@ -625,13 +742,12 @@ class SpamKeystone(object):
             return
 
         try:
-            log.info("Trying to update project {}".format(project.name))
+            log.info("Trying to update project %s", project.name)
             updated = self.native.projects.update(
                 project=project, name=name, domain="default",
                 description="Project {}".format(name), enabled=True)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return updated
@@ -658,26 +774,23 @@ class SpamKeystone(object):
             return
 
         try:
-            log.info("Creating user with name {user_name}"
-                     " in project {project}".format(user_name=name,
-                                                    project=project.name))
+            log.info("Creating user with name %s in project %s",
+                     name, project.name)
             created = self.native.users.create(
                 name=name, domain="default", password=password, email=email,
                 description="User with name {}".format(name), enabled=True,
                 default_project=project)
-            log.info("User with id {} was created".format(created.id))
+            log.info("User with id %s was created", created.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         try:
-            log.info("Granting role to user {}".format(created.id))
+            log.info("Granting role to user %s", created.id)
             self.native.roles.grant(
                 self.native.roles.find(name="admin"), created, project=project)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         self.cache["users"][name] = {"username": created.name,
@@ -702,11 +815,10 @@ class SpamKeystone(object):
             return
 
         try:
-            log.info("Trying to delete user {}".format(user.name))
+            log.info("Trying to delete user %s", user.name)
             self.native.users.delete(user)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return user.id
@@ -729,7 +841,7 @@ class SpamKeystone(object):
             log.warning("There is no users for updating, skipping...")
             return
 
-        log.info("Trying to update user {}".format(user.id))
+        log.info("Trying to update user %s", user.id)
         password = self.faker.password()
         email = self.faker.safe_email()
 
@@ -752,8 +864,7 @@ class SpamKeystone(object):
                 password=password, email=email,
                 description="User with name {}".format(name), enabled=True)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return updated
@@ -769,8 +880,8 @@ class SpamNeutron(object):
         @param client: An instance of the identity client
         @type: client: `clientmanager.identity`
 
-        @param faker: An instance of the faker object
-        @type faker: `faker.Factory`
+        @param faker: Generator of names, passwords and texts
+        @type faker: `datagen.DataGenerator`
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
@@ -784,12 +895,18 @@ class SpamNeutron(object):
 
         self.spam = lambda: None
 
+        self.spam.floatingips = lambda: None
+        self.spam.interfaces = lambda: None
         self.spam.networks = lambda: None
         self.spam.ports = lambda: None
         self.spam.routers = lambda: None
         self.spam.security_groups = lambda: None
         self.spam.subnets = lambda: None
 
+        self.spam.floatingips.delete = self.spam_floatingip_delete
+
+        self.spam.interfaces.delete = self.spam_interface_delete
+
         self.spam.networks.create = self.spam_network_create
         self.spam.networks.delete = self.spam_network_delete
         self.spam.networks.update = self.spam_network_update
@@ -810,6 +927,48 @@ class SpamNeutron(object):
         self.spam.subnets.delete = self.spam_subnet_delete
         self.spam.subnets.update = self.spam_subnet_update
 
+    @uncache
+    def spam_floatingip_delete(self):
+        floatingips = self.cache["neutron"]["floatingips"]
+
+        if len(floatingips) > 0:
+            floatingip_id = floatingips.choice()
+        else:
+            log.warning("There is no floating IPs for removing, skipping...")
+            return
+
+        try:
+            log.info("Removing floating IP with id %s", floatingip_id)
+            self.native.floatingips.delete(floatingip_id)
+        except Exception as exc:
+            _failed(exc)
+            return
+
+        return floatingip_id
+
+    def spam_interface_delete(self):
+        interfaces = self.cache["neutron"]["interfaces"]
+
+        if len(interfaces) > 0:
+            port_id = interfaces.choice()
+        else:
+            log.warning("There is no interfaces for removing, skipping...")
+            return
+
+        router_id = self.cache.index("neutron", "interfaces").get(
+            port_id).get("name")
+
+        try:
+            log.info("Removing interface %s of router %s", port_id, router_id)
+            self.native.routers.remove_interface(router_id, port_id=port_id)
+        except Exception as exc:
+            _failed(exc)
+            return
+
+        self.cache.untrack("neutron", "interfaces", port_id)
+
+        return port_id
+
     @cache
     def spam_network_create(self):
         while True:
@@ -819,25 +978,22 @@ class SpamNeutron(object):
                 break
 
         try:
-            log.info("Creating network {}".format(name))
+            log.info("Creating network %s", name)
             created = self.native.networks.create(
                 name=name, description="Network with name {}".format(name),
                 shared=True)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
 
     @uncache
     def spam_network_delete(self):
-        networks = self.keeper.get(
-            "neutron", "networks", "id",
-            lambda x: x in self.cache["neutron"]["networks"])
+        networks = self.cache["neutron"]["networks"]
 
         if len(networks) > 0:
-            network = random.choice(networks)
+            network_id = networks.choice()
         else:
             log.warning("There is no network for removing, skipping...")
             return
@@ -845,55 +1001,53 @@ class SpamNeutron(object):
         # Deleting all the sub-resources of the network
         # --------------------------------------------------------------------#
 
-        routers = self.keeper.get("neutron", "routers", None,
-                                  (lambda x, y: x == network.id and
-                                   y in self.cache["neutron"]["routers"]),
-                                  "network_id", "id")
-
-        subnets = self.keeper.get("neutron", "subnets", None,
-                                  (lambda x, y: x == network.id and
-                                   y in self.cache["neutron"]["routers"]),
-                                  "network_id", "id")
-
-        ports = self.keeper.get("neutron", "ports", None,
-                                (lambda x, y: x == network.id and
-                                 y in self.cache["neutron"]["ports"]),
-                                "network_id", "id")
-
-        floatingips = self.keeper.get(
-            "neutron", "floatingips", None,
-            (lambda x, y: x == network.id and
-             y in self.cache["neutron"]["floatingips"]),
-            "network_id", "id")
+        floatingips, routers, interfaces, ports, subnets = [
+            self.cache.find("neutron", resource, parent=network_id)
+            for resource in ["floatingips", "routers", "interfaces", "ports",
+                             "subnets"]]
+        routers_of = self.cache.index("neutron", "interfaces")
 
         try:
-            for router in routers:
-                self.native.routers.delete(router.id)
-
-            for subnet in subnets:
-                self.native.subnets.delete(subnet.id)
-
-            for port in ports:
-                self.native.ports.delete(port.id)
-
-            for floatingip in floatingips:
-                self.native.floatingips.delete(floatingip.id)
+            for id in floatingips:
+                self.native.floatingips.delete(id)
+                self.cache.untrack("neutron", "floatingips", id)
+
+            # Ports of the interfaces go away with them
+            for id in interfaces:
+                router_id = routers_of.get(id).get("name")
+                self.native.routers.remove_interface(router_id, port_id=id)
+                self.cache.untrack("neutron", "interfaces", id)
+                self.cache.untrack("neutron", "ports", id)
+                self.keeper.touch("neutron", "routers", router_id)
+            ports = [id for id in ports if id not in interfaces]
+
+            # Routers could serve other networks, only gateways are removed
+            for id in routers:
+                self.native.routers.remove_gateway(id)
+                self.cache.index("neutron", "routers").update(id,
+                                                              parent=None)
+                self.keeper.touch("neutron", "routers", id)
+
+            for resource, ids in [("ports", ports), ("subnets", subnets)]:
+                for id in ids:
+                    getattr(self.native, resource).delete(id)
+                    self.cache.untrack("neutron", resource, id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         # --------------------------------------------------------------------#
 
         try:
-            log.info("Deleting network with id {}".format(network.id))
-            self.native.networks.delete(network.id)
+            log.info("Deleting network with id %s", network_id)
+            self.native.networks.delete(network_id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
-        return network.id
+        self.cache.ipam.forget(network_id)
+
+        return network_id
 
     def spam_network_update(self):
         while True:
@@ -913,15 +1067,16 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Updating network {}".format(network.id))
+            log.info("Updating network %s", network.id)
             updated = self.native.networks.update(
                 network.id, name=name,
                 description="Network with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("neutron", "networks", network.id)
+
         return updated
 
     @cache
@@ -943,13 +1098,12 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Creating port with name {}".format(name))
+            log.info("Creating port with name %s", name)
             created = self.native.ports.create(
                 name=name, description="Port with name {}".format(name),
                 network_id=network.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -967,11 +1121,10 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Removing port with id {}".format(port.id))
+            log.info("Removing port with id %s", port.id)
             self.native.ports.delete(port.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return port.id
@@ -994,15 +1147,16 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Update port with id {}".format(port.id))
+            log.info("Update port with id %s", port.id)
             updated = self.native.ports.update(
                 port.id, name=name,
                 description="Port with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("neutron", "ports", port.id)
+
         return updated
 
     @cache
@@ -1014,12 +1168,11 @@ class SpamNeutron(object):
                 break
 
         try:
-            log.info("Creating router with name {}".format(name))
+            log.info("Creating router with name %s", name)
             created = self.native.routers.create(
                 name=name, description="Router with name {}".format(name))
         except Exception as exc:
-            log.critical("Excepttion: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -1037,11 +1190,10 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Removing router with id {}".format(router.id))
+            log.info("Removing router with id %s", router.id)
             self.native.routers.delete(router.id)
         except Exception as exc:
-            log.critical("Excepttion: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return router.id
@@ -1064,15 +1216,16 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Updating router with id {}".format(router.id))
+            log.info("Updating router with id %s", router.id)
             updated = self.native.routers.update(
                 router.id, name=name,
                 description="Router with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("neutron", "routers", router.id)
+
         return updated
 
     @cache
@@ -1084,13 +1237,12 @@ class SpamNeutron(object):
                 break
 
         try:
-            log.info("Creating security group with name {}".format(name))
+            log.info("Creating security group with name %s", name)
             created = self.native.security_groups.create(
                 name=name,
                 description="Security group with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -1109,12 +1261,10 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info(
-                "Remove security group with id {}".format(security_group.id))
+            log.info("Remove security group with id %s", security_group.id)
             self.native.security_groups.delete(security_group.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return security_group.id
@@ -1138,15 +1288,16 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Update security group with id".format(security_group.id))
+            log.info("Update security group with id")
             updated = self.native.security_groups.update(
                 security_group.id, name=name,
                 description="Security group with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("neutron", "security_groups", security_group.id)
+
         return updated
 
     @cache
@@ -1168,19 +1319,25 @@ class SpamNeutron(object):
                         "skipping...")
             return
 
-        subnets = [self.keeper.get("neutron", "subnets", "get", None, subnet)
-                   for subnet in network.subnets]
-        cidr = come_up_subnet(subnets, 2 ** random.randint(3, 4))
+        cidr = self.cache.ipam.allocate(
+            network.id, lambda: [self.keeper.get("neutron", "subnets", "get",
+                                                 None, subnet).cidr
+                                 for subnet in network.subnets])
+
+        if cidr is None:
+            log.warning("There is no free address space in network %s, "
+                        "skipping...", network.id)
+            return
 
         try:
-            log.info("Create subnet with name {}".format(name))
+            log.info("Create subnet with name %s", name)
             created = self.native.subnets.create(
-                cidr=str(cidr), ip_version=4, name=name,
+                cidr=str(cidr), ip_version=cidr.version, name=name,
                 description="Subnet with name {}".format(name),
                 network_id=network.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
+            self.cache.ipam.release(network.id, cidr)
             return
 
         return created
@@ -1198,13 +1355,14 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Remove subnet with id {}".format(subnet.id))
-            self.native.subnets.update(subnet.id)
+            log.info("Remove subnet with id %s", subnet.id)
+            self.native.subnets.delete(subnet.id)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.cache.ipam.release(subnet.network_id, subnet.cidr)
+
         return subnet.id
 
     def spam_subnet_update(self):
@@ -1225,15 +1383,16 @@ class SpamNeutron(object):
             return
 
         try:
-            log.info("Update subnet with id {}".format(subnet.id))
+            log.info("Update subnet with id %s", subnet.id)
             updated = self.native.subnets.update(
                 subnet.id, name=name,
                 description="Subnet with name {}".format(name))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("neutron", "subnets", subnet.id)
+
         return updated
 
 
@@ -1247,8 +1406,8 @@ class SpamNova(object):
         @param client: An instance of the identity client
         @type: client: `clientmanager.identity`
 
-        @param faker: An instance of the faker object
-        @type faker: `faker.Factory`
+        @param faker: Generator of names, passwords and texts
+        @type faker: `datagen.DataGenerator`
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
@@ -1288,14 +1447,13 @@ class SpamNova(object):
         volume_sizes = [1, 2, 5, 10, 20, 40, 50, 100, 200, 500]
 
         try:
-            log.info("Creating flavor with name {}".format(name))
+            log.info("Creating flavor with name %s", name)
             created = self.native.flavors.create(
                 name=name, ram=random.choice(ram_sizes),
                 vcpus=random.choice(vcpus_num),
                 disk=random.choice(volume_sizes))
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -1313,11 +1471,10 @@ class SpamNova(object):
             return
 
         try:
-            log.info("Removing flavor {}".format(flavor.id))
+            log.info("Removing flavor %s", flavor.id)
             self.native.flavors.delete(flavor)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return flavor.id
@@ -1330,13 +1487,16 @@ class SpamNova(object):
                                    lambda x: x == name):
                 break
 
-        key = RSA.generate(2048).publickey().exportKey('OpenSSH')
+        if self.keeper is not None and self.keeper.keypool is not None:
+            key = self.keeper.keypool.get()
+        else:
+            key = keypool.generate()
+
         try:
-            log.info("Creating keypair with name {}".format(name))
+            log.info("Creating keypair with name %s", name)
             created = self.native.keypairs.create(name=name, public_key=key)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -1353,11 +1513,10 @@ class SpamNova(object):
             return
 
         try:
-            log.info("Removing keypair {}".format(keypair.id))
+            log.info("Removing keypair %s", keypair.id)
             self.native.keypairs.delete(keypair)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return keypair.id
@@ -1398,13 +1557,12 @@ class SpamNova(object):
             return
 
         try:
-            log.info("Creating server with name {}".format(name))
+            log.info("Creating server with name %s", name)
             created = self.native.servers.create(
                 name=name, image=image, flavor=flavor,
                 nics=[{"net-id": network.id}])
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -1422,11 +1580,10 @@ class SpamNova(object):
             return
 
         try:
-            log.info("Removing server {}".format(server.id))
+            log.info("Removing server %s", server.id)
             self.native.servers.delete(server)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return server.id
@@ -1449,18 +1606,19 @@ class SpamNova(object):
             return
 
         try:
-            log.info("Updating server {}".format(server.id))
+            log.info("Updating server %s", server.id)
             updated = self.native.servers.update(server=server, name=name)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        self.keeper.touch("nova", "servers", server.id)
+
         return updated
 
 
 class SpamSwift(object):
-    def __init__(self, cache, client, faker=None, keeper=None):
+    def __init__(self, cache, client, faker=None, keeper=None, settings=None):
         """Create `SpamSwift` class instance.
 
         @param cache: Cache
@@ -1469,11 +1627,18 @@ class SpamSwift(object):
         @param client: An instance of the identity client
         @type: client: `clientmanager.identity`
 
-        @param faker: An instance of the faker object
-        @type faker: `faker.Factory`
+        @param faker: Generator of names, passwords and texts
+        @type faker: `datagen.DataGenerator`
 
         @param keeper: Reference to the keeper
         @type keeper: `keeper.Keeper`
+
+        @param settings: Swift settings of the pipe, "object_size" is
+        a size or a description of `payload.distribution`, with
+        "report_throughput" upload speed of objects is logged,
+        "large_object" sets "size", "segment_size", "parallelism" and
+        "manifest" of segmented uploads
+        @type settings: `dict`
         """
 
         self.native = client
@@ -1490,8 +1655,30 @@ class SpamSwift(object):
 
         self.spam.objects = lambda: None
         self.spam.objects.create = self.object_create
+        self.spam.objects.create_large = self.object_create_large
+        self.spam.objects.read = self.object_read
         self.spam.objects.delete = self.object_delete
 
+        self.spam.segment_containers = lambda: None
+        self.spam.segment_containers.delete = self.segment_container_delete
+
+        self.spam.segments = lambda: None
+        self.spam.segments.delete = self.segment_delete
+
+        self.settings = settings or {}
+        self.object_size = None
+        if "object_size" in self.settings:
+            self.object_size = payload.distribution(
+                self.settings["object_size"])
+
+        large = self.settings.get("large_object", {})
+        self.large_object_size = payload.distribution(large.get("size",
+                                                                "1G"))
+        self.segment_size = payload.parse_size(large.get("segment_size",
+                                                         "100M"))
+        self.parallelism = large.get("parallelism", 4)
+        self.manifest = large.get("manifest", "slo")
+
     @cache
     def container_create(self):
         while True:
@@ -1501,11 +1688,10 @@ class SpamSwift(object):
                 break
 
         try:
-            log.info("Creating container with name {}".format(name))
+            log.info("Creating container with name %s", name)
             created = self.native.containers.create(name)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
         return created
@@ -1527,17 +1713,119 @@ class SpamSwift(object):
                 self.native.objects.delete(container, object)
 
         try:
-            log.info("Removing container {}".format(container.id))
+            log.info("Removing container %s", container.id)
             self.native.containers.delete(container)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        for key in self.cache.find("swift", "objects", parent=container.id):
+            self.cache.untrack("swift", "objects", key)
+
+        segments_in = client_factory.segments_container(container.id)
+        if segments_in in self.cache["swift"]["segment_containers"]:
+            try:
+                self.remove_segments_container(segments_in)
+            except Exception as exc:
+                _failed(exc)
+
         return container.id
 
-    @cache
-    def object_create(self):
+    def track_segments(self, container, name, uploaded):
+        """Track the segments container and the segments of a large object.
+
+        Segments are indexed under their container with the ID of the
+        large object as the name.
+        """
+
+        segments_in = client_factory.segments_container(container)
+        if segments_in not in self.cache["swift"]["segment_containers"]:
+            self.cache.track("swift", "segment_containers", segments_in,
+                             name=segments_in, parent=container)
+
+        for segment in uploaded:
+            self.cache.track(
+                "swift", "segments",
+                client_factory.object_key(segments_in, segment),
+                name=client_factory.object_key(container, name),
+                parent=segments_in)
+
+    def delete_segments(self, container, object, manifest):
+        """Delete the segments of a large object after its manifest.
+
+        Segments of static manifests are deleted by swift with them, the
+        ones of dynamic manifests are found by the prefix of the object.
+        """
+
+        if manifest == "dlo":
+            segments_in = client_factory.segments_container(container)
+            prefix = client_factory.object_name(object) + "/"
+            for segment in self.native.objects.list(segments_in,
+                                                    prefix=prefix,
+                                                    full_listing=True):
+                self.native.objects.delete(segments_in, segment)
+
+        for key in self.cache.find("swift", "segments", name=object):
+            self.cache.untrack("swift", "segments", key)
+
+    def remove_segments_container(self, segments_in):
+        """Delete the container of segments with all of them."""
+
+        log.info("Removing container %s", segments_in)
+        for segment in self.native.objects.list(segments_in,
+                                                full_listing=True):
+            self.native.objects.delete(segments_in, segment)
+        self.native.containers.delete(segments_in)
+
+        for key in self.cache.find("swift", "segments", parent=segments_in):
+            self.cache.untrack("swift", "segments", key)
+        self.cache.untrack("swift", "segment_containers", segments_in)
+
+    def segment_container_delete(self):
+        containers = self.cache["swift"]["segment_containers"]
+
+        if len(containers) > 0:
+            segments_in = containers.choice()
+        else:
+            log.warning("There is no segments containers for removing, "
+                        "skipping...")
+            return
+
+        try:
+            self.remove_segments_container(segments_in)
+        except Exception as exc:
+            _failed(exc)
+            return
+
+        return segments_in
+
+    def segment_delete(self):
+        segments = self.cache["swift"]["segments"]
+
+        if len(segments) > 0:
+            segment = segments.choice()
+        else:
+            log.warning("There is no segments for removing, skipping...")
+            return
+
+        try:
+            log.info("Removing segment %s", segment)
+            self.native.objects.delete(
+                segment.split("/", 1)[0], client_factory.object_name(segment))
+        except Exception as exc:
+            _failed(exc)
+            return
+
+        self.cache.untrack("swift", "segments", segment)
+
+        return segment
+
+    def object_target(self):
+        """Pick a container and a free object name in it.
+
+        @return: Container and name or `None` if there are no containers
+        """
+
         containers = self.keeper.get(
             "swift", "containers", "id",
             lambda x: x in self.cache["swift"]["containers"])
@@ -1555,35 +1843,125 @@ class SpamSwift(object):
                                    lambda x: x == name, list_args=[container]):
                 break
 
+        return container, name
+
+    @cache
+    def object_create(self):
+        target = self.object_target()
+        if target is None:
+            return
+        container, name = target
+
+        if self.object_size is not None:
+            size = self.object_size.sample(self.faker.rng())
+            content = payload.PayloadStream(size)
+        else:
+            content = self.faker.paragraph()
+            size = len(content)
+
         try:
-            log.info("Creating object with name {0} in container {1}".
-                     format(name, container.name))
-            created = self.native.objects.create(container, name,
-                                                 self.faker.paragraph())
+            log.info("Creating object with name %s in container %s",
+                     name, container.name)
+            started = time.time()
+            created = self.native.objects.create(container, name, content,
+                                                 content_length=size)
+            elapsed = time.time() - started
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
+        if self.settings.get("report_throughput"):
+            report_throughput("object", name, size, elapsed)
+
+        return created
+
+    @cache
+    def object_create_large(self):
+        target = self.object_target()
+        if target is None:
+            return
+        container, name = target
+
+        size = self.large_object_size.sample(self.faker.rng())
+        timings = []
+        uploaded = []
+
+        try:
+            log.info("Creating large object with name %s of %s bytes in "
+                     "container %s", name, size, container.name)
+            started = time.time()
+            created = self.native.objects.create_segmented(
+                container, name,
+                lambda offset, length: payload.PayloadStream(length, offset),
+                size, self.segment_size, self.parallelism, self.manifest,
+                timings, uploaded)
+            elapsed = time.time() - started
+        except Exception as exc:
+            _failed(exc)
+            return
+        finally:
+            # Segments of failed uploads are kept to be cleaned
+            self.track_segments(container.name, name, uploaded)
+
+        latencies = sorted(timing[2] for timing in timings)
+        log.info("Uploaded large object %s in %.3f s, %s segments took "
+                 "%.3f s min, %.3f s median, %.3f s max",
+                 name, elapsed, len(latencies), latencies[0],
+                 latencies[len(latencies) / 2], latencies[-1])
+        if self.settings.get("report_throughput"):
+            report_throughput("large object", name, size, elapsed)
+
+        # Manifest type is kept as the state to delete the segments with it
+        created["status"] = self.manifest
+
         return created
 
+    def object_read(self):
+        containers = self.cache["swift"]["containers"]
+
+        if len(containers) > 0:
+            container = containers.choice()
+        else:
+            log.warning("There is no containers for reading object, "
+                        "skipping...")
+            return
+
+        objects = self.cache.find("swift", "objects", parent=container)
+
+        if len(objects) > 0:
+            object = random.choice(objects)
+        else:
+            log.warning("There is no objects for reading, skipping...")
+            return
+
+        try:
+            log.info("Reading object %s", object)
+            started = time.time()
+            read = self.native.objects.read(
+                container, client_factory.object_name(object))
+            elapsed = time.time() - started
+        except Exception as exc:
+            _failed(exc)
+            return
+
+        if self.settings.get("report_throughput"):
+            report_throughput("object", object, read["bytes_read"], elapsed,
+                              "Downloaded")
+
+        return read
+
     @uncache
     def object_delete(self):
-        containers = self.keeper.get(
-            "swift", "containers", "id",
-            lambda x: x in self.cache["swift"]["containers"])
+        containers = self.cache["swift"]["containers"]
 
         if len(containers) > 0:
-            container = random.choice(containers)
+            container = containers.choice()
         else:
             log.warning("There is no containers for deleting object, "
                         "skipping...")
             return
 
-        objects = self.keeper.get(
-            "swift", "objects", "id",
-            lambda x: x in self.cache["swift"]["objects"],
-            list_args=[container])
+        objects = self.cache.find("swift", "objects", parent=container)
 
         if len(objects) > 0:
             object = random.choice(objects)
@@ -1592,12 +1970,18 @@ class SpamSwift(object):
             return
 
         try:
-            log.info("Removing object {0} from container {1}".
-                     format(object.id, container.id))
-            self.native.objects.delete(container, object)
+            log.info("Removing object %s", object)
+            manifest = self.cache.index("swift", "objects").get(
+                object).get("state")
+            query_string = None
+            if manifest == "slo":
+                query_string = "multipart-manifest=delete"
+            self.native.objects.delete(
+                container, client_factory.object_name(object), query_string)
+            if manifest in ["slo", "dlo"]:
+                self.delete_segments(container, object, manifest)
         except Exception as exc:
-            log.critical("Exception: {}".format(exc))
-            traceback.print_exc()
+            _failed(exc)
             return
 
-        return object.id
+        return object
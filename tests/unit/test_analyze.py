@@ -0,0 +1,120 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+from spamostack import analyze
+from spamostack import results
+from tests.unit import test
+
+CREATE = ("p", "nova", "servers", "create")
+DELETE = ("p", "nova", "servers", "delete")
+
+
+class AnalyzeTestCase(test.TestCase):
+    def setUp(self):
+        super(AnalyzeTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.file = os.path.join(self.path, "results")
+
+        sink = results.ResultSink(self.file)
+        for second in xrange(100):
+            sink.record(1000.0 + second, (second + 1) / 100.0, CREATE, "ok")
+        sink.record(1010.0, 0.5, DELETE, "error", 404)
+        sink.record(1020.0, 0.5, DELETE, "error", 404)
+        sink.record(1030.0, 0.5, DELETE, "error", 0)
+        sink.close({CREATE: 1.0, DELETE: 0.5})
+
+        self.records, self.dictionaries = analyze.load(self.file)
+
+    def test_load(self):
+        self.assertEqual(103, len(self.records))
+        self.assertEqual(1000.0, self.records["start"][0])
+        self.assertEqual(10000, self.records["duration"][0])
+
+    def test_report(self):
+        report = analyze.Analysis(self.records, self.dictionaries,
+                                  window=10).report()
+
+        create = report["latency"][0]
+        self.assertEqual("p/nova/servers/create", create["action"])
+        self.assertEqual(100, create["count"])
+        self.assertAlmostEqual(0.5, create["p50"])
+        self.assertAlmostEqual(0.99, create["p99"])
+        self.assertAlmostEqual(1.0, create["max"])
+
+        self.assertEqual(10, len(report["throughput"]))
+        self.assertEqual(1.0, report["throughput"][0]["ok"])
+        self.assertEqual(0.1, report["throughput"][1]["error"])
+
+        first = report["windows"][0]
+        self.assertEqual((0, 10), (first["window"], first["count"]))
+        self.assertAlmostEqual(0.05, first["p50"])
+
+        self.assertEqual([{"action": "p/nova/servers/delete", "status": 404,
+                           "count": 2},
+                          {"action": "p/nova/servers/delete", "status": 0,
+                           "count": 1}], report["errors"])
+
+        drift = dict((row["action"], row) for row in report["drift"])
+        self.assertAlmostEqual(1.0, drift["p/nova/servers/create"]["target"])
+        self.assertAlmostEqual(0.0, drift["p/nova/servers/create"]["drift"])
+
+    def test_done_latencies_active_rates(self):
+        path = os.path.join(self.path, "sequential")
+        sink = results.ResultSink(path)
+        for second in xrange(10):
+            sink.record(1000.0 + second, 0.5, CREATE, "ok")
+            sink.record(1000.0 + second, 0.01, CREATE, "skipped")
+        # Deleting starts when creating is over
+        for second in xrange(10):
+            sink.record(1100.0 + second, 2.0, DELETE, "ok")
+        sink.record(1110.0, 0.1, DELETE, "error", 500)
+        sink.close({CREATE: 2.0, DELETE: 1.0})
+
+        report = analyze.Analysis(*analyze.load(path)).report()
+
+        latency = dict((row["action"], row) for row in report["latency"])
+        create = latency["p/nova/servers/create"]
+        self.assertEqual((10, 0), (create["count"], create["errors"]))
+        self.assertAlmostEqual(0.5, create["p50"])
+        # Twenty operations from 1000 to 1009.5
+        self.assertAlmostEqual(20 / 9.5, create["rate"], places=5)
+        delete = latency["p/nova/servers/delete"]
+        self.assertEqual((11, 1), (delete["count"], delete["errors"]))
+        self.assertAlmostEqual(2.0, delete["p99"])
+        self.assertAlmostEqual(2.0, delete["max"])
+
+        drift = dict((row["action"], row["achieved"])
+                     for row in report["drift"])
+        self.assertAlmostEqual(20 / 9.5, drift["p/nova/servers/create"],
+                               places=5)
+        # Eleven operations from 1100 to 1111
+        self.assertAlmostEqual(1.0, drift["p/nova/servers/delete"],
+                               places=5)
+
+    def test_main(self):
+        output = os.path.join(self.path, "report.json")
+        tables = os.path.join(self.path, "tables")
+
+        analyze.main([self.file, "--json", output, "--csv", tables])
+
+        with open(output) as report:
+            self.assertEqual(103, json.load(report)["records"])
+        self.assertTrue(os.path.exists(os.path.join(tables, "latency.csv")))
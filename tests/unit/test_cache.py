@@ -0,0 +1,261 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+
+import leveldb
+import mock
+
+from spamostack import backends
+from spamostack import cache
+from tests.unit import test
+
+
+ENVIRON = {"OS_USERNAME": "admin", "OS_PASSWORD": "secret",
+           "OS_PROJECT_NAME": "admin", "OS_PROJECT_DOMAIN_ID": "default",
+           "OS_USER_DOMAIN_ID": "default",
+           "OS_AUTH_URL": "http://localhost:5000/v3",
+           "OS_COMPUTE_API_VERSION": "2", "OS_IDENTITY_API_VERSION": "3",
+           "OS_IMAGE_API_VERSION": "2", "OS_NETWORK_API_VERSION": "2",
+           "OS_VOLUME_API_VERSION": "2"}
+
+
+class IdSetTestCase(test.TestCase):
+    def setUp(self):
+        super(IdSetTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_pack_id(self):
+        for key in ["6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e",
+                    "6d3a8d486b0e4c3aa6b44b2a5c0e1f7e", "42", "word",
+                    "6D3A8D486B0E4C3AA6B44B2A5C0E1F7E",
+                    "zz3a8d486b0e4c3aa6b44b2a5c0e1f7e"]:
+            self.assertEqual(key, cache.unpack_id(cache.pack_id(key)))
+
+        self.assertEqual(17, len(cache.pack_id(
+            u"6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e")))
+
+    def test_add_discard(self):
+        ids = cache.IdSet(
+            backends.LevelDBStore(os.path.join(self.path, "ids")))
+        ids.add(u"6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e")
+        ids.add("word")
+        ids.add("word")
+
+        self.assertEqual(2, len(ids))
+        self.assertIn("6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e", ids)
+        self.assertNotIn(None, ids)
+
+        ids.discard("word")
+        ids.discard("missing")
+        self.assertEqual(["6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e"], list(ids))
+        self.assertEqual("6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e", ids.choice())
+
+        ids.discard("6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e")
+        self.assertRaises(IndexError, ids.choice)
+
+    def test_load_legacy(self):
+        path = os.path.join(self.path, "ids")
+        db = leveldb.LevelDB(path)
+        db.Put("6d3a8d486b0e4c3aa6b44b2a5c0e1f7e", "False")
+        del db
+
+        ids = cache.IdSet(backends.LevelDBStore(path))
+        self.assertEqual(["6d3a8d486b0e4c3aa6b44b2a5c0e1f7e"], list(ids))
+        del ids
+
+        self.assertEqual(["6d3a8d486b0e4c3aa6b44b2a5c0e1f7e"],
+                         list(cache.IdSet(backends.LevelDBStore(path))))
+
+
+class ResourceIndexTestCase(test.TestCase):
+    def setUp(self):
+        super(ResourceIndexTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def store(self):
+        return backends.LevelDBStore(os.path.join(self.path, "index"))
+
+    def test_find(self):
+        index = cache.ResourceIndex(self.store())
+        index.add("a", name="first", parent="net", state="available")
+        index.add("b", name="second", parent="net", state="in-use")
+
+        self.assertEqual(["a", "b"], sorted(index.find(parent="net")))
+        self.assertEqual(["b"], index.find(parent="net", state="in-use"))
+        self.assertEqual([], index.find(name="third"))
+
+    def test_update_and_remove(self):
+        index = cache.ResourceIndex(self.store())
+        index.add("a", name="first", state="available")
+        index.update("a", state="in-use")
+
+        self.assertEqual([], index.find(state="available"))
+        self.assertEqual(["a"], index.find(name="first", state="in-use"))
+
+        index.remove("a")
+        self.assertEqual([], index.find(name="first"))
+        self.assertEqual({}, index.get("a"))
+
+    def test_persistence(self):
+        index = cache.ResourceIndex(self.store())
+        index.add("a", name=u"first", parent="net")
+        del index
+
+        index = cache.ResourceIndex(self.store())
+        self.assertEqual(["a"], index.find(parent="net"))
+        self.assertEqual(u"first", index.get("a")["name"])
+
+
+class CacheTestCase(test.TestCase):
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        mock.patch.dict(os.environ, ENVIRON).start()
+
+    def test_track_untrack(self):
+        db = cache.Cache(os.path.join(self.path, "db"))
+        db.track("neutron", "subnets", "s1", name="sub", parent="n1")
+
+        self.assertIn("s1", db["neutron"]["subnets"])
+        self.assertEqual(["s1"], db.find("neutron", "subnets", parent="n1"))
+
+        db.untrack("neutron", "subnets", "s1")
+        self.assertNotIn("s1", db["neutron"]["subnets"])
+        self.assertEqual([], db.find("neutron", "subnets", parent="n1"))
+
+    def test_memory_backend(self):
+        path = os.path.join(self.path, "db")
+        db = cache.Cache(path, "memory")
+        db.track("nova", "servers", "s1", name="server")
+
+        self.assertIn("s1", db["nova"]["servers"])
+        self.assertEqual(["s1"], db.find("nova", "servers", name="server"))
+        self.assertFalse(os.path.exists(path))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, cache.Cache, self.path, "unknown")
+
+    def test_backend_errors_propagate(self):
+        backend = mock.Mock(side_effect=KeyError("section"))
+        with mock.patch.dict(backends.BACKENDS, {"broken": backend}):
+            self.assertRaises(KeyError, backends.get_backend, "broken",
+                              self.path)
+        backend.assert_called_once_with(self.path)
+
+
+class SQLiteBackendTestCase(test.TestCase):
+    def setUp(self):
+        super(SQLiteBackendTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        mock.patch.dict(os.environ, ENVIRON).start()
+        mock.patch.object(cache, "SYNC_INTERVAL", 0).start()
+
+    def test_track_untrack(self):
+        db = cache.Cache(self.path, "sqlite")
+        db.track("neutron", "subnets", "6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e",
+                 name="sub", parent="n1")
+        db.track("neutron", "subnets", "s2", parent="n1")
+        db.untrack("neutron", "subnets", "s2")
+
+        db = cache.Cache(self.path, "sqlite")
+        self.assertEqual(["6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e"],
+                         list(db["neutron"]["subnets"]))
+        self.assertEqual(["6d3a8d48-6b0e-4c3a-a6b4-4b2a5c0e1f7e"],
+                         db.find("neutron", "subnets", parent="n1"))
+        self.assertEqual("admin", db["users"]["admin"]["username"])
+
+    def test_batch(self):
+        db = cache.Cache(self.path, "sqlite")
+        other = backends.SQLiteBackend(self.path).open("nova", "servers",
+                                                       "set")
+        with db.batch():
+            db.track("nova", "servers", "s1", state="ACTIVE")
+            db.track("nova", "servers", "s2", state="ACTIVE")
+            self.assertEqual([], other.items())
+
+        self.assertEqual(2, len(other.items()))
+
+    def test_changes_of_other_processes(self):
+        db = cache.Cache(self.path, "sqlite")
+        other = cache.Cache(self.path, "sqlite")
+
+        other.track("glance", "images", "i1", name="cirros")
+        self.assertIn("i1", db["glance"]["images"])
+        self.assertEqual(["i1"], db.find("glance", "images", name="cirros"))
+
+        other.untrack("glance", "images", "i1")
+        self.assertNotIn("i1", db["glance"]["images"])
+
+    def test_index_and_attrs_sync_separately(self):
+        db = cache.Cache(self.path, "sqlite")
+        other = cache.Cache(self.path, "sqlite")
+        index = db.index("glance", "images")
+
+        other.track("glance", "images", "i1", name="cirros")
+        # The attributes of the index see the change first
+        self.assertEqual({"name": "cirros", "parent": None, "state": None},
+                         index.attrs[cache.pack_id("i1")])
+        self.assertEqual(["i1"], index.find(name="cirros"))
+
+    def test_own_writes_do_not_reload(self):
+        db = cache.Cache(self.path, "sqlite")
+        images = db["glance"]["images"]
+        images.add("i1")
+
+        with mock.patch.object(images, "reload") as reload:
+            images.add("i2")
+            self.assertIn("i2", images)
+            self.assertFalse(reload.called)
+
+    def test_index_does_not_add_to_inventory(self):
+        db = cache.Cache(self.path, "sqlite")
+        db.index("nova", "servers").update("s1", state="ACTIVE")
+
+        db = cache.Cache(self.path, "sqlite")
+        self.assertNotIn("s1", db["nova"]["servers"])
+        self.assertEqual([], db.find("nova", "servers", state="ACTIVE"))
+
+    def test_writes_counted_per_section(self):
+        db = cache.Cache(self.path, "sqlite")
+        other = cache.Cache(self.path, "sqlite")
+        images = db["glance"]["images"]
+        self.assertNotIn("i1", images)
+
+        with mock.patch.object(images, "reload") as reload:
+            other.track("nova", "servers", "s1")
+            self.assertNotIn("i1", images)
+            self.assertFalse(reload.called)
+
+    def test_index_relinks_after_attrs_reload(self):
+        db = cache.Cache(self.path, "sqlite")
+        other = cache.Cache(self.path, "sqlite")
+        index = db.index("neutron", "subnets")
+        db.track("neutron", "subnets", "s1", parent="n1")
+        self.assertEqual(["s1"], index.find(parent="n1"))
+
+        other.untrack("neutron", "subnets", "s1")
+        # A missed lookup reloads the attributes without the index
+        self.assertNotIn(cache.pack_id("s2"), index.attrs)
+        self.assertNotIn(cache.pack_id("s1"), index.attrs)
+        # The index itself is not due to sync yet
+        with mock.patch.object(index, "sync"):
+            self.assertEqual([], index.find(parent="n1"))
@@ -0,0 +1,184 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import mock
+
+from spamostack import client_factory
+from spamostack import metrics
+from tests.unit import test
+
+
+class SwiftTestCase(test.TestCase):
+    def setUp(self):
+        super(SwiftTestCase, self).setUp()
+        self.native = mock.Mock(token="token", url="http://swift")
+        self.native.head_object.side_effect = lambda *args: {
+            "content-length": "3"}
+        self.swift = client_factory.Swift(self.native)
+        connection = mock.patch.object(client_factory,
+                                       "Connection").start()
+        self.worker = connection.return_value
+        self.worker.put_object.side_effect = lambda container, name, data, \
+            content_length: "etag-" + name[-1]
+
+    def test_create_segmented_slo(self):
+        timings = []
+        uploaded = []
+        content = mock.Mock(side_effect=lambda offset, size: "data")
+
+        created = self.swift.objects.create_segmented(
+            "c", "large", content, 250, 100, parallelism=2, timings=timings,
+            uploaded=uploaded)
+
+        self.assertEqual("c/large", created["id"])
+        self.assertEqual([mock.call(0, 100), mock.call(100, 100),
+                          mock.call(200, 50)],
+                         sorted(content.call_args_list))
+        self.assertEqual([0, 1, 2], [timing[0] for timing in timings])
+        self.native.put_container.assert_called_once_with("c_segments")
+
+        args, kwargs = self.native.put_object.call_args
+        self.assertEqual(("c", "large"), args[:2])
+        self.assertEqual("multipart-manifest=put", kwargs["query_string"])
+        manifest = json.loads(args[2])
+        self.assertEqual([100, 100, 50],
+                         [segment["size_bytes"] for segment in manifest])
+        self.assertEqual(["etag-0", "etag-1", "etag-2"],
+                         [segment["etag"] for segment in manifest])
+        self.assertTrue(manifest[0]["path"].startswith("/c_segments/large/"))
+        self.assertEqual(sorted(segment["path"][len("/c_segments/"):]
+                                for segment in manifest), sorted(uploaded))
+
+    def test_create_segmented_attributes_requests(self):
+        registry = metrics.Metrics()
+        mock.patch.object(metrics, "registry", registry).start()
+        key = ("pipe", "swift", "objects", "create_large")
+
+        def put_object(container, name, data, content_length):
+            registry.api_call("object-store", content_length, 0)
+            return "etag"
+
+        self.worker.put_object.side_effect = put_object
+        registry.timed(key, lambda: self.swift.objects.create_segmented(
+            "c", "large", lambda offset, size: "data", 250, 100,
+            parallelism=2))()
+
+        traffic = registry.traffic()
+        self.assertEqual([3, 250, 0], traffic[key + ("object-store",)])
+        self.assertNotIn(metrics.BACKGROUND + ("object-store",), traffic)
+
+    def test_create_segmented_dlo(self):
+        self.swift.objects.create_segmented(
+            "c", "large", lambda offset, size: "data", 10, 100,
+            manifest="dlo")
+
+        kwargs = self.native.put_object.call_args[1]
+        self.assertTrue(kwargs["headers"]["X-Object-Manifest"].startswith(
+            "c_segments/large/"))
+        self.assertEqual(1, self.worker.put_object.call_count)
+
+    def test_get_heads(self):
+        got = self.swift.objects.get("c", "o")
+
+        self.assertEqual({"content-length": "3", "id": "c/o", "name": "o",
+                          "container": "c"}, got)
+        self.native.head_object.assert_called_once_with("c", "o", None, None)
+        self.assertFalse(self.native.get_object.called)
+
+    def test_read(self):
+        self.native.get_object.return_value = ({"etag": "e"},
+                                               iter(["abc", "de"]))
+
+        read = self.swift.objects.read("c", "o")
+
+        self.assertEqual(5, read.bytes_read)
+        self.assertEqual(65536, self.native.get_object.call_args[0][2])
+
+    def test_object_name(self):
+        self.assertEqual("dir/o", client_factory.object_name("c/dir/o"))
+        self.assertEqual("o", client_factory.object_name("o"))
+
+    def test_list_from_listing(self):
+        self.native.get_container.return_value = ({}, [
+            {"name": "o1", "bytes": 3, "hash": "e1",
+             "content_type": "text/plain"},
+            {"name": "o2", "bytes": 5, "hash": "e2",
+             "content_type": "text/plain"},
+            {"subdir": "dir/"}])
+
+        listed = self.swift.objects.list("c", **{"content-length": "3"})
+
+        self.assertEqual(["o1"], [item.name for item in listed])
+        self.assertEqual("c", listed[0].container)
+        self.assertFalse(self.native.head_object.called)
+        self.assertFalse(self.worker.head_object.called)
+
+    def test_list_heads_for_filter(self):
+        self.native.get_account.return_value = ({}, [
+            {"name": "c1", "count": 1, "bytes": 3},
+            {"name": "c2", "count": 2, "bytes": 5}])
+        self.worker.head_container.side_effect = lambda name: {
+            "x-container-read": ".r:*" if name == "c2" else ""}
+
+        listed = self.swift.containers.list(**{"x-container-read": ".r:*"})
+
+        self.assertEqual(["c2"], [item.name for item in listed])
+        self.assertEqual(2, self.worker.head_container.call_count)
+        self.assertFalse(self.native.head_container.called)
+
+    def test_create_without_read_back(self):
+        def put_object(*args):
+            args[-1]["headers"] = {"etag": "e", "content-length": "0",
+                                   "last-modified": "now"}
+
+        self.native.put_object.side_effect = put_object
+
+        created = self.swift.objects.create("c", "o", "abc",
+                                            headers={"X-Object-Meta-A": "1"})
+
+        self.assertEqual({"id": "c/o", "name": "o", "container": "c",
+                          "etag": "e", "last-modified": "now",
+                          "content-length": "3", "x-object-meta-a": "1"},
+                         created)
+        self.assertFalse(self.native.head_object.called)
+
+    def test_create_verified(self):
+        swift = client_factory.Swift(self.native, verify_writes=True)
+        self.native.head_container.return_value = {}
+
+        created = swift.containers.create("c")
+
+        self.native.head_container.assert_called_once_with("c", None)
+        self.assertEqual("c", created.id)
+
+
+class TrafficTestCase(test.TestCase):
+    def test_swift_requests_counted(self):
+        registry = metrics.Metrics()
+        mock.patch.object(metrics, "registry", registry).start()
+        connection = client_factory.HTTPConnection("http://swift")
+        response = mock.Mock(headers={"Content-Length": "2048"})
+        response.request.headers = {}
+        response.request.body = "x" * 100
+        connection.request_session = mock.Mock()
+        connection.request_session.request.return_value = response
+        key = ("pipe", "swift", "objects", "read")
+
+        registry.timed(key, connection._request)("GET", "http://swift/c/o")
+
+        self.assertEqual([1, 100, 2048],
+                         registry.traffic()[key + ("object-store",)])
@@ -0,0 +1,80 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import random
+import shutil
+import tempfile
+
+import numpy
+
+from spamostack import compare
+from spamostack import results
+from tests.unit import test
+
+CREATE = ("p", "nova", "servers", "create")
+DELETE = ("p", "nova", "servers", "delete")
+
+
+class CompareTestCase(test.TestCase):
+    def setUp(self):
+        super(CompareTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        rand = random.Random(1)
+
+        # Creates are twice as slow after, deletes are the same
+        self.files = []
+        for slowdown in [1, 2]:
+            path = os.path.join(self.path, str(slowdown))
+            sink = results.ResultSink(path)
+            for second in xrange(500):
+                sink.record(1000.0 + second,
+                            rand.uniform(0.5, 1.5) * slowdown, CREATE, "ok")
+                sink.record(1000.0 + second, rand.uniform(0.1, 0.2), DELETE,
+                            "ok")
+            sink.close()
+            self.files.append(path)
+
+    def test_bootstrap(self):
+        rand = numpy.random.RandomState(1)
+        before = rand.uniform(1, 2, 1000)
+
+        changes, low, high = compare.bootstrap(before, before * 1.5, 200,
+                                               rand=rand)
+
+        self.assertEqual(len(compare.STATISTICS), len(changes))
+        for change, low, high in zip(changes, low, high):
+            self.assertAlmostEqual(0.5, change)
+            self.assertTrue(0 < low < 0.5 < high)
+
+    def test_compare(self):
+        rows = compare.compare(compare.Run(self.files[0]),
+                               compare.Run(self.files[1]), resamples=200,
+                               rand=numpy.random.RandomState(1))
+        rows = dict(((row["action"], row["statistic"]), row) for row in rows)
+
+        create = rows[("p/nova/servers/create", "p90")]
+        self.assertTrue(create["regression"])
+        self.assertAlmostEqual(100, create["change"], delta=15)
+        delete = rows[("p/nova/servers/delete", "p50")]
+        self.assertFalse(delete["regression"])
+        self.assertTrue(delete["low"] < 0 < delete["high"])
+        # Same number of operations in a longer run
+        self.assertLess(rows[("p/nova/servers/create", "rate")]["change"], 0)
+
+    def test_main(self):
+        self.assertEqual(1, compare.main(self.files + ["--seed", "1"]))
+        self.assertEqual(0, compare.main([self.files[0], self.files[0]]))
@@ -0,0 +1,68 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import string
+import threading
+
+from spamostack import datagen
+from tests.unit import test
+
+
+class DataGeneratorTestCase(test.TestCase):
+    def test_values(self):
+        generator = datagen.DataGenerator(batch_size=16)
+
+        self.assertIn(generator.word(), datagen.WORDS)
+        first, last = generator.name().split(" ")
+        self.assertIn(first, datagen.FIRST_NAMES)
+        self.assertIn(last, datagen.LAST_NAMES)
+        self.assertTrue(generator.safe_email().endswith(datagen.DOMAINS))
+        self.assertTrue(generator.paragraph().endswith("."))
+
+        password = generator.password()
+        self.assertEqual(10, len(password))
+        for chars in [string.digits, string.ascii_uppercase,
+                      string.ascii_lowercase, datagen.SPECIAL_CHARS]:
+            self.assertTrue(set(password) & set(chars))
+
+    def test_seed(self):
+        generator = datagen.DataGenerator(seed=42, batch_size=4)
+        first = [generator.word() for _ in xrange(10)]
+
+        generator.seed(42)
+        self.assertEqual(first, [generator.word() for _ in xrange(10)])
+
+        generator.seed(43)
+        self.assertNotEqual(first, [generator.word() for _ in xrange(10)])
+
+    def test_threads_have_own_buffers(self):
+        generator = datagen.DataGenerator(seed=42, batch_size=4)
+        words = {}
+
+        def take(name):
+            words[name] = [generator.word() for _ in xrange(10)]
+
+        def run(name, key):
+            thread = threading.Thread(target=take, args=(key,), name=name)
+            thread.start()
+            thread.join()
+
+        run("first", "first")
+        run("second", "second")
+        self.assertNotEqual(words["first"], words["second"])
+
+        generator.seed(42)
+        run("first", "again")
+        self.assertEqual(words["first"], words["again"])
@@ -0,0 +1,80 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import urllib2
+
+from spamostack import exporter
+from spamostack import metrics
+from tests.unit import test
+
+LABELS = 'pipe="p",service="nova",resource="servers",action="create"'
+
+
+class ExporterTestCase(test.TestCase):
+    def setUp(self):
+        super(ExporterTestCase, self).setUp()
+        self.registry = metrics.Metrics()
+        key = ("p", "nova", "servers", "create")
+        self.registry.target(key, 0.5)
+        self.registry.timed(key, lambda: "server")()
+        self.registry.timed(key, lambda: None)()
+        self.registry.shard().started[key] += 1
+        self.registry.timed(key, lambda: self.registry.api_call(
+            "compute", 100, 2000))()
+        self.registry.drifted("nova", "servers", "removed", 2)
+        now = metrics.monotonic()
+        self.registry.span(key, now - 1e6, now + 1e6)
+
+    def test_render(self):
+        lines = exporter.render(self.registry).splitlines()
+
+        self.assertIn("spamostack_operations_issued_total{%s} 4.0" % LABELS,
+                      lines)
+        self.assertIn("spamostack_operations_total{%s,outcome=\"ok\"} 1.0" %
+                      LABELS, lines)
+        self.assertIn("spamostack_operations_in_flight{%s} 1.0" % LABELS,
+                      lines)
+        self.assertIn("spamostack_target_rate{%s} 0.5" % LABELS, lines)
+        # Three finished operations in two million seconds
+        self.assertIn("spamostack_achieved_rate{%s} %r" % (LABELS, 1.5e-6),
+                      lines)
+        self.assertIn("spamostack_api_calls_total{service=\"compute\"} 1.0",
+                      lines)
+        self.assertIn("spamostack_operation_bytes_received_total"
+                      "{%s,api=\"compute\"} 2000.0" % LABELS, lines)
+        # One request for three finished operations
+        self.assertIn("spamostack_requests_per_operation{%s} %r" % (
+            LABELS, 1 / 3.0), lines)
+        self.assertIn("# TYPE spamostack_operation_duration_seconds summary",
+                      lines)
+        self.assertIn("spamostack_operation_duration_seconds_count"
+                      "{%s,outcome=\"skipped\"} 2.0" % LABELS, lines)
+        self.assertIn("spamostack_cache_drift_total{service=\"nova\","
+                      "resource=\"servers\",kind=\"removed\"} 2.0", lines)
+
+    def test_escape(self):
+        self.assertEqual('{name="a\\"b\\\\c\\n"}',
+                         exporter._labels(["name"], ["a\"b\\c\n"]))
+
+    def test_serve(self):
+        server = exporter.serve(0, "127.0.0.1", self.registry)
+        self.addCleanup(server.shutdown)
+        url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+
+        response = urllib2.urlopen(url)
+
+        self.assertEqual(exporter.CONTENT_TYPE,
+                         response.info()["Content-Type"])
+        self.assertIn("spamostack_api_calls_total", response.read())
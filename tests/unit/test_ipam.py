@@ -0,0 +1,105 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import netaddr
+
+from spamostack import backends
+from spamostack import ipam
+from tests.unit import test
+
+
+class BuddyAllocatorTestCase(test.TestCase):
+    def test_allocate_until_exhausted(self):
+        allocator = ipam.BuddyAllocator("10.0.0.0/26")
+        blocks = [allocator.allocate(28) for _ in xrange(4)]
+
+        self.assertEqual(["10.0.0.0/28", "10.0.0.16/28", "10.0.0.32/28",
+                          "10.0.0.48/28"], sorted(str(el) for el in blocks))
+        self.assertIsNone(allocator.allocate(28))
+        self.assertIsNone(allocator.allocate(24))
+
+    def test_release_merges_buddies(self):
+        allocator = ipam.BuddyAllocator("10.0.0.0/24")
+        blocks = [allocator.allocate(26) for _ in xrange(4)]
+        for block in blocks:
+            self.assertTrue(allocator.release(block))
+
+        self.assertFalse(allocator.release(blocks[0]))
+        self.assertEqual(netaddr.IPNetwork("10.0.0.0/24"),
+                         allocator.allocate(24))
+
+    def test_reserve(self):
+        allocator = ipam.BuddyAllocator("192.0.0.0/8")
+        self.assertTrue(allocator.reserve("192.168.1.16/28"))
+        self.assertFalse(allocator.reserve("192.168.1.16/29"))
+        self.assertFalse(allocator.reserve("10.0.0.0/28"))
+
+        taken = netaddr.IPSet(["192.168.1.16/28"])
+        for _ in xrange(64):
+            block = allocator.allocate(20)
+            self.assertFalse(taken & netaddr.IPSet([block]))
+            taken.add(block)
+
+
+class IpamTestCase(test.TestCase):
+    def test_networks_are_separate(self):
+        space = ipam.Ipam(pools=["10.0.0.0/29", "10.0.1.0/29"],
+                          prefixlens=[29])
+
+        self.assertEqual("10.0.0.0/29", str(space.allocate("net1")))
+        self.assertEqual("10.0.1.0/29", str(space.allocate("net1")))
+        self.assertIsNone(space.allocate("net1"))
+        self.assertEqual("10.0.0.0/29", str(space.allocate("net2")))
+
+        self.assertTrue(space.release("net1", "10.0.1.0/29"))
+        self.assertEqual("10.0.1.0/29", str(space.allocate("net1")))
+
+    def test_existing_subnets(self):
+        space = ipam.Ipam(pools=["10.0.0.0/28"], prefixlens=[29])
+        existing = mock.Mock(return_value=["10.0.0.0/29"])
+
+        self.assertEqual("10.0.0.8/29", str(space.allocate("net", existing)))
+        self.assertIsNone(space.allocate("net", existing))
+        self.assertEqual(1, existing.call_count)
+
+        space.forget("net")
+        self.assertEqual("10.0.0.8/29", str(space.allocate("net", existing)))
+        self.assertEqual(2, existing.call_count)
+
+    def test_ipv6(self):
+        space = ipam.Ipam(pools=["10.0.0.0/8", "fd00::/8"], ipv6_ratio=1.0)
+        cidr = space.allocate("net")
+
+        self.assertEqual(6, cidr.version)
+        self.assertEqual(64, cidr.prefixlen)
+        self.assertIn(cidr, netaddr.IPNetwork("fd00::/8"))
+        self.assertEqual(4, space.allocate("net", version=4).version)
+
+        space.configure(prefixlens=[24])
+        self.assertEqual(64, space.allocate("net").prefixlen)
+
+    def test_persisted_map(self):
+        store = backends.MemoryStore()
+        space = ipam.Ipam(store, pools=["10.0.0.0/28"], prefixlens=[29])
+        space.allocate("net1", lambda: [])
+        space.allocate("net2", lambda: ["10.0.0.8/29"])
+
+        space = ipam.Ipam(store, pools=["10.0.0.0/28"], prefixlens=[29])
+        existing = mock.Mock(return_value=[])
+
+        self.assertEqual("10.0.0.8/29", str(space.allocate("net1", existing)))
+        self.assertIsNone(space.allocate("net2", existing))
+        self.assertFalse(existing.called)
@@ -0,0 +1,74 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+import mock
+
+from spamostack import cache
+from spamostack import client_factory
+from spamostack import keeper
+from spamostack import reconciler
+from tests.unit import test
+from tests.unit import test_cache
+
+
+class KeeperTestCase(test.TestCase):
+    def setUp(self):
+        super(KeeperTestCase, self).setUp()
+        mock.patch.dict(os.environ, test_cache.ENVIRON).start()
+        mock.patch.object(keeper.Keeper, "default_init").start()
+        self.cache = cache.Cache("db", "memory")
+        user = dict(self.cache["users"]["admin"],
+                    auth_url=self.cache["api"]["auth_url"])
+        self.keeper = keeper.Keeper(self.cache, mock.Mock(user=user))
+        self.clients = {}
+        for name in ["cinder", "glance", "keystone", "neutron", "nova",
+                     "swift"]:
+            self.clients[name] = mock.Mock()
+            setattr(self.keeper.spam_factory, name,
+                    mock.Mock(return_value=self.clients[name]))
+
+    def test_listing_refreshes_stale(self):
+        self.keeper.project_id = "admin"
+        self.keeper.reconciler = reconciler.Reconciler(self.cache, None)
+        view = self.keeper.reconciler.views[("cinder", "volumes")]
+        view.replace(dict(
+            (key, client_factory.Accessible(id=key, attachments=[]))
+            for key in ["v1", "v2"]))
+        volumes = mock.Mock()
+        volumes.get.side_effect = lambda key: client_factory.Accessible(
+            id=key, attachments=[{"server_id": "s1"}])
+
+        self.keeper.touch("cinder", "volumes", "v1")
+        listed = self.keeper.listing("cinder", "volumes", volumes, [])
+
+        volumes.get.assert_called_once_with("v1")
+        self.assertFalse(volumes.list.called)
+        self.assertEqual({"v1": [{"server_id": "s1"}], "v2": []},
+                         dict((volume.id, volume.attachments)
+                              for volume in listed))
+
+    def test_clean_all(self):
+        self.cache.track("neutron", "floatingips", "f1", parent="n1")
+
+        self.keeper.clean(["all"])
+
+        self.clients["neutron"].floatingips.delete.assert_called_once_with(
+            "f1")
+        for service in ["cinder", "glance", "keystone", "neutron", "nova",
+                        "swift"]:
+            for resource in self.cache[service].keys():
+                self.assertEqual(set(), set(self.cache[service][resource]))
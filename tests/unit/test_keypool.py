@@ -0,0 +1,73 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import time
+
+import mock
+
+from spamostack import keypool
+from tests.unit import test
+
+
+class KeyPoolTestCase(test.TestCase):
+    def setUp(self):
+        super(KeyPoolTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_generate(self):
+        self.assertTrue(keypool.generate("rsa", 1024).startswith("ssh-rsa "))
+        self.assertTrue(keypool.generate("ed25519").startswith(
+            "ssh-ed25519 "))
+        self.assertRaises(ValueError, keypool.generate, "dsa")
+
+    def test_fill_and_reuse(self):
+        path = os.path.join(self.path, "keys")
+        pool = keypool.KeyPool("rsa", 1024, size=2, path=path, processes=1)
+        pool.start()
+        self.addCleanup(pool.stop)
+        for _ in xrange(100):
+            if len(pool.ready) == 2:
+                break
+            time.sleep(0.1)
+
+        keys = set(pool.get() for _ in xrange(2))
+        self.assertEqual(2, len(keys))
+
+        loaded = keypool.KeyPool("rsa", 1024, size=2, path=path)
+        self.assertEqual(keys, set(loaded.ready))
+        self.assertEqual([], list(keypool.KeyPool("rsa", 2048,
+                                                  path=path).ready))
+
+        # Handed out keys are dropped from the file
+        unused = loaded.ready[1]
+        loaded.get()
+        loaded.stop()
+        self.assertEqual([unused], list(keypool.KeyPool(
+            "rsa", 1024, size=2, path=path).ready))
+
+    @mock.patch("spamostack.keypool.generate", return_value="ssh-rsa key")
+    def test_get_falls_back(self, mock_generate):
+        pool = keypool.KeyPool(size=1)
+        self.assertEqual("ssh-rsa key", pool.get())
+        mock_generate.assert_called_once_with("rsa", 2048)
+
+        pool.ready.append("ssh-rsa fresh")
+        self.assertEqual("ssh-rsa fresh", pool.get())
+        self.assertEqual("ssh-rsa fresh", pool.get())
+        self.assertEqual(1, mock_generate.call_count)
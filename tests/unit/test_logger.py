@@ -0,0 +1,109 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import time
+
+import mock
+
+from spamostack import logger
+from tests.unit import test
+
+
+class Collector(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class AsyncHandlerTestCase(test.TestCase):
+    def setUp(self):
+        super(AsyncHandlerTestCase, self).setUp()
+        self.now = 1000.0
+        mock.patch.object(logger.metrics, "monotonic",
+                          side_effect=lambda: self.now).start()
+        self.collector = Collector()
+        self.handler = logger.AsyncHandler([self.collector], rate=2,
+                                           interval=60)
+        self.log = logging.getLogger("test_logger")
+        self.log.setLevel(logging.DEBUG)
+        self.log.propagate = False
+        self.log.addHandler(self.handler)
+        self.addCleanup(self.log.removeHandler, self.handler)
+
+    def messages(self):
+        self.handler.queue.join()
+        return [record.getMessage() for record in self.collector.records]
+
+    def summarized(self, message):
+        self.now += 60
+        self.handler.summarize(self.now)
+        # The writer thread could have summarized it first
+        for _ in xrange(100):
+            if message in self.messages():
+                return True
+            time.sleep(0.01)
+
+        return False
+
+    def test_rate_limit(self):
+        for index in xrange(5):
+            self.log.info("Creating %s", index)
+        self.log.warning("Not limited")
+
+        self.assertEqual(["Creating 0", "Creating 1", "Not limited"],
+                         self.messages())
+        self.assertTrue(self.summarized("3 messages were suppressed"))
+
+    def test_suppressed_not_formatted(self):
+        name = mock.MagicMock()
+        name.__str__.return_value = "name"
+        for _ in xrange(5):
+            self.log.info("Creating %s", name)
+
+        self.assertEqual(["Creating name"] * 2, self.messages())
+        self.assertEqual(2, name.__str__.call_count)
+
+    def test_repeated_exceptions(self):
+        for index in xrange(3):
+            try:
+                raise ValueError(index)
+            except ValueError as exc:
+                self.log.critical("Exception: %s", exc, exc_info=True)
+
+        self.assertEqual(["Exception: 0"], self.messages())
+        self.assertIsNotNone(self.collector.records[0].exc_info)
+        self.assertTrue(self.summarized(
+            "ValueError was raised 2 more times in 60 s"))
+
+    def test_flush_summarizes(self):
+        for index in xrange(3):
+            self.log.info("Creating %s", index)
+            try:
+                raise ValueError(index)
+            except ValueError as exc:
+                logger.exception(self.log, exc)
+
+        self.now += 1
+        self.handler.flush()
+
+        messages = self.messages()
+        self.assertIn("1 messages were suppressed", messages)
+        self.assertIn("ValueError was raised 2 more times in 1 s", messages)
+        self.assertTrue(self.collector.records[1].pathname.endswith(
+            "test_logger.py"))
@@ -0,0 +1,147 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import mock
+
+from spamostack import metrics
+from tests.unit import test
+
+
+class HistogramTestCase(test.TestCase):
+    def test_buckets(self):
+        previous = -1
+        for value in [0, 1, 63, 64, 127, 128, 1000, 123456, 2 ** 40]:
+            index = metrics.bucket(value)
+            low, high = metrics.bucket_range(index)
+            self.assertTrue(low <= value <= high)
+            self.assertTrue(high - low <= max(1, value / 64))
+            self.assertTrue(index > previous)
+            previous = index
+        self.assertTrue(metrics.bucket(2 ** 60) < metrics.BUCKETS)
+
+    def test_percentiles(self):
+        histogram = metrics.Histogram()
+        for value in xrange(1, 10001):
+            histogram.record(value)
+
+        self.assertEqual(10000, histogram.count)
+        self.assertEqual(10000, histogram.percentile(100))
+        for percent in [50, 90, 99, 99.9]:
+            expected = 10000 * percent / 100.0
+            self.assertTrue(abs(histogram.percentile(percent) - expected) <=
+                            expected / 64)
+        self.assertEqual(0, metrics.Histogram().percentile(50))
+
+
+class MetricsTestCase(test.TestCase):
+    def test_timed_outcomes(self):
+        registry = metrics.Metrics()
+        key = ("pipe", "nova", "servers", "create")
+
+        def failing():
+            registry.fail(Exception())
+            return "server"
+
+        registry.timed(key, lambda: "server")()
+        registry.timed(key, lambda: None)()
+        registry.timed(key, failing)()
+        self.assertRaises(ZeroDivisionError,
+                          registry.timed(key, lambda: 1 / 0))
+
+        snapshot = registry.snapshot()
+        self.assertEqual(1, snapshot[key + ("ok",)].count)
+        self.assertEqual(1, snapshot[key + ("skipped",)].count)
+        self.assertEqual(2, snapshot[key + ("error",)].count)
+        self.assertEqual([key], registry.spans().keys())
+
+    def test_threads_merged(self):
+        registry = metrics.Metrics()
+
+        def work():
+            for _ in xrange(100):
+                registry.record(("key",), 0.001)
+
+        threads = [threading.Thread(target=work) for _ in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4, len(registry.shards))
+        merged = registry.snapshot()[("key",)]
+        self.assertEqual(400, merged.count)
+        self.assertEqual(1000, merged.max)
+
+    def test_monotonic(self):
+        first = metrics.monotonic()
+        self.assertTrue(metrics.monotonic() >= first)
+
+    def test_phases(self):
+        registry = metrics.Metrics()
+        key = ("pipe", "nova", "servers", "create")
+        clock = iter(xrange(100)).next
+
+        def action():
+            with registry.phase("lookup"):
+                # API requests of the lookup are the lookup
+                with registry.phase("api"):
+                    pass
+            with registry.phase("api"):
+                pass
+            return "server"
+
+        with mock.patch.object(metrics, "monotonic",
+                               side_effect=lambda: clock()):
+            registry.timed(key, action)()
+
+        phases = registry.snapshot("phases")
+        self.assertEqual(1000000, phases[key + ("lookup",)].max)
+        self.assertEqual(1000000, phases[key + ("api",)].max)
+        self.assertEqual(3000000, phases[key + ("local",)].max)
+        # Phases outside of operations are not counted
+        with registry.phase("api"):
+            pass
+        self.assertEqual(1, registry.snapshot("phases")[
+            key + ("api",)].count)
+
+    def test_phased_keeps_name(self):
+        @metrics.phased("lookup")
+        def lookup():
+            """Look it up."""
+
+        self.assertEqual(("lookup", "Look it up."),
+                         (lookup.__name__, lookup.__doc__))
+
+    def test_traffic(self):
+        registry = metrics.Metrics()
+        key = ("pipe", "neutron", "networks", "delete")
+
+        def action():
+            registry.api_call("network", 0, 2048)
+            registry.api_call("network", 128, 0)
+            registry.api_call("identity", 512, 1024)
+            return "network"
+
+        registry.timed(key, action)()
+        registry.api_call("network", 0, 100)
+
+        traffic = registry.traffic()
+        self.assertEqual([2, 128, 2048], traffic[key + ("network",)])
+        self.assertEqual([1, 512, 1024], traffic[key + ("identity",)])
+        self.assertEqual([1, 0, 100],
+                         traffic[metrics.BACKGROUND + ("network",)])
+        self.assertEqual(3, registry.counters()[1]["network"])
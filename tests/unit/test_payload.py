@@ -0,0 +1,77 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import random
+
+from spamostack import payload
+from tests.unit import test
+
+
+class PayloadTestCase(test.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(0, payload.parse_size("0"))
+        self.assertEqual(512, payload.parse_size(512))
+        self.assertEqual(4096, payload.parse_size("4K"))
+        self.assertEqual(3 * 2 ** 19, payload.parse_size("1.5M"))
+        self.assertEqual(5 * 2 ** 30, payload.parse_size("5GB"))
+        self.assertEqual(2 ** 40, payload.parse_size("1TiB"))
+        self.assertRaises(ValueError, payload.parse_size, "5X")
+
+    def test_distributions(self):
+        rand = random.Random(42)
+
+        self.assertEqual(4096, payload.distribution("4K").sample(rand))
+
+        uniform = payload.distribution({"type": "uniform", "min": "1K",
+                                        "max": "2K"})
+        for _ in xrange(100):
+            self.assertTrue(1024 <= uniform.sample(rand) <= 2048)
+
+        lognormal = payload.distribution({"type": "lognormal",
+                                          "median": "1M", "sigma": 3,
+                                          "max": "2M"})
+        sizes = [lognormal.sample(rand) for _ in xrange(1000)]
+        self.assertEqual(2 ** 21, max(sizes))
+        self.assertTrue(0.4 < sum(size < 2 ** 20 for size in sizes) / 1000.0)
+
+        histogram = payload.distribution({"type": "histogram", "buckets": [
+            [0, 0], ["1K", 1], ["1M", "2M", 1]]})
+        for _ in xrange(100):
+            size = histogram.sample(rand)
+            self.assertTrue(size == 1024 or 2 ** 20 <= size <= 2 ** 21)
+
+        self.assertRaises(ValueError, payload.distribution,
+                          {"type": "pareto"})
+
+    def test_stream(self):
+        size = payload.BUFFER_SIZE * 2 + 10
+        stream = payload.PayloadStream(size, offset=5)
+
+        chunk = stream.read(100)
+        self.assertIsInstance(chunk, memoryview)
+        self.assertEqual(payload.shared_buffer()[5:105].tobytes(),
+                         chunk.tobytes())
+
+        total = 100
+        while True:
+            chunk = stream.read(2 ** 20)
+            if not len(chunk):
+                break
+            total += len(chunk)
+        self.assertEqual(size, total)
+
+        stream.seek(0)
+        self.assertEqual(size, sum(len(chunk) for chunk in stream))
+        self.assertEqual(0, len(payload.PayloadStream(0).read()))
@@ -0,0 +1,70 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+
+import mock
+
+from spamostack import profiler
+from tests.unit import test
+
+
+def busy(seconds):
+    until = time.time() + seconds
+    while time.time() < until:
+        pass
+
+
+class ProfilerTestCase(test.TestCase):
+    def setUp(self):
+        super(ProfilerTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def run_threads(self, active):
+        mock.patch.object(profiler, "active", active).start()
+        active.start()
+        threads = [threading.Thread(target=profiler.profiled(busy),
+                                    args=(0.05,), name="pipe{}".format(pipe))
+                   for pipe in xrange(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        active.stop()
+
+    def test_cprofile(self):
+        path = os.path.join(self.path, "profile")
+        self.run_threads(profiler.Profiler("cprofile", path))
+
+        stats = pstats.Stats(path).stats
+        calls = [value[0] for key, value in stats.items()
+                 if key[2] == "busy"]
+        self.assertEqual([2], calls)
+
+    def test_sample(self):
+        path = os.path.join(self.path, "folded")
+        self.run_threads(profiler.Profiler("sample", path, 0.001))
+
+        with open(path) as folded:
+            lines = [line for line in folded if line.startswith("pipe0;")]
+        # Stacks go from the thread to the leaf function
+        leaves = [line.rsplit(" ", 1)[0].split(";")[-1] for line in lines]
+        self.assertTrue(any(leaf.startswith("busy (") for leaf in leaves))
@@ -0,0 +1,162 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+import mock
+
+from spamostack import cache
+from spamostack import client_factory
+from spamostack import metrics
+from spamostack import reconciler
+from tests.unit import test
+from tests.unit import test_cache
+
+
+class ReconcilerTestCase(test.TestCase):
+    def setUp(self):
+        super(ReconcilerTestCase, self).setUp()
+        mock.patch.dict(os.environ, test_cache.ENVIRON).start()
+        mock.patch.object(metrics, "registry", metrics.Metrics()).start()
+        self.cache = cache.Cache(backend="memory")
+        self.reconciler = reconciler.Reconciler(self.cache, mock.Mock())
+
+    def server(self, id, status="ACTIVE"):
+        return mock.Mock(id=id, status=status)
+
+    def test_full_nova(self):
+        self.cache.track("nova", "servers", "s1", state="BUILD")
+        self.cache.track("nova", "servers", "s2", state="ACTIVE")
+        client = mock.Mock()
+        client.servers.list.return_value = [self.server("s1"),
+                                            self.server("other")]
+
+        self.reconciler.reconcile_nova(client, True)
+
+        self.assertEqual(["s1"], list(self.cache["nova"]["servers"]))
+        self.assertEqual(["s1"], self.cache.find("nova", "servers",
+                                                 state="ACTIVE"))
+        self.assertEqual(["other", "s1"], sorted(
+            server.id for server in self.reconciler.view("nova", "servers")))
+        self.assertEqual({("nova", "servers", "removed"): 1,
+                          ("nova", "servers", "state"): 1},
+                         self.reconciler.drift)
+        self.assertEqual(self.reconciler.drift, metrics.registry.drift)
+
+    def test_changes_since_nova(self):
+        self.cache.track("nova", "servers", "s1")
+        client = mock.Mock()
+        client.servers.list.return_value = []
+        self.reconciler.reconcile_nova(client, True)
+
+        client.servers.list.return_value = [self.server("s1", "DELETED")]
+        self.reconciler.reconcile_nova(client, False)
+
+        search_opts = client.servers.list.call_args[1]["search_opts"]
+        self.assertIn("changes-since", search_opts)
+        self.assertEqual([], list(self.cache["nova"]["servers"]))
+
+    def test_swift_objects_on_full_passes(self):
+        self.cache.track("swift", "containers", "c")
+        self.cache.track("swift", "objects", "c/o", parent="c")
+        client = mock.Mock()
+        client.native.get_account.return_value = ({}, [
+            {"name": "c", "count": 1, "bytes": 3}])
+        client.native.get_container.return_value = ({}, [])
+
+        self.reconciler.reconcile_swift(client, False)
+        self.assertFalse(client.native.get_container.called)
+        self.assertEqual(["c/o"], list(self.cache["swift"]["objects"]))
+
+        self.reconciler.reconcile_swift(client, True)
+        self.assertEqual([], list(self.cache["swift"]["objects"]))
+        self.assertEqual({("swift", "objects", "removed"): 1},
+                         self.reconciler.drift)
+
+    def test_track_interfaces(self):
+        self.cache.track("neutron", "networks", "n1")
+        self.cache.track("neutron", "interfaces", "gone", name="r1",
+                         parent="n1")
+        owner = "network:router_interface"
+        listed = {"i1": {"id": "i1", "network_id": "n1", "device_id": "r1",
+                         "device_owner": owner},
+                  "i2": {"id": "i2", "network_id": "other",
+                         "device_id": "r1", "device_owner": owner},
+                  "p1": {"id": "p1", "network_id": "n1", "device_id": "s1",
+                         "device_owner": "compute:nova"}}
+
+        self.reconciler.track_interfaces(listed, True)
+
+        self.assertEqual(["i1"], self.cache.find("neutron", "interfaces",
+                                                 parent="n1"))
+        self.assertEqual("r1", self.cache.index(
+            "neutron", "interfaces").get("i1")["name"])
+
+    def test_project_of(self):
+        self.assertEqual("p1", reconciler.project_of(
+            "nova", mock.Mock(tenant_id="p1")))
+        self.assertEqual("p1", reconciler.project_of(
+            "cinder", mock.Mock(**{"os-vol-tenant-attr:tenant_id": "p1"})))
+        self.assertIsNone(reconciler.project_of("neutron",
+                                                {"tenant_id": "p1"}))
+
+    def test_sorted_pages(self):
+        section = ("cinder", "volumes")
+        pages = [[{"id": "v3", "updated_at": "2016-01-03T00:00:00.000000"},
+                  {"id": "v2", "updated_at": "2016-01-02 00:00:00"}]]
+        self.reconciler.sorted_pages(section, pages, True)
+        self.assertEqual("2016-01-03T00:00:00",
+                         self.reconciler.marks[section])
+
+        pages = [[{"id": "v4", "updated_at": "2016-01-04T00:00:00Z"},
+                  {"id": "v3", "updated_at": "2016-01-03T00:00:00Z"},
+                  {"id": "v2", "updated_at": "2016-01-02T00:00:00Z"}],
+                 [{"id": "v1", "updated_at": "2016-01-01T00:00:00Z"}]]
+        listed = self.reconciler.sorted_pages(section, iter(pages), False)
+
+        self.assertEqual(["v3", "v4"], sorted(listed))
+        self.assertEqual("2016-01-04T00:00:00",
+                         self.reconciler.marks[section])
+
+    def test_stale_views(self):
+        self.reconciler.views[("neutron", "networks")].put("n1", {"id": "n1"})
+        self.reconciler.views[("neutron", "subnets")].put(
+            "s1", {"id": "s1", "network_id": "n1"})
+
+        self.reconciler.invalidate("neutron", "subnets", "s1")
+        self.reconciler.invalidate("neutron", "subnets", "unknown")
+        self.assertEqual(["s1"], self.reconciler.stale("neutron", "subnets"))
+        self.reconciler.refreshed("neutron", "subnets", "s1", None)
+        self.assertEqual([], self.reconciler.stale("neutron", "subnets"))
+
+        # Networks list their subnets
+        self.reconciler.remember(
+            "neutron", "subnets",
+            client_factory.Accessible(id="s2", network_id="n1"))
+        self.assertEqual(["n1"], self.reconciler.stale("neutron",
+                                                       "networks"))
+        self.reconciler.refreshed("neutron", "networks", "n1", {"id": "n1"})
+        self.reconciler.forget("neutron", "subnets", "s2")
+        self.assertEqual(["n1"], self.reconciler.stale("neutron",
+                                                       "networks"))
+
+    def test_view_keeps_fresh_items(self):
+        view = reconciler.View()
+        view.begin()
+        view.put("created", "item")
+        view.replace({"listed": "item"})
+
+        self.assertTrue(view.ready)
+        self.assertEqual(["created", "listed"], sorted(view.items))
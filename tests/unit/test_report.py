@@ -0,0 +1,124 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from spamostack import metrics
+from spamostack import report
+from tests.unit import test
+
+CREATE = ("pipe1", "nova", "servers", "create")
+DELETE = ("pipe1", "nova", "servers", "delete")
+
+
+class ReportTestCase(test.TestCase):
+    def setUp(self):
+        super(ReportTestCase, self).setUp()
+        self.registry = metrics.Metrics()
+        for seconds in [1, 2, 3, 4]:
+            self.registry.record(CREATE + ("ok",), seconds)
+        self.registry.record(CREATE + ("error",), 10)
+        self.registry.record(CREATE + ("skipped",), 0.1)
+        self.registry.record(DELETE + ("ok",), 0.5)
+        self.statistics = report.collect(self.registry)
+
+    def test_parse(self):
+        slo = report.Slo("nova.servers.create p99 < 5s")
+        self.assertEqual(("nova.servers.create", "p99", "<", 5.0),
+                         (slo.selector, slo.statistic, slo.operator,
+                          slo.threshold))
+
+        slo = report.Slo("error_rate <= 1%")
+        self.assertEqual((None, "error_rate", "<=", 0.01),
+                         (slo.selector, slo.statistic, slo.operator,
+                          slo.threshold))
+
+        self.assertEqual(0.25, report.Slo("p50 < 250ms").threshold)
+        self.assertRaises(ValueError, report.Slo, "servers fast")
+        for text in ["p. < 1s", "p1.2.3 < 1s", "p0 < 1s", "p101 < 1s",
+                     "p99 < 1.2.3s"]:
+            self.assertRaises(ValueError, report.Slo, text)
+
+    def test_check(self):
+        # Latencies of done operations only
+        value, passed = report.Slo(
+            "nova.servers.create p50 < 5s").check(self.statistics)
+        self.assertTrue(passed)
+        self.assertAlmostEqual(2.0, value, delta=0.05)
+        self.assertAlmostEqual(4.0, self.statistics[CREATE].value("max"),
+                               delta=0.05)
+
+        # One of five operations failed, skipped one is not counted
+        value, passed = report.Slo(
+            "pipe1.nova.servers.create error_rate < 1%").check(
+            self.statistics)
+        self.assertEqual((0.2, False), (value, passed))
+
+        # All the actions without the selector
+        self.assertEqual((6, True),
+                         report.Slo("count >= 6").check(self.statistics))
+        self.assertEqual((None, False),
+                         report.Slo("cinder.volumes.create max < 1s").check(
+                             self.statistics))
+
+    def test_rate_of_active_span(self):
+        # Actions of a pipe run one after another
+        self.registry.span(CREATE, 0.0, 10.0)
+        self.registry.span(DELETE, 10.0, 12.0)
+        self.registry.span(DELETE, 12.0, 15.0)
+
+        statistics = report.collect(self.registry)
+
+        self.assertAlmostEqual(0.6, statistics[CREATE].rate)
+        self.assertAlmostEqual(0.2, statistics[DELETE].rate)
+        self.assertEqual((0.2, True), report.Slo(
+            "nova.servers.delete rate >= 0.2").check(statistics))
+
+    def test_finish(self):
+        with mock.patch.object(report, "render") as render:
+            self.assertEqual(0, report.finish([report.Slo("p50 < 5s")],
+                                              self.registry))
+            self.assertEqual(1, report.finish([report.Slo("max < 3s")],
+                                              self.registry))
+        self.assertEqual(2, render.call_count)
+
+        with mock.patch.object(report, "log") as log:
+            with mock.patch.object(report, "render"):
+                self.assertEqual(1, report.finish(
+                    [report.Slo("cinder.volumes.create max < 1s")],
+                    self.registry))
+        self.assertIn("cinder.volumes.create matched no action",
+                      log.error.call_args[0][0])
+
+        lines = report.render(self.statistics).splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].startswith("pipe1.nova.servers.create"))
+        self.assertEqual(["lookup", "api", "local"], lines[0].split()[-3:])
+
+    def test_phases(self):
+        self.registry.record_phases(CREATE, {"lookup": 1.0, "api": 2.0}, 4.0)
+        self.registry.record_phases(CREATE, {"lookup": 3.0}, 3.0)
+
+        statistics = report.collect(self.registry)
+
+        self.assertAlmostEqual(2.0, statistics[CREATE].phase("lookup"),
+                               delta=0.05)
+        self.assertAlmostEqual(1.0, statistics[CREATE].phase("api"),
+                               delta=0.05)
+        self.assertAlmostEqual(0.5, statistics[CREATE].phase("local"),
+                               delta=0.05)
+        self.assertEqual(0.0, statistics[DELETE].phase("api"))
+        self.assertEqual("2.000", report.render(statistics).splitlines()[1]
+                         .split()[-3])
@@ -0,0 +1,122 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+
+import mock
+
+from spamostack import metrics
+from spamostack import results
+from tests.unit import test
+
+UUID = "6f1e5a1c-7e35-4c39-a3c5-0c2b3e3c8a11"
+
+
+class ResultSinkTestCase(test.TestCase):
+    def setUp(self):
+        super(ResultSinkTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.file = os.path.join(self.path, "results")
+
+    def test_round_trip(self):
+        sink = results.ResultSink(self.file, buffer_records=2)
+        key = ("p", "nova", "servers", "create")
+        sink.record(10.5, 0.25, key, "ok", 0, mock.Mock(id=UUID))
+        sink.record(11.0, 0.5, ("p", "swift", "objects", "create"), "error",
+                    503, "name")
+        sink.record(12.0, 0.1, key, "skipped")
+        sink.close()
+
+        count, dictionaries = results.read_header(self.file)
+        self.assertEqual(3, count)
+        self.assertEqual(2, len(dictionaries["actions"]))
+        records = list(results.read(self.file))
+        self.assertEqual([10.5, 11.0, 12.0],
+                         [record["start"] for record in records])
+        self.assertEqual(0.25, records[0]["duration"])
+        self.assertEqual(UUID, records[0]["id"])
+        self.assertEqual(("p", "swift", "objects", "create"),
+                         records[1]["action"])
+        self.assertEqual(("error", 503, "name"),
+                         (records[1]["outcome"], records[1]["status"],
+                          records[1]["id"]))
+        self.assertEqual("", records[2]["id"])
+
+    def test_long_ids(self):
+        sink = results.ResultSink(self.file, buffer_records=2)
+        key = ("p", "swift", "objects", "create")
+        names = ["container/" + "object" * 4 + str(index)
+                 for index in xrange(3)]
+        for name in names:
+            sink.record(1.0, 0.1, key, "ok", 0, name)
+
+        # The side table has the IDs of flushed records
+        self.assertEqual(names[:2], [record["id"] for record in
+                                     results.read(self.file)])
+        sink.record(1.0, 0.1, key, "ok", 0, u"container/\u0436" * 4)
+        sink.close()
+
+        self.assertEqual(names + [u"container/\u0436".encode("utf-8") * 4],
+                         [record["id"] for record in
+                          results.read(self.file)])
+        self.assertEqual("results.ids",
+                         results.read_header(self.file)[1]["ids"])
+
+    def test_readable_before_close(self):
+        sink = results.ResultSink(self.file, buffer_records=2,
+                                  targets={("p", "nova", "servers",
+                                            "create"): 0.5})
+        self.assertEqual(0, results.read_header(self.file)[0])
+
+        for start in [1.0, 2.0, 3.0]:
+            sink.record(start, 0.1, ("p", "nova", "servers", "create"), "ok")
+
+        count, dictionaries = results.read_header(self.file)
+        self.assertEqual(2, count)
+        self.assertEqual([["p", "nova", "servers", "create", 0.5]],
+                         dictionaries["targets"])
+        self.assertEqual([1.0, 2.0], [record["start"] for record in
+                                      results.read(self.file)])
+
+        sink.record(4.0, 0.1, ("p", "nova", "servers", "delete"), "ok")
+        self.assertEqual(4, results.read_header(self.file)[0])
+        sink.close()
+        self.assertEqual(4, len(list(results.read(self.file))))
+
+    def test_threads(self):
+        sink = results.ResultSink(self.file, buffer_records=16)
+        registry = metrics.Metrics()
+        registry.sink = sink
+        action = registry.timed(("p", "nova", "servers", "create"),
+                                lambda: UUID)
+
+        def work():
+            for _ in xrange(100):
+                action()
+
+        threads = [threading.Thread(target=work) for _ in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sink.close()
+
+        self.assertEqual(400, results.read_header(self.file)[0])
+        self.assertEqual(set([UUID]), set(record["id"] for record in
+                                          results.read(self.file)))
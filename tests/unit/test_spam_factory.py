@@ -0,0 +1,172 @@
+# Copyright 2016: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+import mock
+
+from spamostack import cache
+from spamostack import datagen
+from spamostack import spam_factory
+from tests.unit import test
+from tests.unit import test_cache
+
+
+class SpamGlanceTestCase(test.TestCase):
+    def setUp(self):
+        super(SpamGlanceTestCase, self).setUp()
+        self.client = mock.Mock()
+        self.client.images.create.return_value = mock.Mock(id="i1",
+                                                           status="queued")
+        self.client.images.get.side_effect = [
+            mock.Mock(id="i1", status="saving"),
+            mock.Mock(id="i1", status="active")]
+
+    def glance(self, keeper=None, **settings):
+        settings.setdefault("active_interval", 0)
+        return spam_factory.SpamGlance(mock.Mock(), self.client,
+                                       datagen.DataGenerator(seed=1), keeper,
+                                       settings)
+
+    def test_image_upload_streams_data(self):
+        glance = self.glance(image_size="1M", disk_format="qcow2")
+
+        image = glance.image_upload("name")
+
+        self.assertEqual("active", image.status)
+        self.assertEqual("qcow2",
+                         self.client.images.create.call_args[1]["disk_format"])
+        args, kwargs = self.client.images.upload.call_args
+        self.assertEqual("i1", args[0])
+        self.assertEqual(2 ** 20, kwargs["image_size"])
+        self.assertEqual(2 ** 20, sum(len(chunk) for chunk in args[1]))
+
+    def test_image_upload_not_active(self):
+        self.client.images.get.side_effect = None
+        self.client.images.get.return_value = mock.Mock(id="i1",
+                                                        status="killed")
+        glance = self.glance(image_size=16)
+
+        self.assertEqual("queued", glance.image_upload("name").status)
+        self.assertIsNone(glance.wait_active("i1"))
+
+    def test_image_upload_no_wait(self):
+        glance = self.glance(image_size=16, active_timeout=0)
+
+        self.assertEqual("queued", glance.image_upload("name").status)
+        self.assertFalse(self.client.images.get.called)
+
+    def test_image_update_active_only(self):
+        keeper = mock.Mock()
+        keeper.get.side_effect = [
+            [], [mock.Mock(id="i1", status="saving"),
+                 mock.Mock(id="i2", status="active")]]
+        glance = self.glance(keeper)
+
+        glance.image_update()
+
+        self.assertEqual("i2", self.client.images.update.call_args[0][0])
+        keeper.touch.assert_called_once_with("glance", "images", "i1")
+
+
+class SpamNeutronTestCase(test.TestCase):
+    def setUp(self):
+        super(SpamNeutronTestCase, self).setUp()
+        mock.patch.dict(os.environ, test_cache.ENVIRON).start()
+        self.cache = cache.Cache("db", "memory")
+        self.client = mock.Mock()
+        self.keeper = mock.Mock()
+        self.neutron = spam_factory.SpamNeutron(self.cache, self.client,
+                                                keeper=self.keeper)
+
+    def test_describe(self):
+        router = {"name": "r", "status": "ACTIVE",
+                  "external_gateway_info": {"network_id": "ext"}}
+        self.assertEqual({"name": "r", "parent": "ext", "state": "ACTIVE"},
+                         spam_factory._describe(router, "routers"))
+        self.assertEqual("ext", spam_factory._describe(
+            {"floating_network_id": "ext", "port_id": "p"},
+            "floatingips")["parent"])
+
+    def test_network_delete_detaches_routers(self):
+        self.cache.track("neutron", "networks", "n1")
+        self.cache.track("neutron", "routers", "r1", parent="n1")
+        self.cache.track("neutron", "floatingips", "f1", parent="n1")
+        self.cache.track("neutron", "ports", "p1", parent="n1")
+        self.cache.track("neutron", "ports", "i1", parent="n1")
+        self.cache.track("neutron", "interfaces", "i1", name="r2",
+                         parent="n1")
+
+        self.assertEqual("n1", self.neutron.spam_network_delete())
+
+        self.assertFalse(self.client.ports.list.called)
+        self.client.floatingips.delete.assert_called_once_with("f1")
+        self.client.routers.remove_interface.assert_called_once_with(
+            "r2", port_id="i1")
+        self.client.routers.remove_gateway.assert_called_once_with("r1")
+        self.keeper.touch.assert_any_call("neutron", "routers", "r1")
+        self.keeper.touch.assert_any_call("neutron", "routers", "r2")
+        self.client.ports.delete.assert_called_once_with("p1")
+        self.client.networks.delete.assert_called_once_with("n1")
+        self.assertIn("r1", self.cache["neutron"]["routers"])
+        self.assertEqual([], self.cache.find("neutron", "routers",
+                                             parent="n1"))
+        self.assertEqual(set(), set(self.cache["neutron"]["ports"]))
+        self.assertEqual(set(), set(self.cache["neutron"]["interfaces"]))
+
+
+class SpamSwiftTestCase(test.TestCase):
+    def setUp(self):
+        super(SpamSwiftTestCase, self).setUp()
+        mock.patch.dict(os.environ, test_cache.ENVIRON).start()
+        self.cache = cache.Cache("db", "memory")
+        self.client = mock.Mock()
+        self.swift = spam_factory.SpamSwift(self.cache, self.client)
+
+    def test_track_segments(self):
+        self.swift.track_segments("c", "large", ["large/1/00000000",
+                                                 "large/1/00000001"])
+
+        self.assertEqual({"c_segments"},
+                         set(self.cache["swift"]["segment_containers"]))
+        self.assertEqual(["c_segments/large/1/00000000",
+                          "c_segments/large/1/00000001"],
+                         sorted(self.cache.find("swift", "segments",
+                                                name="c/large")))
+
+    def test_delete_dlo_segments(self):
+        self.swift.track_segments("c", "large", ["large/1/00000000"])
+        self.client.objects.list.return_value = ["large/1/00000000"]
+
+        self.swift.delete_segments("c", "c/large", "dlo")
+
+        self.client.objects.list.assert_called_once_with(
+            "c_segments", prefix="large/", full_listing=True)
+        self.client.objects.delete.assert_called_once_with(
+            "c_segments", "large/1/00000000")
+        self.assertEqual(set(), set(self.cache["swift"]["segments"]))
+
+    def test_remove_segments_container(self):
+        self.swift.track_segments("c", "large", ["large/1/00000000"])
+        self.client.objects.list.return_value = ["large/1/00000000"]
+
+        self.assertEqual("c_segments",
+                         self.swift.segment_container_delete())
+
+        self.client.containers.delete.assert_called_once_with("c_segments")
+        self.assertEqual(set(), set(self.cache["swift"]["segments"]))
+        self.assertEqual(set(),
+                         set(self.cache["swift"]["segment_containers"]))
+        self.assertIsNone(self.swift.segment_container_delete())
@@ -0,0 +1,114 @@
+#
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Microbenchmark of the cache backends.
+
+Usage: python tools/cache_bench.py [--number 100000] [--backends ...]
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+import uuid
+
+from spamostack import backends
+from spamostack import cache
+
+
+def measure(func, number):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    return elapsed, elapsed / number * 10 ** 6
+
+
+def bench(backend_name, ids):
+    path = tempfile.mkdtemp()
+    try:
+        backend = backends.get_backend(backend_name, path)
+        results = []
+
+        store = backend.open("nova", "servers", "set")
+        id_set = cache.IdSet(store)
+        index = cache.ResourceIndex(backend.open("nova", "servers", "index"))
+        batched = cache.IdSet(backend.open("nova", "keypairs", "set"))
+
+        def add():
+            for key in ids:
+                id_set.add(key)
+
+        def add_batch():
+            for start in xrange(0, len(ids), 1000):
+                with backend.batch():
+                    for key in ids[start:start + 1000]:
+                        batched.add(key)
+
+        def index_add():
+            for key in ids:
+                index.add(key, name=key[:8], parent=key[:2], state="ACTIVE")
+
+        def contains():
+            for key in ids:
+                key in id_set
+
+        def choice():
+            for key in ids:
+                id_set.choice()
+
+        def find():
+            for key in ids:
+                index.find(parent=key[:2])
+
+        def reload():
+            cache.IdSet(store)
+
+        def discard():
+            for key in ids:
+                id_set.discard(key)
+
+        for name, func in [("add", add), ("add, batch", add_batch),
+                           ("index add", index_add),
+                           ("contains", contains), ("choice", choice),
+                           ("find by parent", find), ("reload", reload),
+                           ("discard", discard)]:
+            results.append((name,) + measure(func, len(ids)))
+
+        return results
+    finally:
+        shutil.rmtree(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000,
+                        help="Number of IDs per operation")
+    parser.add_argument("--backends", nargs="+",
+                        default=sorted(backends.BACKENDS),
+                        help="Backends to compare")
+    args = parser.parse_args()
+
+    ids = [str(uuid.uuid4()) for _ in xrange(args.number)]
+
+    print("{0:<10} {1:<16} {2:>10} {3:>10}".format(
+        "backend", "operation", "total, s", "per op, us"))
+    for backend_name in args.backends:
+        for name, total, per_op in bench(backend_name, ids):
+            print("{0:<10} {1:<16} {2:>10.3f} {3:>10.2f}".format(
+                backend_name, name, total, per_op))
+
+
+if __name__ == "__main__":
+    main()